@@ -0,0 +1,232 @@
+import json
+import math
+import time
+import uuid
+import logging
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """No slot is free and the wait queue is full (or the wait timed out)."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Per-key token buckets kept in a shared Django cache, so limits hold across workers.
+
+    Each key holds up to ``capacity`` tokens and regains ``rate`` tokens per
+    second. A request costing more than ``capacity`` is let through once the
+    bucket is full and leaves it in debt, so it still spends its whole cost
+    before the next request is admitted. A bucket is stored as
+    ``(tokens, updated_at)`` and updated under a ``cache.add`` lock, after
+    callers in the same process have been serialized on a local lock. A
+    caller that can't get the cache lock within ``lock_wait`` seconds is
+    refused; only when the cache itself fails is the request let through. ``cache.add`` is atomic on the Redis, Memcached and
+    database backends but not on the file-based one, where concurrent
+    workers can overspend a bucket and the limits are best-effort.
+    """
+
+    def __init__(self, alias, prefix, capacity, rate, lock_ttl=1, lock_wait=0.25):
+        self.alias = alias
+        self.prefix = prefix
+        self.capacity = capacity
+        self.rate = rate
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.contended = 0
+        # Striped so one key waiting on the cache lock doesn't hold up the others
+        self._locks = [threading.Lock() for _ in range(32)]
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def take(self, key, cost=1):
+        """Spend ``cost`` tokens from ``key``'s bucket. Returns (allowed, seconds until it would be)."""
+        # A full bucket admits even an oversized request, which then leaves it below zero
+        needed = min(cost, self.capacity)
+        bucket_key = f"{self.prefix}:{key}"
+        lock_key = f"lock:{bucket_key}"
+        token = uuid.uuid4().hex
+        with self._locks[hash(bucket_key) % len(self._locks)]:
+            try:
+                give_up_at = time.monotonic() + self.lock_wait
+                while not self.cache.add(lock_key, token, timeout=self.lock_ttl):
+                    if time.monotonic() >= give_up_at:
+                        self.contended += 1
+                        logger.warning(f"Token bucket {bucket_key} stayed locked, refusing the request")
+                        return False, float(self.lock_ttl)
+                    time.sleep(0.005)
+                try:
+                    now = time.time()
+                    tokens, updated_at = self.cache.get(bucket_key, (self.capacity, now))
+                    tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+                    allowed = tokens >= needed
+                    if allowed:
+                        tokens -= cost
+                    self.cache.set(bucket_key, (tokens, now), timeout=int((self.capacity - tokens) / self.rate) + 60)
+                finally:
+                    if self.cache.get(lock_key) == token:
+                        self.cache.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Token bucket unavailable, letting the request through: {str(e)}")
+                return True, 0.0
+        return allowed, 0.0 if allowed else (needed - tokens) / self.rate
+
+
+class AdmissionGate:
+    """Caps concurrent expensive work (inference, LLM calls) in this process.
+
+    At most ``max_concurrent`` callers hold a slot; up to ``max_waiting``
+    more wait for one, each for at most ``wait_timeout`` seconds. Anyone
+    beyond that is rejected at once with ``Overloaded``, whose
+    ``retry_after`` is estimated from the average time a slot is held.
+    """
+
+    def __init__(self, max_concurrent, max_waiting, wait_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_duration = 1.0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        return max(1, math.ceil(self.avg_duration * (self.waiting + 1) / self.max_concurrent))
+
+    def has_room(self):
+        return self.active < self.max_concurrent or self.waiting < self.max_waiting
+
+    def acquire(self, timeout=-1):
+        """Take a slot, waiting up to ``timeout`` seconds (default ``wait_timeout``, None waits forever)."""
+        timeout = self.wait_timeout if timeout == -1 else timeout
+        with self._lock:
+            if not self.has_room():
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=timeout)
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                raise Overloaded(self.retry_after())
+            self.active += 1
+            self.admitted += 1
+        return time.monotonic()
+
+    def release(self, started):
+        with self._lock:
+            self.active -= 1
+            self.avg_duration = 0.9 * self.avg_duration + 0.1 * (time.monotonic() - started)
+        self._slots.release()
+
+    def hold(self, iterable, timeout=-1):
+        """Take a slot now and keep it until ``iterable`` is exhausted or closed, e.g. a streamed response."""
+        return HeldIterator(self, self.acquire(timeout), iterable)
+
+    @contextmanager
+    def slot(self, timeout=-1):
+        started = self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'avg_duration': round(self.avg_duration, 3),
+        }
+
+
+class HeldIterator:
+    """Iterator that releases its gate slot once, when exhausted or closed.
+
+    A plain generator with a ``finally`` would leak the slot if the client
+    disconnects before the first item, since closing an unstarted generator
+    never runs its body.
+    """
+
+    def __init__(self, gate, started, iterable):
+        self.gate = gate
+        self.started = started
+        self.iterator = iter(iterable)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.started is not None:
+            started, self.started = self.started, None
+            self.gate.release(started)
+        if hasattr(self.iterator, 'close'):
+            self.iterator.close()
+
+
+work_gate = AdmissionGate(
+    settings.NLP_ADMISSION_MAX_CONCURRENT, settings.NLP_ADMISSION_MAX_WAITING, settings.NLP_ADMISSION_WAIT_TIMEOUT,
+)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle backed by a ``TokenBucket`` per user; safe methods are not limited."""
+
+    bucket = None
+
+    def cost(self, request):
+        return 1
+
+    def allow_request(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        ident = request.user.pk if request.user and request.user.is_authenticated else self.get_ident(request)
+        allowed, self.retry_in = self.bucket.take(ident, self.cost(request))
+        return allowed
+
+    def wait(self):
+        return self.retry_in
+
+
+class GenerationThrottle(TokenBucketThrottle):
+    bucket = TokenBucket('nlp', 'bucket:generate', settings.NLP_GENERATE_BURST, settings.NLP_GENERATE_RATE)
+
+
+class BatchGenerationThrottle(GenerationThrottle):
+    """Each batch item costs as much as a single generate request."""
+
+    def cost(self, request):
+        try:
+            items = json.loads(request.body).get('items')
+        except (ValueError, AttributeError):
+            return 1
+        return max(1, min(len(items), settings.NLP_BATCH_MAX_ITEMS)) if isinstance(items, list) else 1
+
+
+class PracticeThrottle(TokenBucketThrottle):
+    bucket = TokenBucket('nlp', 'bucket:practice', settings.NLP_PRACTICE_BURST, settings.NLP_PRACTICE_RATE)
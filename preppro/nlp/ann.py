@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from .store import normalize_rows
+
+IVF_FILE = 'ivf.npz'
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over an EmbeddingStore.
+
+    Rows are bucketed by their nearest (spherical) k-means centroid and the
+    buckets are kept as one CSR-style pair of arrays: ``list_rows`` holds row
+    ids grouped by bucket and ``list_offsets`` marks where each bucket starts.
+    A query scores the centroids, then only the rows of the ``nprobe`` closest
+    buckets, so search effort trades recall for latency.
+    """
+
+    def __init__(self, centroids, list_offsets, list_rows):
+        self.centroids = normalize_rows(centroids)
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+
+    @classmethod
+    def build(cls, store, n_lists=None, sample_size=None, seed=0, block_rows=65536):
+        from sklearn.cluster import MiniBatchKMeans
+
+        rows = len(store)
+        # k-means needs at least one sample per bucket, so small corpora get fewer buckets
+        n_lists = min(n_lists or max(1, int(4 * np.sqrt(rows))), rows)
+        sample_size = min(rows, max(sample_size or 64 * n_lists, n_lists))
+        rng = np.random.default_rng(seed)
+        sample = store.take(np.sort(rng.choice(rows, sample_size, replace=False)))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, n_init=1, batch_size=4096)
+        kmeans.fit(sample)
+        centroids = normalize_rows(kmeans.cluster_centers_)
+
+        assignments = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, block_rows):
+            block = store.take(np.arange(start, min(start + block_rows, rows)))
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        list_rows = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, list_offsets, list_rows)
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, IVF_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, IVF_FILE)) as data:
+            return cls(data['centroids'], data['list_offsets'], data['list_rows'])
+
+    def save(self, directory):
+        np.savez(
+            os.path.join(directory, IVF_FILE),
+            centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows,
+        )
+
+    def __len__(self):
+        return len(self.list_rows)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def candidates(self, query_vec, nprobe):
+        """Row ids in the ``nprobe`` buckets closest to a normalized ``query_vec``."""
+        nprobe = min(nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query_vec
+        probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        return np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probe
+        ])
@@ -0,0 +1,256 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from questions.models import Question
+from .embedding import DATA_DIR, embedding_service
+from .search import FACET_COLUMNS, facet_value, select_top_k
+from .store import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+BANK_FILE = 'bank.npz'
+
+
+def updated_stamp(value):
+    return value.timestamp() if value is not None else 0.0
+
+
+class BankSnapshot:
+    """Immutable vectors of the question bank, sorted by question id.
+
+    ``updated`` holds each question's ``updated_at`` when it was encoded, so
+    a sync only re-encodes questions that changed since.
+    """
+
+    def __init__(self, ids, updated, vectors, columns):
+        self.ids = ids
+        self.updated = updated
+        self.vectors = vectors
+        self.columns = columns
+
+    @classmethod
+    def empty(cls, dim=0):
+        return cls(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty((0, dim), dtype=np.float32),
+            {name: np.empty(0, dtype=str) for name in FACET_COLUMNS},
+        )
+
+    @classmethod
+    def load(cls, path, model_name):
+        with np.load(path) as data:
+            if str(data['model']) != model_name:
+                raise ValueError(f"Question index at {path} was built with {data['model']}, not {model_name}")
+            return cls(data['ids'], data['updated'], data['vectors'], {name: data[name] for name in FACET_COLUMNS})
+
+    def save(self, path, model_name):
+        # Workers may save concurrently; each writes its own file and renames it into place
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, model=np.array(model_name), ids=self.ids, updated=self.updated, vectors=self.vectors,
+                 **self.columns)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def merge(self, ids, updated, vectors, columns, removed):
+        """New snapshot with ``removed`` dropped and the given rows added or replaced."""
+        keep = ~np.isin(self.ids, np.concatenate([ids, removed]))
+        merged_ids = np.concatenate([self.ids[keep], ids])
+        order = np.argsort(merged_ids, kind='stable')
+        if len(self.vectors) == 0:
+            old_vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        else:
+            old_vectors = self.vectors[keep]
+        if len(vectors) == 0:
+            vectors = np.empty((0, old_vectors.shape[1]), dtype=np.float32)
+        return BankSnapshot(
+            merged_ids[order],
+            np.concatenate([self.updated[keep], updated])[order],
+            np.concatenate([old_vectors, vectors])[order],
+            {name: np.concatenate([self.columns[name][keep], columns[name]])[order] for name in FACET_COLUMNS},
+        )
+
+
+class QuestionBankIndex:
+    """Embedding index over ``questions.Question.question``, kept current incrementally.
+
+    ``schedule`` (called from the model's post_save/post_delete signals)
+    only records the question id. A background thread waits
+    ``flush_interval`` seconds to collect a burst of edits, re-encodes those
+    questions in batches of ``batch_size``, swaps in a new snapshot and saves
+    it to ``bank.npz``. Every ``sync_interval`` seconds the thread also
+    compares ids and ``updated_at`` with the database, which picks up edits
+    made by other workers and changes made while no process was running.
+
+    Nothing happens until the index is first searched in a process; the
+    saved snapshot is then loaded and brought up to date in the background.
+    Searches read whatever snapshot is current and never wait for encoding.
+    """
+
+    def __init__(self, directory, encode_fn, model_name, batch_size=64, flush_interval=1.0, sync_interval=60.0):
+        self.directory = directory
+        self.path = os.path.join(directory, BANK_FILE)
+        self.encode_fn = encode_fn
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.snapshot = BankSnapshot.empty()
+        self.encoded = 0
+        self.removed = 0
+        self.last_sync = None
+        self.error = None
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def started(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def ensure_started(self):
+        """Load the saved snapshot and start the update thread, once per process."""
+        if self.started:
+            return
+        with self._start_lock:
+            if self.started:
+                return
+            self.load()
+            self._thread = threading.Thread(target=self._run, name='nlp-question-bank', daemon=True)
+            self._thread.start()
+
+    def load(self):
+        """Replace the snapshot with the one saved on disk, if it is usable."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            self.snapshot = BankSnapshot.load(self.path, self.model_name)
+            logger.info(f"Loaded {len(self.snapshot)} bank question vectors from {self.path}")
+        except Exception as e:
+            logger.warning(f"Ignoring saved question index: {str(e)}")
+
+    def schedule(self, question_id):
+        """Queue a created, edited or deleted question for re-indexing."""
+        if not self.started:
+            return
+        with self._pending_lock:
+            self._pending.add(question_id)
+        self._wake.set()
+
+    def _run(self):
+        next_sync = 0.0
+        while True:
+            if self._wake.wait(timeout=max(0.0, next_sync - time.monotonic())):
+                # Let a burst of edits accumulate into one batch
+                time.sleep(self.flush_interval)
+            self._wake.clear()
+            with self._pending_lock:
+                pending, self._pending = self._pending, set()
+            try:
+                if time.monotonic() >= next_sync:
+                    pending |= self.stale_ids()
+                    self.last_sync = time.time()
+                    next_sync = time.monotonic() + self.sync_interval
+                if pending:
+                    self.update(pending)
+                self.error = None
+            except Exception as e:
+                logger.error(f"Error updating question index: {str(e)}")
+                self.error = str(e)
+                with self._pending_lock:
+                    self._pending |= pending
+            finally:
+                connection.close()
+
+    def stale_ids(self):
+        """Ids whose vector is missing, outdated or no longer in the bank."""
+        current = dict(
+            (pk, updated_stamp(updated_at))
+            for pk, updated_at in Question.objects.filter(deleted_at__isnull=True).values_list('id', 'updated_at')
+        )
+        snapshot = self.snapshot
+        indexed = dict(zip(snapshot.ids.tolist(), snapshot.updated.tolist()))
+        stale = {pk for pk, stamp in current.items() if indexed.get(pk) != stamp}
+        return stale | (indexed.keys() - current.keys())
+
+    def update(self, question_ids):
+        """Re-encode ``question_ids``; ids missing or soft-deleted in the database are dropped."""
+        started = time.perf_counter()
+        question_ids = sorted(question_ids)
+        rows, vectors = [], []
+        for start in range(0, len(question_ids), self.batch_size):
+            batch = list(
+                Question.objects.filter(id__in=question_ids[start:start + self.batch_size], deleted_at__isnull=True)
+                .values('id', 'question', 'updated_at', *FACET_COLUMNS)
+            )
+            if batch:
+                vectors.append(normalize_rows(self.encode_fn([row['question'] for row in batch])))
+                rows += batch
+        removed = np.array(sorted(set(question_ids) - {row['id'] for row in rows}), dtype=np.int64)
+
+        self.snapshot = self.snapshot.merge(
+            np.array([row['id'] for row in rows], dtype=np.int64),
+            np.array([updated_stamp(row['updated_at']) for row in rows], dtype=np.float64),
+            np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32),
+            {name: np.array([facet_value(row[name] or '') for row in rows], dtype=str) for name in FACET_COLUMNS},
+            removed,
+        )
+        self.encoded += len(rows)
+        self.removed += len(removed)
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.snapshot.save(self.path, self.model_name)
+        logger.info(
+            f"Question index: encoded {len(rows)}, removed {len(removed)}, {len(self.snapshot)} indexed "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+
+    def search(self, query_matrix, k, threshold=None, filters=None):
+        """Ids and scores of the ``k`` best bank questions above ``threshold``, best first.
+
+        Each question scores as its best match over the rows of
+        ``query_matrix`` (the passages of one input). ``filters`` match
+        subject, topic and difficulty like ``CorpusIndex.filter_rows``.
+        """
+        self.ensure_started()
+        snapshot = self.snapshot
+        if len(snapshot) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        mask = np.ones(len(snapshot), dtype=bool)
+        for name, value in (filters or {}).items():
+            if value and name in snapshot.columns:
+                column = snapshot.columns[name]
+                mask &= (column == facet_value(value)) | (column == '')
+        rows = np.flatnonzero(mask)
+        scores = (snapshot.vectors[rows] @ normalize_rows(query_matrix).T).max(axis=1)
+        rows, scores = select_top_k(rows, scores, k, threshold)
+        return snapshot.ids[rows], scores
+
+    def stats(self):
+        return {
+            'started': self.started,
+            'indexed': len(self.snapshot),
+            'pending': len(self._pending),
+            'encoded': self.encoded,
+            'removed': self.removed,
+            'last_sync': self.last_sync,
+            'error': self.error,
+        }
+
+
+question_bank = QuestionBankIndex(
+    settings.NLP_BANK_DIR or os.path.join(DATA_DIR, 'bank'),
+    # Questions just ingested from generated output are usually still in the vector cache
+    embedding_service.encode_cached,
+    embedding_service.model_name,
+    batch_size=settings.NLP_BANK_BATCH_SIZE,
+    flush_interval=settings.NLP_BANK_FLUSH_INTERVAL,
+    sync_interval=settings.NLP_BANK_SYNC_INTERVAL,
+)
@@ -0,0 +1,112 @@
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Groups concurrent encode calls into one model call.
+
+    Callers ``submit`` a list of texts and wait on the returned future. A
+    background thread takes the first waiting request, keeps collecting
+    requests for up to ``max_wait`` seconds or until ``max_batch_size`` texts
+    are queued, then runs ``encode_fn`` once over all of them and hands each
+    caller its slice of the result.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=64, max_wait=0.005, history=1000):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.texts = 0
+        self.batch_sizes = dict.fromkeys([f'<={b}' for b in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}'], 0)
+        self._queue_delays = deque(maxlen=history)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def submit(self, texts):
+        future = Future()
+        if not texts:
+            future.set_result(np.empty((0, 0), dtype=np.float32))
+            return future
+        self._ensure_thread()
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts):
+        return self.submit(texts).result()
+
+    def _ensure_thread(self):
+        # Started lazily so a worker forked from a preloaded parent gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='nlp-microbatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        texts = [text for item_texts, _, _ in batch for text in item_texts]
+        self._record(batch, started)
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            logger.error(f"Batched encode of {len(texts)} texts failed: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future, _ in batch:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def _record(self, batch, started):
+        size = sum(len(item_texts) for item_texts, _, _ in batch)
+        label = next((f'<={b}' for b in BATCH_SIZE_BUCKETS if size <= b), f'>{BATCH_SIZE_BUCKETS[-1]}')
+        with self._stats_lock:
+            self.batches += 1
+            self.texts += size
+            self.batch_sizes[label] += 1
+            self._queue_delays.extend(started - submitted for _, _, submitted in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            delays = np.asarray(self._queue_delays) * 1000
+        return {
+            'batches': self.batches,
+            'texts': self.texts,
+            'mean_batch_size': round(self.texts / self.batches, 2) if self.batches else 0,
+            'batch_sizes': dict(self.batch_sizes),
+            'queue_delay_ms_p50': round(float(np.percentile(delays, 50)), 3) if len(delays) else None,
+            'queue_delay_ms_p99': round(float(np.percentile(delays, 99)), 3) if len(delays) else None,
+            'queued': self._queue.qsize(),
+        }
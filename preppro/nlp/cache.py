@@ -0,0 +1,372 @@
+import time
+import uuid
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU bounded by entry count, total bytes and TTL.
+
+    Sizes are measured as the pickled size of each value, which is what the
+    shared tier stores too.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 2**20, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None, ttl=None):
+        size = size if size is not None else len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class TieredCache:
+    """In-process LRU in front of a shared Django cache.
+
+    The shared tier (``settings.CACHES[alias]``) is visible to every worker, and
+    to every node if the backend is. Errors from it are logged and treated as
+    misses so a broken cache never fails a request.
+    """
+
+    def __init__(self, alias, local, ttl):
+        self.alias = alias
+        self.local = local
+        self.ttl = ttl
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            value = self.shared.get(key, _MISSING)
+        except Exception as e:
+            logger.warning(f"Shared cache get failed: {str(e)}")
+            self.shared_errors += 1
+            return default
+        if value is _MISSING:
+            self.shared_misses += 1
+            return default
+        self.shared_hits += 1
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        try:
+            self.shared.set(key, value, timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"Shared cache set failed: {str(e)}")
+            self.shared_errors += 1
+
+    def stats(self):
+        return {
+            'local': self.local.stats(),
+            'shared': {
+                'alias': self.alias,
+                'hits': self.shared_hits,
+                'misses': self.shared_misses,
+                'errors': self.shared_errors,
+            },
+        }
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result.
+
+    Within a process, callers of a key that is already being computed wait
+    on the leader's future. Across processes, the leader takes a lock entry
+    in the shared tier of ``cache`` (``cache.add`` is atomic on the
+    Memcached/Redis/database backends). Leaders in other processes that
+    find it taken poll ``cache`` for the result until the lock goes away.
+    If no result appears, for example because the owner's result was not
+    cacheable, they compute it themselves.
+
+    ``stream`` does the same for a computation that yields its values as it
+    goes. The shared result is the list of values either way, so ``run``
+    and ``stream`` callers of a key join each other. A leader whose stream is
+    closed before it finishes hands its callers a None result, and they
+    start over.
+    """
+
+    def __init__(self, cache, lock_ttl=15, poll_interval=0.05):
+        self.cache = cache
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_waits = 0
+        self.remote_hits = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, fn, deadline=None):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            result = future.result()
+            return result if result is not None else self.run(key, fn, deadline)
+
+        try:
+            result = self._lead(key, fn, deadline)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stream(self, key, fn, deadline=None):
+        """Like ``run`` for an ``fn`` returning an iterator of ``(tag, value)`` pairs.
+
+        The leader's pairs are passed on as they are produced. Callers that
+        joined it get its values once it has finished, tagged ``'coalesced'``;
+        values another process stored in the cache are tagged ``'cache'``.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            result = future.result()
+            if result is None:
+                yield from self.stream(key, fn, deadline)
+                return
+            for value in result:
+                yield 'coalesced', value
+            return
+
+        values = []
+        try:
+            for tag, value in self._lead_stream(key, fn, deadline):
+                values.append(value)
+                yield tag, value
+        except GeneratorExit:
+            future.set_result(None)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(values)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _lead_stream(self, key, fn, deadline):
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.cache.shared.add(lock_key, token, timeout=self.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Shared lock failed, computing without it: {str(e)}")
+            yield from fn()
+            return
+
+        if not acquired:
+            result = self._wait_for_owner(key, lock_key, deadline)
+            if result is not None:
+                for value in result:
+                    yield 'cache', value
+                return
+            yield from fn()
+            return
+
+        try:
+            yield from fn()
+        finally:
+            try:
+                if self.cache.shared.get(lock_key) == token:
+                    self.cache.shared.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Shared lock release failed: {str(e)}")
+
+    def _lead(self, key, fn, deadline):
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.cache.shared.add(lock_key, token, timeout=self.lock_ttl)
+        except Exception as e:
+            logger.warning(f"Shared lock failed, computing without it: {str(e)}")
+            return fn()
+
+        if not acquired:
+            result = self._wait_for_owner(key, lock_key, deadline)
+            if result is not None:
+                return result
+            return fn()
+
+        try:
+            return fn()
+        finally:
+            try:
+                if self.cache.shared.get(lock_key) == token:
+                    self.cache.shared.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"Shared lock release failed: {str(e)}")
+
+    def _wait_for_owner(self, key, lock_key, deadline):
+        self.remote_waits += 1
+        expires_at = time.monotonic() + self.lock_ttl
+        while time.monotonic() < expires_at and (deadline is None or not deadline.expired):
+            time.sleep(self.poll_interval)
+            result = self.cache.get(key)
+            if result is not None:
+                self.remote_hits += 1
+                return result
+            try:
+                if self.cache.shared.get(lock_key) is None:
+                    # The owner may have stored its result just before releasing
+                    return self.cache.get(key)
+            except Exception:
+                return None
+        return None
+
+    def stats(self):
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'remote_waits': self.remote_waits,
+            'remote_hits': self.remote_hits,
+            'in_flight': len(self._inflight),
+        }
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def mcq_cache_key(text, num_questions, difficulty, corpus_version, subject='', topic=''):
+    """Key for a generate_mcqs result; a new corpus version never serves old results."""
+    filters = text_hash(f"{subject}\0{topic}")[:16]
+    # v3: cloze questions no longer blank half a phrase; drop results built before that
+    return f"mcq:v3:{corpus_version or 'base'}:{difficulty}:{num_questions}:{filters}:{text_hash(text)}"
+
+
+def normalize_text(text):
+    """Collapse whitespace and case; the MiniLM tokenizer is uncased, so the embedding is unchanged."""
+    return ' '.join(text.split()).lower()
+
+
+class VectorCache:
+    """Cache of input-text embeddings keyed by normalized-text hash and model.
+
+    Vectors are stored as float16 (768 bytes for MiniLM) and widened back to
+    float32 on the way out. ``store`` is an ``LRUCache`` or, to persist vectors
+    across restarts and share them between workers, a ``TieredCache``.
+    """
+
+    def __init__(self, store, model_name):
+        self.store = store
+        self.model_name = model_name
+
+    def key(self, text):
+        return f"vec:v1:{self.model_name}:{text_hash(normalize_text(text))}"
+
+    def get_many(self, texts):
+        """Cached float32 vectors for ``texts``; None where missing."""
+        vectors = []
+        for text in texts:
+            vec = self.store.get(self.key(text))
+            vectors.append(vec.astype(np.float32) if vec is not None else None)
+        return vectors
+
+    def set_many(self, texts, vectors):
+        for text, vec in zip(texts, vectors):
+            self.store.set(self.key(text), np.asarray(vec, dtype=np.float16))
+
+    def stats(self):
+        return self.store.stats()
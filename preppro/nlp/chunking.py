@@ -0,0 +1,52 @@
+import re
+import numpy as np
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])|\n\s*\n|\n(?=\s*(?:[-*\u2022]|\d+[.)])\s)')
+_LIST_MARKER = re.compile(r'^(?:[-*\u2022]|\d+[.)])\s+')
+_ABBREVIATION = re.compile(r'\b(?:Dr|Mr|Mrs|Ms|Prof|St|Fig|No|vs|etc|e\.g|i\.e|approx)\.$', re.IGNORECASE)
+
+
+def split_passages(text, max_words=150, overlap=30, max_passages=16):
+    """Split ``text`` into overlapping windows of at most ``max_words`` words.
+
+    all-MiniLM-L6-v2 truncates input at 256 word pieces (roughly 190 English
+    words), so without this only the start of a pasted chapter is embedded.
+    Text that already fits is returned unchanged as the only passage, which
+    keeps its vector-cache key the same as before chunking. Very long texts
+    are cut to ``max_passages`` evenly spaced windows so the encode cost per
+    request stays bounded.
+    """
+    words = text.split()
+    if len(words) <= max_words:
+        return [text]
+
+    stride = max_words - overlap
+    starts = list(range(0, len(words) - max_words + stride, stride))
+    if len(starts) > max_passages:
+        picks = np.unique(np.linspace(0, len(starts) - 1, max_passages).round().astype(int))
+        starts = [starts[i] for i in picks]
+    return [' '.join(words[start:start + max_words]) for start in starts]
+
+
+def split_sentences(text, min_words=4, max_sentences=None):
+    """Sentences of ``text`` with at least ``min_words`` words, in order.
+
+    Splits after ``.``, ``!`` or ``?`` followed by a capitalised word, at
+    blank lines and before bullet or numbered list items. Shorter fragments
+    (headings, figure labels) are dropped. Past ``max_sentences`` the rest of
+    the text is ignored.
+    """
+    sentences, carry = [], ''
+    for part in _SENTENCE_END.split(text):
+        part = ' '.join(part.split())
+        # "Dr. Smith" and "e.g. Water" are not sentence ends
+        if _ABBREVIATION.search(part):
+            carry = f"{carry} {part}".strip()
+            continue
+        sentence = _LIST_MARKER.sub('', f"{carry} {part}".strip())
+        carry = ''
+        if len(sentence.split()) >= min_words:
+            sentences.append(sentence)
+            if max_sentences is not None and len(sentences) >= max_sentences:
+                break
+    return sentences
@@ -0,0 +1,206 @@
+import re
+from collections import defaultdict
+import numpy as np
+from .chunking import split_sentences
+from .distractors import answer_type, normalize_answer
+
+BLANK = '_____'
+_WORD = re.compile(r"[a-z0-9][a-z0-9-]*")
+_CLAUSE_BREAK = re.compile(r"[^\w\s-]")
+# Words common in textbook prose that make poor answers
+FILLER_WORDS = [
+    'also', 'called', 'known', 'example', 'examples', 'figure', 'shown', 'used', 'use', 'uses', 'using', 'include',
+    'includes', 'including', 'different', 'important', 'many', 'type', 'types', 'way', 'ways', 'process', 'form',
+    'forms', 'like', 'make', 'makes', 'made', 'occur', 'occurs', 'takes', 'place', 'number', 'following',
+]
+
+
+def phrase_pattern(phrase):
+    return re.compile(r'\b' + r'\s+'.join(map(re.escape, phrase.split())) + r'\b', re.IGNORECASE)
+
+
+def key_phrases(sentences, max_ngram=2):
+    """Terms and phrases of ``sentences`` ranked by summed TF-IDF, best first.
+
+    Each sentence is a document, so a phrase scores high when it is
+    prominent in a few sentences rather than spread thinly over all of them.
+    Scores are multiplied by the phrase's word count so "carbon dioxide"
+    outranks "carbon". Returns the phrases, their scores and the sentence x
+    phrase matrix.
+    """
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(
+        ngram_range=(1, max_ngram), stop_words=list(ENGLISH_STOP_WORDS.union(FILLER_WORDS)), sublinear_tf=True,
+        token_pattern=r"(?u)\b[A-Za-z][A-Za-z-]{2,}\b",
+    )
+    matrix = vectorizer.fit_transform(sentences).tocsc()
+    phrases = vectorizer.get_feature_names_out()
+    # Stop words are dropped before n-grams are formed; keep only phrases that occur verbatim
+    ngrams = set()
+    for clause in _CLAUSE_BREAK.split(' '.join(sentences).lower()):
+        words = _WORD.findall(clause)
+        ngrams.update(' '.join(words[i:i + n]) for n in range(1, max_ngram + 1) for i in range(len(words) - n + 1))
+    verbatim = np.flatnonzero([phrase in ngrams for phrase in phrases.tolist()])
+    phrases, matrix = phrases[verbatim], matrix[:, verbatim]
+    lengths = np.array([phrase.count(' ') + 1 for phrase in phrases.tolist()], dtype=np.float64)
+    scores = np.asarray(matrix.sum(axis=0)).ravel() * lengths
+    order = np.argsort(-scores, kind='stable')
+    return phrases[order], scores[order], matrix[:, order]
+
+
+def similar_words(a, b):
+    """Same phrase up to a plural or similar suffix ("plant" and "plants")."""
+    a, b = normalize_answer(a), normalize_answer(b)
+    return a.startswith(b[:-1]) or b.startswith(a[:-1]) if min(len(a), len(b)) > 3 else a == b
+
+
+def content_words(text):
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    return {word for word in _WORD.findall(text.lower()) if word not in ENGLISH_STOP_WORDS}
+
+
+def shares_word(words, other_words):
+    return any(similar_words(a, b) for a in words for b in other_words)
+
+
+def usable_option(option, options, taken):
+    """An option with a word of its own, unlike the options so far and sharing no word with ``taken``."""
+    words = content_words(option)
+    return bool(words) and not shares_word(words, taken) and not any(similar_words(option, other) for other in options)
+
+
+def weak_phrases(sentences, phrases, sentence_counts):
+    """Key phrases that make poor answers or options.
+
+    A phrase is weak when it cuts through a phrase the text uses at least
+    as often: in "Plants absorb carbon dioxide", "absorb carbon" loses to
+    "carbon dioxide", which it overlaps. A neighbour on the right wins ties
+    because English noun phrases end in their head noun, and a single word
+    loses ties on either side since it is then only ever half of that
+    phrase. Phrases ending in a past participle ("oxygen produced") are weak
+    too, as they are rarely noun phrases.
+    """
+    left, right = defaultdict(set), defaultdict(set)
+    for clause in _CLAUSE_BREAK.split(' '.join(sentences).lower()):
+        words = _WORD.findall(clause)
+        for start in range(len(words)):
+            for end in (start + 1, start + 2):
+                if end > len(words):
+                    break
+                phrase = ' '.join(words[start:end])
+                if start > 0:
+                    left[phrase].add(f"{words[start - 1]} {words[start]}")
+                if end < len(words):
+                    right[phrase].add(f"{words[end - 1]} {words[end]}")
+
+    weak = set()
+    for phrase in phrases:
+        last = phrase.rsplit(' ', 1)[-1]
+        if len(last) > 4 and last.endswith('ed') and not last.endswith('eed'):
+            weak.add(phrase)
+        elif overshadowed(phrase, left[phrase], right[phrase], sentence_counts):
+            weak.add(phrase)
+    return weak
+
+
+def overshadowed(phrase, left, right, sentence_counts):
+    """True if a phrase overlapping ``phrase`` on the ``left`` or ``right`` is used at least as often."""
+    count = sentence_counts.get(phrase, 0)
+    single = ' ' not in phrase
+    if any(sentence_counts.get(other, 0) > count or (single and sentence_counts.get(other, 0) == count) for other in left):
+        return True
+    return any(sentence_counts.get(other, 0) >= count > 0 for other in right)
+
+
+def blank_overshadowed(sentence, match, phrase, sentence_counts):
+    """``overshadowed`` for one occurrence; a single word is never blanked out of a key phrase ("light _____")."""
+    words = phrase.split()
+    before = re.search(r"([a-z0-9][a-z0-9-]*)\s+$", sentence[:match.start()].lower())
+    after = re.match(r"\s+([a-z0-9][a-z0-9-]*)", sentence[match.end():].lower())
+    left = [f"{before.group(1)} {words[0]}"] if before else []
+    right = [f"{words[-1]} {after.group(1)}"] if after else []
+    if len(words) == 1:
+        return any(sentence_counts.get(other, 0) > 0 for other in left + right)
+    return overshadowed(phrase, left, right, sentence_counts)
+
+
+def cloze_mcqs(text, num_questions, difficulty, options_fn=None, min_words=6):
+    """Fill-in-the-blank MCQs built from the key phrases of ``text``.
+
+    Each question blanks the highest-ranked phrase left out of one sentence;
+    a sentence is used at most once, and phrases overlapping an earlier
+    answer or that are ``weak_phrases`` are
+    skipped. ``options_fn(answer)`` returns the answer plus distractors;
+    when it comes up short, other key phrases of the same ``answer_type``
+    from the text fill the options. An option may not share a word with the
+    answer or with the rest of the sentence, which would give the answer
+    away. Questions that can't get four options are skipped. The dicts have
+    the same keys as the semantic search results.
+    """
+    sentences = split_sentences(text, min_words=min_words)
+    if not sentences or num_questions <= 0:
+        return []
+    try:
+        phrases, scores, matrix = key_phrases(sentences)
+    except ValueError:
+        # Nothing but stop words
+        return []
+
+    top_score = scores[0] if len(scores) and scores[0] > 0 else 1.0
+    sentence_counts = dict(zip(phrases.tolist(), np.diff(matrix.indptr).tolist()))
+    weak = weak_phrases(sentences, phrases.tolist(), sentence_counts)
+    used_sentences, answers, results = set(), [], []
+    for column, (phrase, score) in enumerate(zip(phrases.tolist(), scores.tolist())):
+        if len(results) >= num_questions:
+            break
+        if phrase in weak or any(phrase in answer or answer in phrase for answer in answers):
+            continue
+
+        weights = matrix[:, column].toarray().ravel()
+        for row in np.argsort(-weights, kind='stable').tolist():
+            if weights[row] <= 0:
+                break
+            if row in used_sentences:
+                continue
+            matches = list(phrase_pattern(phrase).finditer(sentences[row]))
+            # A second occurrence in the same sentence would give the answer away
+            if len(matches) != 1:
+                continue
+            match = matches[0]
+            if blank_overshadowed(sentences[row], match, phrase, sentence_counts):
+                continue
+
+            answer = match.group(0)
+            # Words an option must not repeat: the answer's own and those around the blank
+            taken = content_words(answer) | content_words(sentences[row][:match.start()] + ' ' + sentences[row][match.end():])
+            options = [answer]
+            for option in (options_fn(answer) if options_fn is not None else []):
+                if option != answer and usable_option(option, options, taken):
+                    options.append(option)
+            for other in phrases.tolist():
+                if len(options) >= 4:
+                    break
+                if other in weak or answer_type(other) != answer_type(answer) or not usable_option(other, options, taken):
+                    continue
+                # Use the spelling from the text ("ATP", not "atp")
+                options.append(phrase_pattern(other).search(text).group(0))
+            if len(options) < 4:
+                break
+
+            options = options[:4]
+            np.random.shuffle(options)
+            results.append({
+                "question_text": sentences[row][:match.start()] + BLANK + sentences[row][match.end():],
+                "options": options,
+                "correct_answer": answer,
+                "support": sentences[row],
+                "relevance_score": round(score / top_score, 3),
+                "difficulty": difficulty,
+            })
+            used_sentences.add(row)
+            answers.append(phrase)
+            break
+
+    return results
@@ -0,0 +1,69 @@
+import os
+import re
+
+CURRENT_NAME = 'CURRENT'
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+def version_dir(root, version):
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"Invalid corpus version name: {version!r}")
+    return os.path.join(root, version)
+
+
+def list_versions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if VERSION_PATTERN.match(name) and os.path.isdir(os.path.join(root, name))
+    )
+
+
+def read_current(root):
+    """Name of the active corpus version under ``root``, or None if none is set."""
+    try:
+        with open(os.path.join(root, CURRENT_NAME)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activate(root, version):
+    """Atomically point ``root/CURRENT`` at ``version``.
+
+    Workers read the pointer, never the directories being written, so a version
+    only becomes visible once it is complete and this rename has happened.
+    """
+    path = version_dir(root, version)
+    if not os.path.exists(os.path.join(path, 'train.csv')):
+        raise ValueError(f"Corpus version {version} has no train.csv")
+    tmp_path = os.path.join(root, f'.{CURRENT_NAME}.{os.getpid()}')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(root, CURRENT_NAME))
+
+
+def build_dir(root, default_dir, data_dir=None, version=None):
+    """Directory an index build may write into: ``data_dir``, version ``version``, or ``default_dir``.
+
+    The active version is never modified: workers have its files mapped and
+    only load a version when the pointer moves, so an index for it goes into
+    a copy under a new version name that is then activated. Without either
+    argument the unversioned ``default_dir`` is used, unless a version is
+    active.
+    """
+    if data_dir and version:
+        raise ValueError("Pass a data directory or a corpus version, not both")
+    if version:
+        data_dir = version_dir(root, version)
+    current = read_current(root)
+    if data_dir is None:
+        if current is not None:
+            raise ValueError(f"Corpus version {current} is active and versions are immutable; "
+                             f"build into a copy with --corpus-version and switch to it")
+        return default_dir
+    if current is not None and os.path.realpath(data_dir) == os.path.realpath(version_dir(root, current)):
+        raise ValueError(f"Corpus version {current} is active and versions are immutable; "
+                         f"build into a copy with --corpus-version and switch to it")
+    return data_dir
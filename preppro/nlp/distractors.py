@@ -0,0 +1,130 @@
+import os
+import re
+import numpy as np
+from .rerank import mmr_order
+from .search import select_top_k
+from .store import normalize_rows
+
+DISTRACTOR_FILE = 'distractors.npz'
+ANSWER_COLUMNS = ['correct_answer', 'distractor1', 'distractor2', 'distractor3']
+
+_NUMBER = re.compile(r'^[-+]?\d[\d,]*(\.\d+)?\s*(?P<unit>\D.*)?$')
+
+
+def normalize_answer(text):
+    return ' '.join(str(text).lower().split())
+
+
+def answer_type(text):
+    """Coarse kind of an answer string; distractors are drawn from the same kind.
+
+    Numbers are grouped by unit ("12 km" with "3 km", not with "3 kg"), other
+    answers by length: single words, short phrases and longer sentences.
+    """
+    text = normalize_answer(text)
+    match = _NUMBER.match(text)
+    if match:
+        return 'number:' + (match.group('unit') or '').strip()
+    words = len(text.split())
+    if words == 1:
+        return 'word'
+    if words <= 4:
+        return 'phrase'
+    return 'sentence'
+
+
+class DistractorIndex:
+    """Embedded vocabulary of answer strings for building MCQ options locally.
+
+    The vocabulary is every distinct correct answer and distractor in the
+    corpus (plus the question bank's options), embedded once by
+    ``build_distractor_index``. ``distractors`` ranks the answers of the same
+    ``answer_type`` by cosine similarity to the correct answer. It drops those
+    above ``max_similarity`` (synonyms and rewordings of the answer itself) and
+    orders the rest with MMR so the picks don't repeat each other.
+    """
+
+    def __init__(self, answers, vectors, max_similarity=0.9, diversity=0.3):
+        self.answers = answers
+        self.vectors = vectors
+        self.max_similarity = max_similarity
+        self.diversity = diversity
+        types = np.array([answer_type(answer) for answer in answers.tolist()], dtype=str)
+        self.by_type = {kind: np.flatnonzero(types == kind) for kind in np.unique(types).tolist()}
+        self.positions = {normalize_answer(answer): i for i, answer in enumerate(answers.tolist())}
+
+    @staticmethod
+    def vocabulary(texts):
+        """Distinct non-empty answers, first spelling kept."""
+        unique = {}
+        for text in texts:
+            text = str(text).strip()
+            if text and text.lower() != 'nan':
+                unique.setdefault(normalize_answer(text), text)
+        return list(unique.values())
+
+    @classmethod
+    def build(cls, texts, encode_fn, batch_size=256, **kwargs):
+        answers = cls.vocabulary(texts)
+        vectors = [
+            normalize_rows(encode_fn(answers[start:start + batch_size]))
+            for start in range(0, len(answers), batch_size)
+        ]
+        return cls(np.array(answers, dtype=str), np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32),
+                   **kwargs)
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, DISTRACTOR_FILE))
+
+    @classmethod
+    def load(cls, directory, **kwargs):
+        with np.load(os.path.join(directory, DISTRACTOR_FILE)) as data:
+            return cls(data['answers'], data['vectors'], **kwargs)
+
+    def save(self, directory):
+        np.savez(os.path.join(directory, DISTRACTOR_FILE), answers=self.answers, vectors=self.vectors)
+
+    def __len__(self):
+        return len(self.answers)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def distractors(self, answer, n=3, exclude=(), encode_fn=None):
+        """Up to ``n`` plausible wrong options for ``answer``, most plausible first.
+
+        Answers outside the vocabulary are embedded with ``encode_fn``; without
+        one they get no distractors. Options in ``exclude`` are never returned.
+        """
+        key = normalize_answer(answer)
+        if not key or n <= 0:
+            return []
+        position = self.positions.get(key)
+        if position is not None:
+            answer_vec = self.vectors[position]
+        elif encode_fn is not None:
+            answer_vec = normalize_rows(encode_fn([answer])).ravel()
+        else:
+            return []
+
+        rows = self.by_type.get(answer_type(answer))
+        if rows is None or len(rows) <= n:
+            rows = np.arange(len(self))
+        scores = self.vectors[rows] @ answer_vec
+        rows, scores = select_top_k(rows[scores < self.max_similarity], scores[scores < self.max_similarity], n * 8)
+
+        taken = {key} | {normalize_answer(option) for option in exclude}
+        keep = []
+        for i, row in enumerate(rows.tolist()):
+            candidate = normalize_answer(self.answers[row])
+            # "carbon dioxide" is not a wrong answer to "carbon dioxide gas"
+            if candidate in taken or candidate in key or key in candidate:
+                continue
+            taken.add(candidate)
+            keep.append(i)
+        rows, scores = rows[keep], scores[keep]
+
+        order = mmr_order(scores, self.vectors[rows], 1 - self.diversity)[:n]
+        return [str(self.answers[row]) for row in rows[order]]
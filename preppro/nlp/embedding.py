@@ -0,0 +1,456 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from django.conf import settings
+from . import corpus
+from .batching import MicroBatcher
+from .cache import LRUCache, TieredCache, VectorCache
+from .inference import InferenceClient
+from .ann import IVF_FILE, IVFIndex
+from .distractors import DISTRACTOR_FILE, DistractorIndex
+from .lexical import BM25_FILE, BM25Index
+from .manifest import load_manifest, verify_manifest
+from .resilience import Deadline
+from .search import CorpusIndex
+from .store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DATA_DIR = os.path.join(settings.BASE_DIR, 'nlp', 'data')
+
+
+def load_corpus_index(directory, model_name):
+    """Read one corpus directory (train.csv plus vectors) into a CorpusIndex."""
+    import pandas as pd
+
+    csv_path = os.path.join(directory, 'train.csv')
+    embedding_file = os.path.join(directory, 'embeddings.npy')
+    store_dir = os.path.join(directory, 'store')
+
+    logger.info(f"Loading CSV from: {csv_path}")
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"CSV file not found at {csv_path}")
+    df = pd.read_csv(csv_path)
+
+    # Prefer the memory-mapped store (shared page cache across workers)
+    if EmbeddingStore.exists(store_dir):
+        logger.info(f"Mapping embedding store from: {store_dir}")
+        embeddings = EmbeddingStore.open(store_dir)
+        vector_files = ['store/vectors.npy'] + (['store/scales.npy'] if embeddings.scales is not None else [])
+    else:
+        logger.info(f"Loading embeddings from: {embedding_file}")
+        if not os.path.exists(embedding_file):
+            raise FileNotFoundError(f"Embeddings file not found at {embedding_file}")
+        embeddings = np.load(embedding_file)
+        vector_files = ['embeddings.npy']
+
+    # Verify data shapes
+    if len(df) != len(embeddings):
+        raise ValueError(f"Data mismatch: CSV has {len(df)} rows but embeddings has {len(embeddings)} vectors")
+
+    ann = None
+    if IVFIndex.exists(directory):
+        logger.info(f"Loading IVF index from: {directory}")
+        ann = IVFIndex.load(directory)
+
+    lexical = None
+    if settings.NLP_LEXICAL_PREFILTER and BM25Index.exists(directory):
+        logger.info(f"Loading BM25 index from: {directory}")
+        lexical = BM25Index.load(directory)
+
+    distractors = None
+    if DistractorIndex.exists(directory):
+        logger.info(f"Loading distractor vocabulary from: {directory}")
+        distractors = DistractorIndex.load(
+            directory, max_similarity=settings.NLP_DISTRACTOR_MAX_SIMILARITY, diversity=settings.NLP_MMR_DIVERSITY,
+        )
+        if len(distractors) and distractors.dim != embeddings.shape[1]:
+            raise ValueError(f"Distractor vectors have dimension {distractors.dim} but the corpus has {embeddings.shape[1]}")
+
+    manifest = load_manifest(directory)
+    if manifest is not None:
+        if ann is not None and IVF_FILE in manifest['files']:
+            vector_files.append(IVF_FILE)
+        if lexical is not None and BM25_FILE in manifest['files']:
+            vector_files.append(BM25_FILE)
+        if distractors is not None and DISTRACTOR_FILE in manifest['files']:
+            vector_files.append(DISTRACTOR_FILE)
+        verify_manifest(
+            directory, manifest, model_name, len(df), embeddings.shape[1],
+            ['train.csv'] + vector_files, checksums=settings.NLP_VERIFY_CHECKSUMS,
+        )
+    else:
+        logger.warning(f"No manifest in {directory}, skipping corpus verification")
+
+    return CorpusIndex.from_dataframe(
+        df, embeddings, ann=ann, nprobe=settings.NLP_ANN_NPROBE, lexical=lexical,
+        lexical_candidates=settings.NLP_LEXICAL_CANDIDATES, lexical_min_candidates=settings.NLP_LEXICAL_MIN_CANDIDATES,
+        distractors=distractors,
+    )
+
+
+class EmbeddingService:
+    """SentenceTransformer model plus the MCQ corpus, loaded on first use.
+
+    Importing this module is cheap: torch, the model weights and the corpus are
+    only loaded by the first ``ensure_loaded()`` (called from every accessor) or
+    by an explicit ``warmup()``. Loading happens once per process under a lock,
+    so concurrent first requests wait for the same load instead of racing it.
+    The ``encode`` methods only need the model (``ensure_model()``), so they
+    work without a corpus. Callers with a time budget pass ``timeout``: the
+    first load then runs on a background thread and they give up waiting
+    for it when the budget runs out, so a cold worker falls back instead of
+    holding the request for the whole load.
+
+    The corpus is read from the version named by ``data/corpus/CURRENT`` when
+    that pointer exists, otherwise from ``data/`` itself. Accessing ``index``
+    re-reads the pointer at most every ``NLP_CORPUS_CHECK_INTERVAL`` seconds;
+    a new version is loaded on a background thread and swapped in with a
+    single reference assignment, so requests that already hold the old index
+    finish on it. A worker whose first load failed tries again once the
+    pointer names a different version.
+
+    With ``NLP_INFERENCE_SOCKET`` set the model is not loaded here at all:
+    encoding goes to the ``run_inference_server`` process over that socket
+    and this process only maps the corpus.
+    """
+
+    UNLOADED = 'unloaded'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, model_name=EMBEDDING_MODEL, data_dir=DATA_DIR):
+        self.model_name = model_name
+        self.data_dir = data_dir
+        self.corpus_root = os.path.join(data_dir, 'corpus')
+        self.state = self.UNLOADED
+        self.error = None
+        self.load_time = None
+        self.loaded_at = None
+        self.corpus_version = None
+        self.reload_error = None
+        self.model_error = None
+        self._model = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._last_check = 0.0
+        self._failed_version = None
+        self._load_thread = None
+        self._executor = None
+        self._executor_pid = None
+        self.client = InferenceClient(settings.NLP_INFERENCE_SOCKET, settings.NLP_INFERENCE_TIMEOUT) if settings.NLP_INFERENCE_SOCKET else None
+        self.vector_cache = self._build_vector_cache()
+        self.batcher = MicroBatcher(
+            self._encode_texts,
+            max_batch_size=settings.NLP_MICROBATCH_MAX_SIZE,
+            max_wait=settings.NLP_MICROBATCH_MAX_WAIT_MS / 1000,
+        )
+
+    def _build_vector_cache(self):
+        local = LRUCache(settings.NLP_VECTOR_CACHE_MAX_ENTRIES, settings.NLP_VECTOR_CACHE_MAX_BYTES)
+        if settings.NLP_VECTOR_CACHE_PERSIST:
+            return VectorCache(TieredCache('nlp', local, settings.NLP_VECTOR_CACHE_TTL), self.model_name)
+        return VectorCache(local, self.model_name)
+
+    @property
+    def is_ready(self):
+        return self.state == self.READY
+
+    def corpus_dir(self, version=None):
+        """Directory of ``version``, or of the active corpus when no version is given."""
+        version = version or corpus.read_current(self.corpus_root)
+        if version is None:
+            return self.data_dir
+        return corpus.version_dir(self.corpus_root, version)
+
+    def active_version(self):
+        """Corpus version serving requests, without forcing a load."""
+        if self.is_ready:
+            return self.corpus_version
+        return corpus.read_current(self.corpus_root)
+
+    def ensure_loaded(self, timeout=None):
+        """Load the model and corpus if needed. Returns True when usable.
+
+        With ``timeout`` a load is started in the background and waited on
+        for at most that many seconds.
+        """
+        if self.state == self.READY:
+            return True
+        if self.state == self.FAILED:
+            self._retry_on_new_version()
+        if timeout is not None:
+            if self.state in (self.UNLOADED, self.LOADING):
+                self._load_in_background().join(timeout)
+            return self.state == self.READY
+        with self._lock:
+            if self.state == self.UNLOADED:
+                self._load()
+        return self.state == self.READY
+
+    def ensure_model(self, timeout=None):
+        """Load only the encoder if needed. Returns True when texts can be encoded.
+
+        Encoding doesn't need the MCQ corpus, so the question bank and
+        summaries keep working when the corpus is missing or failed to load.
+        A failed model load is not retried until ``warmup(force=True)``.
+        ``timeout`` bounds the wait for a first load as in ``ensure_loaded``.
+        """
+        if self.client is not None or self._model is not None:
+            return True
+        if timeout is not None and self.state in (self.UNLOADED, self.LOADING):
+            # The background load brings up the model before the corpus
+            self._load_in_background().join(timeout)
+            return self._model is not None
+        with self._lock:
+            if self._model is None and self.model_error is None:
+                try:
+                    self._model = self._load_model()
+                except Exception as e:
+                    logger.error(f"Error loading model: {str(e)}")
+                    self.model_error = str(e)
+        return self._model is not None
+
+    def _load_in_background(self):
+        """The thread running the first load, started unless one is already running."""
+        with self._reload_lock:
+            if self._load_thread is None or not self._load_thread.is_alive():
+                self._load_thread = threading.Thread(target=self.ensure_loaded, name='nlp-load', daemon=True)
+                self._load_thread.start()
+            return self._load_thread
+
+    def _retry_on_new_version(self):
+        """Allow another load once the CURRENT pointer names a version other than the one that failed."""
+        now = time.monotonic()
+        if now - self._last_check < settings.NLP_CORPUS_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        version = corpus.read_current(self.corpus_root)
+        if version is not None and version != self._failed_version:
+            with self._lock:
+                if self.state == self.FAILED:
+                    logger.info(f"Corpus pointer moved to {version}, retrying the failed load")
+                    self.state = self.UNLOADED
+
+    def warmup(self, force=False):
+        """Load eagerly, e.g. from a post-fork hook. ``force`` retries a failed load."""
+        if force:
+            with self._lock:
+                self.model_error = None
+                if self.state == self.FAILED:
+                    self.state = self.UNLOADED
+        return self.ensure_loaded()
+
+    def _load(self):
+        self.state = self.LOADING
+        started = time.perf_counter()
+        version = corpus.read_current(self.corpus_root)
+        try:
+            if self.client is None and self._model is None:
+                try:
+                    self._model = self._load_model()
+                except Exception as e:
+                    self.model_error = str(e)
+                    raise
+
+            index = load_corpus_index(self.corpus_dir(version), self.model_name)
+            self._index = index
+            self.corpus_version = version
+            self._last_check = time.monotonic()
+            self.error = None
+            self._failed_version = None
+            self.state = self.READY
+            logger.info(f"Successfully loaded {len(index)} questions and embeddings (corpus version {version})")
+        except Exception as e:
+            logger.error(f"Error loading model or data: {str(e)}")
+            self.error = str(e)
+            self._failed_version = version
+            self._last_check = time.monotonic()
+            self.state = self.FAILED
+        finally:
+            self.load_time = time.perf_counter() - started
+            self.loaded_at = time.time()
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        logger.info("Loading sentence transformer model...")
+        return SentenceTransformer(self.model_name)
+
+    def _encode_texts(self, texts):
+        if self.client is None:
+            return self._model.encode(texts, convert_to_numpy=True)
+        try:
+            return self.client.encode(texts)
+        except OSError as e:
+            if not settings.NLP_INFERENCE_FALLBACK:
+                raise
+            logger.warning(f"Inference server unreachable ({str(e)}), encoding in-process")
+        with self._lock:
+            if self._model is None:
+                self._model = self._load_model()
+        return self._model.encode(texts, convert_to_numpy=True)
+
+    def check_for_new_version(self):
+        """Start a background reload if the CURRENT pointer has moved."""
+        now = time.monotonic()
+        if now - self._last_check < settings.NLP_CORPUS_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        version = corpus.read_current(self.corpus_root)
+        if version is None or version in (self.corpus_version, self._failed_version):
+            return
+        self.reload(version, wait=False)
+
+    def reload(self, version=None, wait=True):
+        """Load ``version`` (default: the CURRENT pointer) and swap it in.
+
+        With ``wait=False`` the load runs on a background thread. Returns False
+        if a reload is already running or, when waiting, if it failed.
+        """
+        with self._reload_lock:
+            if self._reload_thread is not None:
+                return False
+            version = version or corpus.read_current(self.corpus_root)
+            thread = threading.Thread(target=self._reload, args=(version,), daemon=True)
+            self._reload_thread = thread
+            thread.start()
+        if wait:
+            thread.join()
+            return self.reload_error is None and self.corpus_version == version
+        return True
+
+    def activate(self, version):
+        """Load ``version``, then point ``data/corpus/CURRENT`` at it.
+
+        A ready worker swaps the version in with ``reload``; otherwise it is
+        loaded once just to check it. Either way the pointer only moves after
+        the version has loaded and passed its manifest check, so a broken
+        version never becomes the one workers start on. Raises ValueError
+        if it doesn't load.
+        """
+        if self.is_ready:
+            if not self.reload(version):
+                raise ValueError(self.reload_error or 'A reload is already running')
+        else:
+            try:
+                load_corpus_index(self.corpus_dir(version), self.model_name)
+            except Exception as e:
+                raise ValueError(f"Corpus version {version} failed to load: {str(e)}")
+        corpus.activate(self.corpus_root, version)
+
+    def _reload(self, version):
+        started = time.perf_counter()
+        try:
+            logger.info(f"Loading corpus version {version} in the background")
+            index = load_corpus_index(self.corpus_dir(version), self.model_name)
+            self._index = index
+            self.corpus_version = version
+            self.reload_error = None
+            self._failed_version = None
+            # activate() moves the pointer after this returns; don't reload the old version meanwhile
+            self._last_check = time.monotonic()
+            logger.info(f"Switched to corpus version {version} ({len(index)} questions, {time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            logger.error(f"Error loading corpus version {version}: {str(e)}")
+            self.reload_error = str(e)
+            self._failed_version = version
+        finally:
+            with self._reload_lock:
+                self._reload_thread = None
+
+    @property
+    def model(self):
+        """The local model; None when encoding is done by the inference server."""
+        return self._model if self.ensure_loaded() else None
+
+    @property
+    def index(self):
+        if not self.ensure_loaded():
+            return None
+        self.check_for_new_version()
+        return self._index
+
+    def encode(self, texts):
+        """Embeddings for ``texts``, from the inference server when one is configured."""
+        if not self.ensure_model():
+            raise RuntimeError(f"Embedding model not available: {self.model_error}")
+        return self._encode_texts(texts)
+
+    def encode_batched(self, texts, timeout=None):
+        """Encode ``texts``, sharing one model call with other threads' concurrent requests.
+
+        ``timeout`` bounds the wait for the model to load and for the encode,
+        micro-batched or not; on expiry ``concurrent.futures.TimeoutError``
+        is raised.
+        """
+        deadline = Deadline(timeout) if timeout is not None else None
+        if not self.ensure_model(timeout):
+            if self.model_error is None and deadline is not None:
+                raise FutureTimeoutError(f"Embedding model still loading after {timeout}s")
+            raise RuntimeError(f"Embedding model not available: {self.model_error}")
+        remaining = deadline.remaining() if deadline is not None else None
+        if settings.NLP_MICROBATCH_ENABLED:
+            return self.batcher.submit(texts).result(remaining)
+        if remaining is None:
+            return self._encode_texts(texts)
+        return self.executor.submit(self._encode_texts, texts).result(remaining)
+
+    @property
+    def executor(self):
+        """Threads for unbatched encodes that have to be waited on with a timeout."""
+        # Created per process so a worker forked from a preloaded parent gets live threads
+        if self._executor_pid != os.getpid():
+            with self._reload_lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=settings.NLP_ADMISSION_MAX_CONCURRENT, thread_name_prefix='nlp-encode',
+                    )
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def encode_cached(self, texts, timeout=None):
+        """Embeddings for ``texts`` as a float32 matrix; only cache misses are encoded, in one batch."""
+        vectors = self.vector_cache.get_many(texts)
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            # Duplicate texts in one call are encoded once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = dict(zip(unique, self.encode_batched(unique, timeout)))
+            self.vector_cache.set_many(unique, [encoded[text] for text in unique])
+            for i in missing:
+                vectors[i] = np.asarray(encoded[texts[i]], dtype=np.float32)
+        return np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def status(self):
+        index = self._index
+        return {
+            'state': self.state,
+            'model': self.model_name,
+            'inference': f"socket:{self.client.socket_path}" if self.client is not None else 'in-process',
+            'model_loaded': self.client is not None or self._model is not None,
+            'model_error': self.model_error,
+            'load_time': round(self.load_time, 3) if self.load_time is not None else None,
+            'loaded_at': self.loaded_at,
+            'corpus_version': self.corpus_version,
+            'corpus_size': len(index) if index is not None else 0,
+            'store_format': index.store.format if index is not None else None,
+            'ann_lists': index.ann.n_lists if index is not None and index.ann is not None else None,
+            'lexical_terms': len(index.lexical.terms) if index is not None and index.lexical is not None else None,
+            'distractor_vocabulary': len(index.distractors) if index is not None and index.distractors is not None else None,
+            'reloading': self._reload_thread is not None,
+            'reload_error': self.reload_error,
+            'error': self.error,
+            'vector_cache': self.vector_cache.stats(),
+            'microbatch': self.batcher.stats(),
+        }
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,166 @@
+import os
+import json
+import socket
+import struct
+import logging
+import threading
+import socketserver
+import numpy as np
+from .batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+_FRAME = struct.Struct('!II')  # header length, payload length
+
+
+class InferenceError(Exception):
+    pass
+
+
+def send_message(sock, header, payload=b''):
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(_FRAME.pack(len(data), len(payload)) + data + payload)
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """(header, payload) for the next frame on ``sock``, or None once the peer has closed it."""
+    frame = _recv_exact(sock, _FRAME.size)
+    if frame is None:
+        return None
+    header_size, payload_size = _FRAME.unpack(frame)
+    header = _recv_exact(sock, header_size)
+    payload = _recv_exact(sock, payload_size) if payload_size else b''
+    if header is None or payload is None:
+        return None
+    return json.loads(header), payload
+
+
+class InferenceServer:
+    """Owns the SentenceTransformer model and serves encode requests on a Unix socket.
+
+    Requests from every web worker go through one ``MicroBatcher``, and torch
+    is limited to ``threads`` intra-op threads, so inference uses a fixed CPU
+    budget however many workers are encoding. At most ``max_queue`` requests
+    are accepted at once; the rest get an immediate "overloaded" error rather
+    than queueing without bound.
+    """
+
+    def __init__(self, socket_path, model_name, threads=1, max_queue=64, max_batch_size=64, max_wait=0.005):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.threads = threads
+        self.max_queue = max_queue
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batcher = None
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_queue)
+
+    def load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name)
+        self.batcher = MicroBatcher(
+            lambda texts: model.encode(texts, convert_to_numpy=True),
+            max_batch_size=self.max_batch_size, max_wait=self.max_wait,
+        )
+
+    def handle(self, header):
+        """Reply (header, payload) for one request."""
+        if header.get('op') == 'stats':
+            return {'ok': True, 'stats': {**self.batcher.stats(), 'rejected': self.rejected}}, b''
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            return {'ok': False, 'error': 'overloaded'}, b''
+        try:
+            vectors = np.ascontiguousarray(self.batcher.encode(header['texts']), dtype=np.float32)
+            return {'ok': True, 'shape': list(vectors.shape)}, vectors.tobytes()
+        except Exception as e:
+            logger.error(f"Inference request failed: {str(e)}")
+            return {'ok': False, 'error': str(e)}, b''
+        finally:
+            self._slots.release()
+
+    def serve_forever(self):
+        if self.batcher is None:
+            self.load()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # Connections are persistent: serve requests until the client hangs up
+                while True:
+                    message = recv_message(self.request)
+                    if message is None:
+                        return
+                    send_message(self.request, *server.handle(message[0]))
+
+        with socketserver.ThreadingUnixStreamServer(self.socket_path, Handler) as unix_server:
+            unix_server.daemon_threads = True
+            logger.info(f"Inference server for {self.model_name} listening on {self.socket_path} ({self.threads} threads)")
+            unix_server.serve_forever()
+
+
+class InferenceClient:
+    """Client shim for ``InferenceServer``; one persistent connection per thread."""
+
+    def __init__(self, socket_path, timeout=10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, header):
+        # One retry on a fresh connection covers a server restart between requests
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_message(sock, header)
+                message = recv_message(sock)
+                if message is None:
+                    raise ConnectionError('Inference server closed the connection')
+                return message
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+
+    def encode(self, texts):
+        header, payload = self._request({'op': 'encode', 'texts': list(texts)})
+        if not header['ok']:
+            raise InferenceError(header['error'])
+        return np.frombuffer(payload, dtype=np.float32).reshape(header['shape'])
+
+    def stats(self):
+        header, _ = self._request({'op': 'stats'})
+        return header.get('stats')
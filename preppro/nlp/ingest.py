@@ -0,0 +1,159 @@
+import time
+import queue
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from questions.models import Question
+from .bank import question_bank
+from .embedding import embedding_service
+from .llm import answer_index
+from .store import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = {value for value, _ in Question.DIFFICULTY_CHOICES}
+SUBJECT_MAX_LENGTH = Question._meta.get_field('subject').max_length
+TOPIC_MAX_LENGTH = Question._meta.get_field('topic').max_length
+
+
+def normalize_mcq(mcq, subject='', topic='', difficulty='medium'):
+    """Field values for a ``Question`` row from a generated MCQ dict, or None if it isn't usable.
+
+    Options are stripped and de-duplicated, and ``correct_answer`` (option
+    text, letter or index) becomes the option index. Subject and topic are
+    cut to the length of their columns.
+    """
+    text = ' '.join(str(mcq.get('question_text') or '').split())
+    options = list(dict.fromkeys(str(option).strip() for option in mcq.get('options') or [] if str(option).strip()))
+    if not text or len(options) < 2:
+        return None
+    correct = answer_index(mcq.get('correct_answer', ''), options)
+    if correct is None:
+        return None
+    difficulty = mcq.get('difficulty') or difficulty
+    return {
+        'question': text,
+        'options': options,
+        'correct_answer': correct,
+        'subject': str(subject or '').strip()[:SUBJECT_MAX_LENGTH],
+        'topic': str(topic or '').strip()[:TOPIC_MAX_LENGTH],
+        'difficulty': difficulty if difficulty in DIFFICULTIES else 'medium',
+        'explanation': mcq.get('support') or None,
+    }
+
+
+def ingest_mcqs(items, encode_fn, duplicate_threshold=0.92, batch_size=100):
+    """Insert generated MCQs into the question bank; returns the new ``Question`` rows.
+
+    ``items`` are ``(mcq, subject, topic, difficulty)`` tuples. Questions
+    that don't normalize, that already exist word for word, or whose
+    embedding is within ``duplicate_threshold`` cosine similarity of an
+    indexed bank question or of an earlier item in the same call are
+    skipped. All questions are encoded in one ``encode_fn`` call and the
+    rest are written with ``bulk_create``.
+    """
+    rows = [row for row in (normalize_mcq(*item) for item in items) if row is not None]
+    if not rows:
+        return []
+
+    existing = set(Question.objects.filter(question__in=[row['question'] for row in rows]).values_list('question', flat=True))
+    rows = [row for row in rows if row['question'] not in existing]
+    if not rows:
+        return []
+
+    vectors = normalize_rows(encode_fn([row['question'] for row in rows]))
+    keep = []
+    for i, (row, vector) in enumerate(zip(rows, vectors)):
+        ids, _ = question_bank.search(vector[None, :], 1, duplicate_threshold)
+        if len(ids):
+            continue
+        if keep and (vectors[keep] @ vector).max() > duplicate_threshold:
+            continue
+        keep.append(i)
+
+    created = Question.objects.bulk_create([Question(**rows[i]) for i in keep], batch_size=batch_size)
+    # bulk_create sends no post_save signals; queue the new rows for the index directly
+    for question in created:
+        if question.pk is not None:
+            transaction.on_commit(lambda pk=question.pk: question_bank.schedule(pk))
+    return created
+
+
+class QuestionIngestor:
+    """Background writer that adds generated questions to the bank.
+
+    ``submit`` only puts the questions on a bounded queue, so a request never
+    waits on encoding or the database; when the queue is full the questions
+    are dropped. A worker thread collects submissions for ``flush_interval``
+    seconds and ingests them with one ``ingest_mcqs`` call.
+    """
+
+    def __init__(self, encode_fn, duplicate_threshold=0.92, batch_size=100, flush_interval=2.0, max_queue=1000):
+        self.encode_fn = encode_fn
+        self.duplicate_threshold = duplicate_threshold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submitted = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, mcqs, subject='', topic='', difficulty='medium'):
+        for mcq in mcqs:
+            try:
+                self._queue.put_nowait((mcq, subject, topic, difficulty))
+                self.submitted += 1
+            except queue.Full:
+                self.dropped += 1
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='nlp-question-ingest', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            time.sleep(self.flush_interval)
+            while len(items) < self.batch_size * 10:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                created = ingest_mcqs(items, self.encode_fn, self.duplicate_threshold, self.batch_size)
+                self.inserted += len(created)
+                self.skipped += len(items) - len(created)
+                self.error = None
+                logger.info(f"Added {len(created)} of {len(items)} generated questions to the question bank")
+            except Exception as e:
+                logger.error(f"Error ingesting generated questions: {str(e)}")
+                self.error = str(e)
+            finally:
+                connection.close()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'submitted': self.submitted,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'dropped': self.dropped,
+            'error': self.error,
+        }
+
+
+question_ingestor = QuestionIngestor(
+    embedding_service.encode_cached,
+    duplicate_threshold=settings.NLP_INGEST_DUPLICATE_THRESHOLD,
+    batch_size=settings.NLP_INGEST_BATCH_SIZE,
+)
@@ -0,0 +1,113 @@
+import os
+import re
+from collections import Counter
+import numpy as np
+
+BM25_FILE = 'bm25.npz'
+LEXICAL_COLUMNS = ['question', 'support']
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    'a an and are as at be but by can do does for from had has have how if in into is it its not of on or '
+    'so than that the their them then there these they this to was were what when where which while who '
+    'why will with would you your'.split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory inverted index over the corpus text with BM25 scoring.
+
+    Postings are stored CSR-style like ``IVFIndex``: ``doc_ids`` holds the
+    rows of each term grouped by term id and ``offsets`` marks where each term
+    starts. ``weights`` holds each posting's precomputed BM25 contribution, so
+    a query only sums the weights of the postings of its terms.
+    """
+
+    def __init__(self, terms, offsets, doc_ids, weights, n_docs):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = int(n_docs)
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, documents, k1=1.2, b=0.75):
+        vocabulary = {}
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+        doc_freq = np.bincount(term_ids, minlength=len(vocabulary))
+        n_docs = len(documents)
+        avg_length = lengths.mean() if n_docs and lengths.mean() > 0 else 1.0
+
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[doc_ids] / avg_length)
+        weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)
+
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(doc_freq)]).astype(np.int64)
+        terms = np.array(list(vocabulary), dtype=str)
+        return cls(terms, offsets, doc_ids[order], weights[order].astype(np.float32), n_docs)
+
+    @classmethod
+    def from_dataframe(cls, df, columns=LEXICAL_COLUMNS, **kwargs):
+        texts = df[columns].fillna('').astype(str).agg(' '.join, axis=1).tolist()
+        return cls.build(texts, **kwargs)
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, BM25_FILE))
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, BM25_FILE)) as data:
+            return cls(data['terms'], data['offsets'], data['doc_ids'], data['weights'], data['n_docs'])
+
+    def save(self, directory):
+        np.savez(
+            os.path.join(directory, BM25_FILE),
+            terms=self.terms, offsets=self.offsets, doc_ids=self.doc_ids,
+            weights=self.weights, n_docs=self.n_docs,
+        )
+
+    def __len__(self):
+        return self.n_docs
+
+    def search(self, text, limit, max_terms=32):
+        """Rows and BM25 scores of the ``limit`` best matches for ``text``, best first.
+
+        Only the ``max_terms`` rarest query terms are looked up. They carry
+        most of the BM25 score and have the shortest posting lists, so a long
+        query costs no more than a short one.
+        """
+        term_ids = np.array(sorted({self.vocabulary[t] for t in tokenize(text) if t in self.vocabulary}), dtype=np.int64)
+        if not len(term_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(term_ids) > max_terms:
+            sizes = self.offsets[term_ids + 1] - self.offsets[term_ids]
+            term_ids = term_ids[np.argsort(sizes, kind='stable')[:max_terms]]
+
+        docs = np.concatenate([self.doc_ids[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        rows, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if len(rows) > limit:
+            part = np.argpartition(scores, -limit)[-limit:]
+            rows, scores = rows[part], scores[part]
+        order = np.argsort(scores)[::-1]
+        return rows[order].astype(np.int64), scores[order]
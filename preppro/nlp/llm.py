@@ -0,0 +1,258 @@
+import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .cache import LRUCache, TieredCache
+from .resilience import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_QUESTION_LINE = re.compile(r'^(?:Q(?:uestion)?\s*)?(\d+)\s*[.):]\s*(.*)$', re.IGNORECASE)
+_OPTION_LINE = re.compile(r'^\(?([A-D])[.):]\s*(.+)$')
+_ANSWER_LINE = re.compile(r'^(?:Correct\s+)?Answer\s*[:\-]\s*(.*)$', re.IGNORECASE)
+_ANSWER_LETTER = re.compile(r'^\(?([A-D])\)?(?:$|[.):\s])')
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """Raised without calling upstream: the circuit is open or the deadline has passed."""
+
+
+def _clean_line(line):
+    # Models often wrap parts of the format in markdown emphasis
+    return line.strip().strip('*_').strip()
+
+
+def answer_index(answer, options):
+    """Index into ``options`` of an answer given as an index, a letter ("B", "B. text") or the option text.
+
+    Returns None when the answer matches no option.
+    """
+    if isinstance(answer, int):
+        return answer if 0 <= answer < len(options) else None
+    answer = str(answer).strip()
+    for i, option in enumerate(options):
+        if str(option).strip().lower() == answer.lower():
+            return i
+    match = _ANSWER_LETTER.match(answer)
+    if match and 'ABCD'.index(match.group(1)) < len(options):
+        return 'ABCD'.index(match.group(1))
+    return None
+
+
+def _resolve_answer(answer, options):
+    """Option text for an "Answer:" value given as a letter ("B", "B. text") or as the option itself."""
+    index = answer_index(answer, options)
+    return options[index] if index is not None else answer
+
+
+def _finished(current):
+    if current and current['question_text'] and len(current['options']) == 4:
+        answer = current['answer']
+        return {
+            'question_text': current['question_text'],
+            'options': current['options'],
+            'correct_answer': _resolve_answer(answer, current['options']) if answer else '',
+        }
+    return None
+
+
+def iter_mcqs(lines):
+    """Yield question dicts from "Q1. / A. ... D. / Answer:" lines as each one completes.
+
+    Each dict has ``question_text``, ``options`` (four strings) and
+    ``correct_answer`` (the text of the correct option where it can be
+    resolved). Questions without exactly four options are dropped. A
+    question is complete once its answer line, or the next question, has
+    been read, so ``lines`` can be consumed as they arrive.
+    """
+    current = None
+    for raw_line in lines:
+        line = _clean_line(raw_line)
+        if not line:
+            continue
+        question = _QUESTION_LINE.match(line)
+        option = _OPTION_LINE.match(line)
+        answer = _ANSWER_LINE.match(line)
+        if question and not option:
+            mcq = _finished(current)
+            if mcq:
+                yield mcq
+            current = {'question_text': _clean_line(question.group(2)), 'options': [], 'answer': ''}
+        elif current is None:
+            continue
+        elif answer:
+            current['answer'] = _clean_line(answer.group(1))
+            mcq = _finished(current)
+            if mcq:
+                yield mcq
+                current = None
+        elif option and len(current['options']) < 4:
+            current['options'].append(_clean_line(option.group(2)))
+        elif not current['options']:
+            # Question text that wrapped onto a second line
+            current['question_text'] = f"{current['question_text']} {line}".strip()
+    mcq = _finished(current)
+    if mcq:
+        yield mcq
+
+
+def parse_mcqs(text):
+    """All questions in an LLM reply; see ``iter_mcqs``."""
+    return list(iter_mcqs(text.splitlines()))
+
+
+class LLMGateway:
+    """Pooled client for the chat-completion endpoint behind the LLM fallbacks.
+
+    One ``requests.Session`` per process keeps connections alive between
+    calls. Every call has connect and read timeouts, connection errors and
+    429/5xx responses are retried a bounded number of times with jittered
+    exponential backoff, and successful responses are cached by prompt hash
+    in the shared 'nlp' cache so a repeated prompt is never paid for twice.
+
+    A ``CircuitBreaker`` counts calls that still fail after their retries;
+    while it is open, ``complete`` fails fast with ``LLMUnavailable``.
+    """
+
+    def __init__(self, url, api_key, connect_timeout=3.05, read_timeout=30, max_retries=2,
+                 backoff=0.5, pool_size=10, cache=None, breaker=None):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.cache = cache
+        self.breaker = breaker or CircuitBreaker('llm')
+        self.calls = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.failures = 0
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update({
+                        'x-rapidapi-key': self.api_key,
+                        'x-rapidapi-host': urlparse(self.url).netloc,
+                        'Content-Type': 'application/json',
+                    })
+                    self._session = session
+        return self._session
+
+    def cache_key(self, prompt):
+        digest = hashlib.sha256(f"{self.url}\n{prompt}".encode('utf-8')).hexdigest()
+        return f"llm:v1:{digest}"
+
+    def complete(self, prompt, deadline=None):
+        """Response text for ``prompt``. Raises LLMError once retries are exhausted.
+
+        With a ``Deadline`` the read timeout of each attempt is capped by the
+        time left, and no retry is started that could not finish in time.
+        """
+        key = self.cache_key(prompt)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        if deadline is not None and deadline.remaining() < self.timeout[0]:
+            raise LLMUnavailable('No time left in the request budget')
+        if not self.breaker.allow():
+            raise LLMUnavailable(f"Circuit {self.breaker.name} is open")
+        try:
+            text = self._post(prompt, deadline)
+        except BaseException:
+            # Any outcome must be recorded, or a half-open probe would never finish
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        if text and self.cache is not None:
+            self.cache.set(key, text)
+        return text
+
+    def _post(self, prompt, deadline=None):
+        payload = {
+            "messages": [{"role": "user", "content": prompt}],
+            "web_access": False
+        }
+        connect_timeout, read_timeout = self.timeout
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                pause = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                if deadline is not None and deadline.remaining() < pause + connect_timeout:
+                    break
+                self.retries += 1
+                time.sleep(pause)
+            if deadline is not None:
+                read_timeout = max(deadline.remaining(cap=self.timeout[1]), 0.1)
+            self.calls += 1
+            try:
+                response = self.session.post(self.url, json=payload, timeout=(connect_timeout, read_timeout))
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                error = f"{type(e).__name__}: {str(e)}"
+                logger.warning(f"LLM request failed (attempt {attempt + 1}): {error}")
+                continue
+            except requests.RequestException as e:
+                # Redirect loops, undecodable bodies, bad URLs: retrying won't help
+                error = f"{type(e).__name__}: {str(e)}"
+                logger.warning(f"LLM request failed (attempt {attempt + 1}): {error}")
+                break
+            if response.status_code == 200:
+                try:
+                    result = response.json().get("result", "")
+                    if not isinstance(result, str):
+                        raise ValueError(f"result is {type(result).__name__}")
+                    return result.strip()
+                except (ValueError, AttributeError):
+                    error = f"Invalid JSON in response: {response.text[:200]}"
+                    break
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            logger.warning(f"LLM request failed (attempt {attempt + 1}): {error}")
+            if response.status_code not in RETRY_STATUSES:
+                break
+        self.failures += 1
+        raise LLMError(error)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'cache_hits': self.cache_hits,
+            'retries': self.retries,
+            'failures': self.failures,
+            'breaker': self.breaker.stats(),
+        }
+
+
+llm_gateway = LLMGateway(
+    settings.NLP_LLM_URL,
+    settings.RAPIDAPI_KEY,
+    connect_timeout=settings.NLP_LLM_CONNECT_TIMEOUT,
+    read_timeout=settings.NLP_LLM_READ_TIMEOUT,
+    max_retries=settings.NLP_LLM_MAX_RETRIES,
+    backoff=settings.NLP_LLM_BACKOFF,
+    pool_size=settings.NLP_LLM_POOL_SIZE,
+    cache=TieredCache('nlp', LRUCache(max_entries=256), settings.NLP_LLM_CACHE_TTL),
+    breaker=CircuitBreaker('llm', settings.NLP_LLM_BREAKER_FAILURES, settings.NLP_LLM_BREAKER_RESET),
+)
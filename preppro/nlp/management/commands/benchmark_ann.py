@@ -0,0 +1,64 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from nlp.ann import IVFIndex
+from nlp.search import CorpusIndex
+from .benchmark_search import percentiles, synthetic_queries
+from .build_ann_index import load_corpus_store
+
+
+def clustered_corpus(size, dim, rng, clusters=1000, spread=1.5):
+    """Synthetic corpus with topic structure, closer to real sentence embeddings than pure noise."""
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    return centers[rng.integers(0, clusters, size)] + spread * rng.standard_normal((size, dim), dtype=np.float32)
+
+
+class Command(BaseCommand):
+    help = 'Reports IVF recall@k against exact search and query latency for several nprobe values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Benchmark the real corpus here instead of a synthetic one')
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--dim', type=int, default=384)
+        parser.add_argument('--lists', type=int)
+        parser.add_argument('--nprobe', default='1,2,4,8,16,32')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        if options['data_dir']:
+            store = load_corpus_store(options['data_dir'])
+            queries = synthetic_queries(store.take(np.arange(len(store))), options['queries'], rng, noise=0.05)
+        else:
+            embeddings = clustered_corpus(options['size'], options['dim'], rng)
+            queries = synthetic_queries(embeddings, options['queries'], rng)
+            store = CorpusIndex(embeddings, {}).store
+            del embeddings
+
+        started = time.perf_counter()
+        ann = IVFIndex.build(store, n_lists=options['lists'], seed=options['seed'])
+        self.stdout.write(f"Built {ann.n_lists} buckets over {len(store)} rows in {time.perf_counter() - started:.1f}s")
+
+        index = CorpusIndex(store, {}, ann=ann)
+        k = options['k']
+
+        exact, timings = [], []
+        for query in queries:
+            started = time.perf_counter()
+            exact.append(index.top_k(query, k, exact=True)[0])
+            timings.append(time.perf_counter() - started)
+        p50, p99 = percentiles(timings)
+        self.stdout.write(f"exact        recall@{k}=1.0000  p50={p50:8.2f}ms  p99={p99:8.2f}ms")
+
+        for nprobe in [int(n) for n in options['nprobe'].split(',')]:
+            hits, timings = 0, []
+            for query, expected in zip(queries, exact):
+                started = time.perf_counter()
+                found = index.top_k(query, k, nprobe=nprobe)[0]
+                timings.append(time.perf_counter() - started)
+                hits += len(np.intersect1d(expected, found))
+            p50, p99 = percentiles(timings)
+            recall = hits / (k * len(queries))
+            self.stdout.write(f"nprobe={nprobe:<5} recall@{k}={recall:.4f}  p50={p50:8.2f}ms  p99={p99:8.2f}ms")
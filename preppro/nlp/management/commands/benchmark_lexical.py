@@ -0,0 +1,65 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from nlp.embedding import embedding_service
+from nlp.lexical import BM25Index
+from nlp.search import CorpusIndex
+from .benchmark_search import percentiles
+from .build_ann_index import load_corpus_store
+
+
+class Command(BaseCommand):
+    help = 'Reports recall@k and latency of BM25-prefiltered search against dense-only search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Corpus directory (default: the active corpus version)')
+        parser.add_argument('--model', default=embedding_service.model_name)
+        parser.add_argument('--query-column', default='support', help='Corpus column whose text is used as queries')
+        parser.add_argument('--candidates', default='100,300,1000,3000')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        from sentence_transformers import SentenceTransformer
+
+        data_dir = options['data_dir'] or embedding_service.corpus_dir()
+        df = pd.read_csv(os.path.join(data_dir, 'train.csv'))
+        store = load_corpus_store(data_dir)
+
+        started = time.perf_counter()
+        lexical = BM25Index.load(data_dir) if BM25Index.exists(data_dir) else BM25Index.from_dataframe(df)
+        self.stdout.write(f"BM25 index over {len(lexical)} rows, {len(lexical.terms)} terms ready in {time.perf_counter() - started:.1f}s")
+
+        texts = df[options['query_column']].fillna('').astype(str)
+        texts = texts[texts.str.len() > 0].sample(options['queries'], random_state=options['seed'], replace=True).tolist()
+        queries = SentenceTransformer(options['model']).encode(texts, convert_to_numpy=True)
+        k = options['k']
+
+        dense = CorpusIndex(store, {})
+        exact, timings = [], []
+        for query in queries:
+            started = time.perf_counter()
+            exact.append(dense.top_k(query, k, exact=True)[0])
+            timings.append(time.perf_counter() - started)
+        p50, p99 = percentiles(timings)
+        self.stdout.write(f"dense             recall@{k}=1.0000  p50={p50:8.2f}ms  p99={p99:8.2f}ms")
+
+        for candidates in [int(c) for c in options['candidates'].split(',')]:
+            index = CorpusIndex(store, {}, lexical=lexical, lexical_candidates=candidates,
+                                lexical_min_candidates=min(50, candidates))
+            hits, fallbacks, timings = 0, 0, []
+            for text, query, expected in zip(texts, queries, exact):
+                started = time.perf_counter()
+                found = index.top_k(query, k, query_text=text)[0]
+                timings.append(time.perf_counter() - started)
+                hits += len(np.intersect1d(expected, found))
+                fallbacks += index.lexical_rows(text) is None
+            p50, p99 = percentiles(timings)
+            recall = hits / (k * len(queries))
+            self.stdout.write(
+                f"bm25@{candidates:<12} recall@{k}={recall:.4f}  p50={p50:8.2f}ms  p99={p99:8.2f}ms  "
+                f"dense fallbacks={fallbacks}"
+            )
@@ -0,0 +1,63 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from nlp.embedding import embedding_service
+from nlp.rerank import mmr_order
+from nlp.search import CorpusIndex
+from nlp.views import SIMILARITY_THRESHOLD, build_mcq_results
+from .benchmark_search import percentiles
+from .build_ann_index import load_corpus_store
+
+
+class Command(BaseCommand):
+    help = 'Reports how often semantic search falls short (triggering the LLM fallback) with and without MMR re-ranking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Corpus directory (default: the active corpus version)')
+        parser.add_argument('--model', default=embedding_service.model_name)
+        parser.add_argument('--query-column', default='support', help='Corpus column whose text is used as queries')
+        parser.add_argument('--diversity', default='0.1,0.3,0.5', help='Comma-separated MMR diversity weights to try')
+        parser.add_argument('--pool-factor', type=int, default=4)
+        parser.add_argument('--num-questions', type=int, default=5)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        from sentence_transformers import SentenceTransformer
+
+        data_dir = options['data_dir'] or embedding_service.corpus_dir()
+        df = pd.read_csv(os.path.join(data_dir, 'train.csv'))
+        index = CorpusIndex.from_dataframe(df, load_corpus_store(data_dir))
+
+        texts = df[options['query_column']].fillna('').astype(str)
+        texts = texts[texts.str.len() > 0].sample(options['queries'], random_state=options['seed'], replace=True).tolist()
+        queries = SentenceTransformer(options['model']).encode(texts, convert_to_numpy=True)
+        n = options['num_questions']
+
+        def run(label, pool, diversity):
+            fallbacks, timings, redundancy = 0, [], []
+            for query in queries:
+                started = time.perf_counter()
+                rows, scores = index.top_k(query, pool, threshold=SIMILARITY_THRESHOLD, exact=True)
+                if diversity > 0 and len(rows) > 1:
+                    order = mmr_order(scores, index.store.take(rows), 1 - diversity)
+                    rows, scores = rows[order], scores[order]
+                results = build_mcq_results(index, rows, scores, n, 'medium')
+                timings.append(time.perf_counter() - started)
+                fallbacks += len(results) < n
+                picked = rows[:n]
+                if len(picked) > 1:
+                    vectors = index.store.take(picked)
+                    similarity = vectors @ vectors.T
+                    redundancy.append(similarity[np.triu_indices(len(picked), 1)].mean())
+            p50, p99 = percentiles(timings)
+            self.stdout.write(
+                f"{label:<20} llm fallback rate={fallbacks / len(queries):.3f}  "
+                f"top-n pairwise sim={np.mean(redundancy) if redundancy else 0:.3f}  p50={p50:7.2f}ms  p99={p99:7.2f}ms"
+            )
+
+        run('top-n (before)', n, 0)
+        for diversity in [float(d) for d in options['diversity'].split(',')]:
+            run(f"mmr pool={n * options['pool_factor']} d={diversity}", n * options['pool_factor'], diversity)
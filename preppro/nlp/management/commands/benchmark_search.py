@@ -0,0 +1,75 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from nlp.search import CorpusIndex, normalize_rows
+from nlp.views import SIMILARITY_THRESHOLD
+
+
+def percentiles(timings):
+    ms = np.asarray(timings) * 1000
+    return np.percentile(ms, 50), np.percentile(ms, 99)
+
+
+def synthetic_corpus(size, dim, rng):
+    return rng.standard_normal((size, dim), dtype=np.float32)
+
+
+def synthetic_queries(embeddings, count, rng, noise=0.5):
+    """Perturbed corpus rows, so some rows clear the similarity threshold."""
+    rows = embeddings[rng.integers(0, len(embeddings), count)]
+    return rows + noise * rng.standard_normal(rows.shape, dtype=np.float32)
+
+
+def legacy_search(row_vectors, query_vec, k, threshold):
+    """The pre-CorpusIndex query path: rebuild, re-normalize and sort in Python."""
+    embedding_matrix = np.vstack(row_vectors)
+    similarities = normalize_rows(embedding_matrix) @ normalize_rows(query_vec).ravel()
+    return sorted(
+        [idx for idx, score in enumerate(similarities) if score > threshold],
+        key=lambda idx: similarities[idx],
+        reverse=True
+    )[:k]
+
+
+class Command(BaseCommand):
+    help = 'Reports p50/p99 MCQ search latency on synthetic corpora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated corpus sizes')
+        parser.add_argument('--dim', type=int, default=384)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--legacy-queries', type=int, default=20,
+                            help='Queries for the legacy path, which is much slower')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        k = options['k']
+
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            embeddings = synthetic_corpus(size, options['dim'], rng)
+            queries = synthetic_queries(embeddings, options['queries'], rng)
+
+            timings = []
+            if options['legacy_queries']:
+                row_vectors = np.empty(size, dtype=object)
+                row_vectors[:] = [vec for vec in embeddings]
+                for query in queries[:options['legacy_queries']]:
+                    started = time.perf_counter()
+                    legacy_search(row_vectors, query, k, SIMILARITY_THRESHOLD)
+                    timings.append(time.perf_counter() - started)
+                del row_vectors
+                p50, p99 = percentiles(timings)
+                self.stdout.write(f"{size:>9} rows  legacy  p50={p50:9.2f}ms  p99={p99:9.2f}ms")
+
+            index = CorpusIndex(embeddings, {})
+            del embeddings
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.top_k(query, k, threshold=SIMILARITY_THRESHOLD)
+                timings.append(time.perf_counter() - started)
+            p50, p99 = percentiles(timings)
+            self.stdout.write(f"{size:>9} rows  index   p50={p50:9.2f}ms  p99={p99:9.2f}ms")
+            del index
@@ -0,0 +1,55 @@
+import os
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.ann import IVF_FILE, IVFIndex
+from nlp.embedding import embedding_service
+from nlp.manifest import MANIFEST_NAME, file_entry, load_manifest, write_json_atomic
+from nlp.store import EmbeddingStore
+
+
+class Command(BaseCommand):
+    help = 'Builds the IVF approximate-nearest-neighbour index (ivf.npz) for the MCQ corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Corpus directory (default: the unversioned data directory)')
+        parser.add_argument('--corpus-version', help='Write into data/corpus/<version>; the active version is refused')
+        parser.add_argument('--lists', type=int, help='Number of k-means buckets (default 4 * sqrt(rows))')
+        parser.add_argument('--sample-size', type=int, help='Rows used to train k-means (default 64 per bucket)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            data_dir = corpus.build_dir(
+                embedding_service.corpus_root, embedding_service.data_dir, options['data_dir'], options['corpus_version'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        store = load_corpus_store(data_dir)
+
+        started = time.perf_counter()
+        index = IVFIndex.build(store, n_lists=options['lists'], sample_size=options['sample_size'], seed=options['seed'])
+        index.save(data_dir)
+
+        sizes = np.diff(index.list_offsets)
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {index.n_lists} buckets over {len(index)} rows in {time.perf_counter() - started:.1f}s "
+            f"(bucket size min={sizes.min()} median={int(np.median(sizes))} max={sizes.max()})"
+        ))
+
+        manifest = load_manifest(data_dir)
+        if manifest is not None:
+            manifest['files'][IVF_FILE] = file_entry(os.path.join(data_dir, IVF_FILE))
+            write_json_atomic(os.path.join(data_dir, MANIFEST_NAME), manifest)
+
+
+def load_corpus_store(data_dir):
+    """The corpus vectors in ``data_dir``: the mapped store if built, else embeddings.npy."""
+    store_dir = os.path.join(data_dir, 'store')
+    if EmbeddingStore.exists(store_dir):
+        return EmbeddingStore.open(store_dir)
+    embedding_file = os.path.join(data_dir, 'embeddings.npy')
+    if not os.path.exists(embedding_file):
+        raise CommandError(f"No embedding store or embeddings.npy in {data_dir}")
+    return EmbeddingStore.from_array(np.load(embedding_file, mmap_mode='r'))
@@ -0,0 +1,57 @@
+import os
+import time
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.distractors import ANSWER_COLUMNS, DISTRACTOR_FILE, DistractorIndex
+from nlp.embedding import embedding_service
+from nlp.manifest import MANIFEST_NAME, file_entry, load_manifest, write_json_atomic
+
+
+class Command(BaseCommand):
+    help = 'Embeds the answer vocabulary (distractors.npz) used to build MCQ options locally'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Corpus directory (default: the unversioned data directory)')
+        parser.add_argument('--corpus-version', help='Write into data/corpus/<version>; the active version is refused')
+        parser.add_argument('--model', default=embedding_service.model_name)
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--no-bank', action='store_true', help='Leave the question bank options out of the vocabulary')
+
+    def handle(self, *args, **options):
+        from sentence_transformers import SentenceTransformer
+
+        try:
+            data_dir = corpus.build_dir(
+                embedding_service.corpus_root, embedding_service.data_dir, options['data_dir'], options['corpus_version'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        csv_path = os.path.join(data_dir, 'train.csv')
+        if not os.path.exists(csv_path):
+            raise CommandError(f"No train.csv in {data_dir}")
+
+        df = pd.read_csv(csv_path, usecols=ANSWER_COLUMNS)
+        texts = df.fillna('').astype(str).to_numpy().ravel().tolist()
+        if not options['no_bank']:
+            from questions.models import Question
+
+            for question_options in Question.objects.filter(deleted_at__isnull=True).values_list('options', flat=True):
+                if isinstance(question_options, list):
+                    texts += [str(option) for option in question_options]
+
+        started = time.perf_counter()
+        model = SentenceTransformer(options['model'])
+        index = DistractorIndex.build(
+            texts, lambda batch: model.encode(batch, batch_size=options['batch_size'], convert_to_numpy=True),
+            batch_size=options['batch_size'],
+        )
+        index.save(data_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {len(index)} distinct answers of {len(index.by_type)} types in {time.perf_counter() - started:.1f}s"
+        ))
+
+        manifest = load_manifest(data_dir)
+        if manifest is not None:
+            manifest['files'][DISTRACTOR_FILE] = file_entry(os.path.join(data_dir, DISTRACTOR_FILE))
+            write_json_atomic(os.path.join(data_dir, MANIFEST_NAME), manifest)
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.embedding import embedding_service
+from nlp.manifest import MANIFEST_NAME, file_entry, load_manifest, write_json_atomic
+from nlp.store import EmbeddingStore, STORE_FORMATS, quantization_recall
+
+
+class Command(BaseCommand):
+    help = 'Converts embeddings.npy into a memory-mappable (optionally quantized) embedding store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=STORE_FORMATS, default='float32')
+        parser.add_argument('--data-dir', help='Corpus directory (default: the unversioned data directory)')
+        parser.add_argument('--corpus-version', help='Write into data/corpus/<version>; the active version is refused')
+        parser.add_argument('--recall-queries', type=int, default=200,
+                            help='Corpus rows used as queries for the recall report (0 to skip)')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            data_dir = corpus.build_dir(
+                embedding_service.corpus_root, embedding_service.data_dir, options['data_dir'], options['corpus_version'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        source = os.path.join(data_dir, 'embeddings.npy')
+        output = os.path.join(data_dir, 'store')
+        if not os.path.exists(source):
+            raise CommandError(f"Embeddings file not found at {source}")
+
+        embeddings = np.load(source, mmap_mode='r')
+        self.stdout.write(f"Loaded {embeddings.shape[0]} x {embeddings.shape[1]} embeddings")
+
+        store = EmbeddingStore.from_array(embeddings, options['format'])
+        store.save(output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['format']} store to {output} "
+            f"({store.nbytes / 2**20:.1f} MiB, float32 would be {embeddings.shape[0] * embeddings.shape[1] * 4 / 2**20:.1f} MiB)"
+        ))
+
+        manifest = load_manifest(data_dir)
+        if manifest is not None:
+            for name in ('vectors.npy', 'scales.npy', 'store.json'):
+                manifest['files'].pop(f'store/{name}', None)
+                if os.path.exists(os.path.join(output, name)):
+                    manifest['files'][f'store/{name}'] = file_entry(os.path.join(output, name))
+            write_json_atomic(os.path.join(data_dir, MANIFEST_NAME), manifest)
+
+        if options['recall_queries']:
+            rng = np.random.default_rng(options['seed'])
+            rows = rng.choice(len(embeddings), min(options['recall_queries'], len(embeddings)), replace=False)
+            queries = embeddings[np.sort(rows)]
+            for fmt in STORE_FORMATS[1:]:
+                recall = quantization_recall(embeddings, fmt, queries, k=options['k'])
+                self.stdout.write(f"  {fmt}: recall@{options['k']} vs float32 = {recall:.4f}")
@@ -0,0 +1,43 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.embedding import embedding_service
+from nlp.lexical import BM25_FILE, BM25Index
+from nlp.manifest import MANIFEST_NAME, file_entry, load_manifest, write_json_atomic
+
+
+class Command(BaseCommand):
+    help = 'Builds the BM25 inverted index (bm25.npz) used to prefilter dense search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', help='Corpus directory (default: the unversioned data directory)')
+        parser.add_argument('--corpus-version', help='Write into data/corpus/<version>; the active version is refused')
+
+    def handle(self, *args, **options):
+        try:
+            data_dir = corpus.build_dir(
+                embedding_service.corpus_root, embedding_service.data_dir, options['data_dir'], options['corpus_version'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        csv_path = os.path.join(data_dir, 'train.csv')
+        if not os.path.exists(csv_path):
+            raise CommandError(f"No train.csv in {data_dir}")
+
+        started = time.perf_counter()
+        index = BM25Index.from_dataframe(pd.read_csv(csv_path))
+        index.save(data_dir)
+
+        sizes = np.diff(index.offsets)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} rows, {len(index.terms)} terms, {len(index.doc_ids)} postings "
+            f"in {time.perf_counter() - started:.1f}s (longest posting list {sizes.max()})"
+        ))
+
+        manifest = load_manifest(data_dir)
+        if manifest is not None:
+            manifest['files'][BM25_FILE] = file_entry(os.path.join(data_dir, BM25_FILE))
+            write_json_atomic(os.path.join(data_dir, MANIFEST_NAME), manifest)
@@ -0,0 +1,195 @@
+import os
+import time
+import shutil
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.ann import IVF_FILE, IVFIndex
+from nlp.lexical import BM25_FILE, BM25Index
+from nlp.embedding import embedding_service, DATA_DIR
+from nlp.manifest import MANIFEST_NAME, file_checksum, file_entry, load_json, write_json_atomic
+from nlp.search import MCQ_COLUMNS
+from nlp.store import EmbeddingStore, STORE_FORMATS
+
+PROGRESS_NAME = 'build-progress.json'
+
+
+class Command(BaseCommand):
+    help = 'Builds train.csv, embeddings.npy and manifest.json from one or more MCQ CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_files', nargs='+', help='Corpus CSVs with the MCQ columns')
+        parser.add_argument('--output', default=DATA_DIR)
+        parser.add_argument('--corpus-version', help='Build into data/corpus/<version> instead of --output')
+        parser.add_argument('--activate', action='store_true',
+                            help='Point data/corpus/CURRENT at --corpus-version once the build is complete')
+        parser.add_argument('--model', default=embedding_service.model_name)
+        parser.add_argument('--text-columns', default='question,support',
+                            help='Comma-separated columns joined into the text that gets embedded')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Rows read and checkpointed at a time')
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Encode through a SentenceTransformer multi-process pool when > 1')
+        parser.add_argument('--store-format', choices=STORE_FORMATS,
+                            help='Also write a memory-mapped embedding store in this format')
+        parser.add_argument('--ann', action='store_true', help='Also build the IVF nearest-neighbour index')
+        parser.add_argument('--lexical', action='store_true', help='Also build the BM25 prefilter index')
+        parser.add_argument('--restart', action='store_true', help='Ignore any interrupted build')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if options['corpus_version']:
+            output = corpus.version_dir(embedding_service.corpus_root, options['corpus_version'])
+            if os.path.exists(os.path.join(output, MANIFEST_NAME)):
+                raise CommandError(f"Corpus version {options['corpus_version']} already exists; versions are immutable")
+        elif options['activate']:
+            raise CommandError("--activate requires --corpus-version")
+        text_columns = options['text_columns'].split(',')
+        os.makedirs(output, exist_ok=True)
+
+        for path in options['csv_files']:
+            if not os.path.exists(path):
+                raise CommandError(f"CSV file not found at {path}")
+
+        csv_partial = os.path.join(output, 'train.csv.partial')
+        embeddings_partial = os.path.join(output, 'embeddings.npy.partial')
+        progress_path = os.path.join(output, PROGRESS_NAME)
+
+        build_key = {
+            'model': options['model'],
+            'text_columns': text_columns,
+            'inputs': [file_checksum(path) for path in options['csv_files']],
+        }
+        progress = load_json(progress_path)
+        resuming = (
+            not options['restart']
+            and progress is not None
+            and progress['key'] == build_key
+            and os.path.exists(csv_partial)
+            and os.path.exists(embeddings_partial)
+        )
+
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(options['model'])
+        dim = model.get_sentence_embedding_dimension()
+
+        if resuming:
+            rows, rows_done = progress['rows'], progress['rows_done']
+            self.stdout.write(f"Resuming interrupted build at row {rows_done}/{rows}")
+            vectors = np.lib.format.open_memmap(embeddings_partial, mode='r+')
+        else:
+            rows = self.write_combined_csv(options['csv_files'], csv_partial, text_columns, options['chunk_size'])
+            rows_done = 0
+            vectors = np.lib.format.open_memmap(embeddings_partial, mode='w+', dtype=np.float32, shape=(rows, dim))
+            progress = {'key': build_key, 'rows': rows, 'rows_done': 0}
+            write_json_atomic(progress_path, progress)
+
+        pool = None
+        if options['processes'] > 1:
+            pool = model.start_multi_process_pool(['cpu'] * options['processes'])
+
+        started = time.perf_counter()
+        try:
+            offset = 0
+            for chunk in pd.read_csv(csv_partial, chunksize=options['chunk_size']):
+                start, offset = offset, offset + len(chunk)
+                if offset <= rows_done:
+                    continue
+                chunk = chunk.iloc[max(rows_done - start, 0):]
+                texts = chunk[text_columns].fillna('').astype(str).agg(' '.join, axis=1).tolist()
+
+                if pool is not None:
+                    encoded = model.encode_multi_process(texts, pool, batch_size=options['batch_size'])
+                else:
+                    encoded = model.encode(texts, batch_size=options['batch_size'], convert_to_numpy=True)
+
+                vectors[offset - len(chunk):offset] = encoded
+                vectors.flush()
+                rows_done = offset
+                progress['rows_done'] = rows_done
+                write_json_atomic(progress_path, progress)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"Encoded {rows_done}/{rows} rows ({elapsed:.1f}s)")
+        finally:
+            if pool is not None:
+                model.stop_multi_process_pool(pool)
+
+        del vectors
+        csv_path = os.path.join(output, 'train.csv')
+        embedding_path = os.path.join(output, 'embeddings.npy')
+        os.replace(csv_partial, csv_path)
+        os.replace(embeddings_partial, embedding_path)
+
+        files = {'train.csv': file_entry(csv_path), 'embeddings.npy': file_entry(embedding_path)}
+        store_dir = os.path.join(output, 'store')
+        if not options['store_format'] and EmbeddingStore.exists(store_dir):
+            # A store from a previous build would shadow the new embeddings
+            self.stdout.write(f"Removing stale embedding store at {store_dir}")
+            shutil.rmtree(store_dir)
+        if options['store_format']:
+            store = EmbeddingStore.from_array(np.load(embedding_path, mmap_mode='r'), options['store_format'])
+            store.save(store_dir)
+            for name in ('vectors.npy', 'scales.npy', 'store.json'):
+                if os.path.exists(os.path.join(store_dir, name)):
+                    files[f'store/{name}'] = file_entry(os.path.join(store_dir, name))
+
+        ivf_path = os.path.join(output, IVF_FILE)
+        if options['ann']:
+            store = EmbeddingStore.open(store_dir) if options['store_format'] else \
+                EmbeddingStore.from_array(np.load(embedding_path, mmap_mode='r'))
+            IVFIndex.build(store).save(output)
+            files[IVF_FILE] = file_entry(ivf_path)
+        elif os.path.exists(ivf_path):
+            self.stdout.write(f"Removing stale IVF index at {ivf_path}")
+            os.remove(ivf_path)
+
+        bm25_path = os.path.join(output, BM25_FILE)
+        if options['lexical']:
+            BM25Index.from_dataframe(pd.read_csv(csv_path)).save(output)
+            files[BM25_FILE] = file_entry(bm25_path)
+        elif os.path.exists(bm25_path):
+            self.stdout.write(f"Removing stale BM25 index at {bm25_path}")
+            os.remove(bm25_path)
+
+        write_json_atomic(os.path.join(output, MANIFEST_NAME), {
+            'model': options['model'],
+            'dim': dim,
+            'rows': rows,
+            'text_columns': text_columns,
+            'sources': [os.path.basename(path) for path in options['csv_files']],
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'files': files,
+        })
+        os.remove(progress_path)
+        self.stdout.write(self.style.SUCCESS(f"Built {rows} x {dim} corpus in {output}"))
+
+        if options['activate']:
+            try:
+                embedding_service.activate(options['corpus_version'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f"Activated corpus version {options['corpus_version']}"))
+
+    def write_combined_csv(self, csv_files, path, text_columns, chunk_size):
+        """Concatenate the input CSVs into one corpus CSV, streaming chunk by chunk."""
+        # Check every input before writing anything; reindex would fill a missing column with NaN
+        for csv_file in csv_files:
+            missing = set(MCQ_COLUMNS + text_columns) - set(pd.read_csv(csv_file, nrows=0).columns)
+            if missing:
+                raise CommandError(f"{csv_file} is missing columns: {', '.join(sorted(missing))}")
+
+        columns = None
+        rows = 0
+        with open(path, 'w', newline='') as f:
+            for csv_file in csv_files:
+                for chunk in pd.read_csv(csv_file, chunksize=chunk_size):
+                    if columns is None:
+                        columns = list(chunk.columns)
+                    chunk.reindex(columns=columns).to_csv(f, header=rows == 0, index=False)
+                    rows += len(chunk)
+                self.stdout.write(f"Read {csv_file} ({rows} rows so far)")
+        return rows
+
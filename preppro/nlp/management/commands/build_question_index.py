@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from nlp.bank import question_bank
+
+
+class Command(BaseCommand):
+    help = 'Brings the question bank index (bank.npz) up to date with the questions table'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        question_bank.load()
+        stale = question_bank.stale_ids()
+        if stale:
+            question_bank.update(stale)
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-indexed {len(stale)} questions, {len(question_bank.snapshot)} indexed "
+            f"in {time.perf_counter() - started:.1f}s ({question_bank.path})"
+        ))
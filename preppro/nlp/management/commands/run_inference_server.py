@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from nlp.embedding import EMBEDDING_MODEL
+from nlp.inference import InferenceServer
+
+
+class Command(BaseCommand):
+    help = 'Runs the embedding model in its own process, serving web workers over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.NLP_INFERENCE_SOCKET, help='Unix socket path (default: NLP_INFERENCE_SOCKET)')
+        parser.add_argument('--model', default=EMBEDDING_MODEL)
+        parser.add_argument('--threads', type=int, default=settings.NLP_INFERENCE_THREADS, help='torch intra-op threads')
+        parser.add_argument('--max-queue', type=int, default=settings.NLP_INFERENCE_QUEUE_SIZE, help='Requests in flight before new ones are rejected')
+        parser.add_argument('--batch-size', type=int, default=settings.NLP_MICROBATCH_MAX_SIZE)
+        parser.add_argument('--max-wait-ms', type=float, default=settings.NLP_MICROBATCH_MAX_WAIT_MS)
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError('No socket path: pass --socket or set NLP_INFERENCE_SOCKET')
+
+        server = InferenceServer(
+            options['socket'], options['model'],
+            threads=options['threads'],
+            max_queue=options['max_queue'],
+            max_batch_size=options['batch_size'],
+            max_wait=options['max_wait_ms'] / 1000,
+        )
+        self.stdout.write(f"Loading {options['model']} with {options['threads']} threads...")
+        server.load()
+        self.stdout.write(self.style.SUCCESS(f"Serving embeddings on {options['socket']}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Inference server stopped")
@@ -0,0 +1,69 @@
+import re
+import json
+import time
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+
+def stub_reply(prompt):
+    """Canned reply in the format the real endpoint returns for our prompts."""
+    count = re.search(r'Generate (\d+)', prompt)
+    if count is None:
+        return "Summary: stub summary of the text.\n- Key point one\n- Key point two\n- Key point three"
+
+    words = re.findall(r'[A-Za-z]{4,}', prompt.split('text:', 1)[-1]) or ['topic']
+    lines = []
+    for i in range(1, int(count.group(1)) + 1):
+        word = words[(i - 1) % len(words)]
+        lines += [
+            f"Q{i}. Which statement about {word} is correct?",
+            f"A. {word} is described in the text",
+            f"B. {word} is never mentioned",
+            f"C. {word} is unrelated to the topic",
+            f"D. None of the above",
+            "Answer: A",
+            "",
+        ]
+    return '\n'.join(lines)
+
+
+class Command(BaseCommand):
+    help = 'Runs a local stand-in for the RapidAPI chat endpoint (set NLP_LLM_URL to its address)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before each reply')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 503')
+
+    def handle(self, *args, **options):
+        delay = options['delay']
+        fail_rate = options['fail_rate']
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                time.sleep(delay)
+                if random.random() < fail_rate:
+                    status, reply = 503, {'message': 'stub failure'}
+                else:
+                    prompt = body.get('messages', [{}])[-1].get('content', '')
+                    status, reply = 200, {'result': stub_reply(prompt)}
+                data = json.dumps(reply).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(
+            f"LLM stub listening; set NLP_LLM_URL=http://127.0.0.1:{options['port']}/claude3"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("LLM stub stopped")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from nlp import corpus
+from nlp.embedding import embedding_service
+
+
+class Command(BaseCommand):
+    help = 'Lists MCQ corpus versions or atomically switches the active one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', nargs='?', help='Version to activate')
+
+    def handle(self, *args, **options):
+        root = embedding_service.corpus_root
+        current = corpus.read_current(root)
+
+        if not options['version']:
+            versions = corpus.list_versions(root)
+            if not versions:
+                self.stdout.write(f"No corpus versions in {root}")
+            for version in versions:
+                marker = '*' if version == current else ' '
+                self.stdout.write(f"{marker} {version}")
+            return
+
+        if options['version'] not in corpus.list_versions(root):
+            raise CommandError(f"Unknown corpus version {options['version']}")
+        try:
+            # Loads and verifies the version before CURRENT is rewritten
+            embedding_service.activate(options['version'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Switched corpus from {current} to {options['version']}; "
+            f"workers pick it up within NLP_CORPUS_CHECK_INTERVAL seconds"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from nlp.embedding import embedding_service
+
+
+class Command(BaseCommand):
+    help = 'Loads the embedding model and MCQ corpus and reports load time'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(f"Warming up {embedding_service.model_name}...")
+        ready = embedding_service.warmup()
+        status = embedding_service.status()
+
+        for key, value in status.items():
+            self.stdout.write(f"  {key}: {value}")
+
+        if not ready:
+            raise CommandError(f"NLP warmup failed: {status['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {status['corpus_size']} questions in {status['load_time']}s"
+        ))
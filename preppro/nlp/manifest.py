@@ -0,0 +1,59 @@
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_entry(path):
+    return {'sha256': file_checksum(path), 'bytes': os.path.getsize(path)}
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_manifest(directory):
+    return load_json(os.path.join(directory, MANIFEST_NAME))
+
+
+def verify_manifest(directory, manifest, model_name, rows, dim, files, checksums=True):
+    """Raise ValueError if the corpus files in ``directory`` don't match ``manifest``.
+
+    ``files`` are paths relative to ``directory``. Sizes are always compared;
+    full SHA-256 checksums only when ``checksums`` is set.
+    """
+    if manifest['model'] != model_name:
+        raise ValueError(f"Corpus was embedded with {manifest['model']}, but the service uses {model_name}")
+    if manifest['rows'] != rows:
+        raise ValueError(f"Manifest lists {manifest['rows']} rows but the corpus has {rows}")
+    if manifest['dim'] != dim:
+        raise ValueError(f"Manifest lists dimension {manifest['dim']} but the vectors have {dim}")
+
+    for name in files:
+        expected = manifest['files'].get(name)
+        if expected is None:
+            raise ValueError(f"{name} is not listed in the manifest")
+        path = os.path.join(directory, name)
+        if os.path.getsize(path) != expected['bytes']:
+            raise ValueError(f"{name} is {os.path.getsize(path)} bytes, manifest expects {expected['bytes']}")
+        if checksums and file_checksum(path) != expected['sha256']:
+            raise ValueError(f"{name} checksum does not match the manifest")
@@ -0,0 +1,34 @@
+import numpy as np
+from .store import normalize_rows
+
+
+def mmr_order(relevance, vectors, relevance_weight=0.7):
+    """Maximal-marginal-relevance ordering of candidates.
+
+    Each step picks the candidate maximising
+    ``relevance_weight * relevance - (1 - relevance_weight) * max_sim``, where
+    ``max_sim`` is its highest cosine similarity to any candidate already
+    picked. Similarities come from one ``m x m`` product over the candidate
+    vectors, and ``max_sim`` is updated with one vectorized ``maximum`` per
+    step. Near-duplicates therefore sink to the end instead of taking the
+    first slots. Returns positions into ``relevance``.
+    """
+    count = len(relevance)
+    if count <= 1:
+        return np.arange(count)
+
+    vectors = normalize_rows(vectors)
+    similarity = vectors @ vectors.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_sim = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    order = np.empty(count, dtype=np.int64)
+
+    for step in range(count):
+        gain = relevance_weight * relevance - (1 - relevance_weight) * max_sim
+        gain[~available] = -np.inf
+        pick = int(np.argmax(gain))
+        order[step] = pick
+        available[pick] = False
+        np.maximum(max_sim, similarity[pick], out=max_sim)
+    return order
@@ -0,0 +1,87 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Monotonic time budget for one request, shared by the stages that run under it."""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self, cap=None):
+        """Seconds left, never negative; at most ``cap`` when given."""
+        left = max(0.0, self.expires_at - time.monotonic())
+        return min(left, cap) if cap is not None else left
+
+    @property
+    def expired(self):
+        return self.remaining() == 0.0
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency and probes it again after a cool-down.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    ``allow()`` returns False for ``reset_timeout`` seconds. It then goes
+    half-open: a single caller is let through as a probe, and its outcome
+    closes the breaker again or re-opens it for another ``reset_timeout``.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,214 @@
+import numpy as np
+from .store import EmbeddingStore, normalize_rows
+
+QUERY_BLOCK = 64
+PASSAGE_BLOCK = 8
+MCQ_COLUMNS = ['question', 'correct_answer', 'distractor1', 'distractor2', 'distractor3', 'support']
+FACET_COLUMNS = ['subject', 'topic', 'difficulty']
+
+
+def select_top_k(rows, scores, k, threshold=None):
+    """The ``k`` highest-scoring ``rows`` above ``threshold``, best first."""
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if threshold is not None:
+        keep = np.flatnonzero(scores > threshold)
+        rows, scores = rows[keep], scores[keep]
+    if len(rows) > k:
+        part = np.argpartition(scores, -k)[-k:]
+        rows, scores = rows[part], scores[part]
+    order = np.argsort(scores)[::-1]
+    return rows[order], scores[order]
+
+
+def facet_value(value):
+    return str(value).strip().lower()
+
+
+def build_facets(columns):
+    """Sorted row-id lists per value of each metadata column in ``columns``.
+
+    Rows with a blank value are treated as matching every value, so each
+    value's list already includes them.
+    """
+    facets = {}
+    for name in FACET_COLUMNS:
+        if name not in columns:
+            continue
+        values, inverse = np.unique([facet_value(v) for v in columns[name]], return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(values)))])
+        groups = {value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(values.tolist())}
+        unlabeled = groups.pop('', order[:0])
+        facets[name] = {value: np.union1d(rows, unlabeled) for value, rows in groups.items()}
+        facets[name][''] = unlabeled
+    return facets
+
+
+class CorpusIndex:
+    """Cosine search over the MCQ corpus.
+
+    Vectors live in an ``EmbeddingStore`` and are normalized once when the
+    store is built, so a query is a single matrix-vector product followed by an
+    ``argpartition`` top-k. Row fields are kept as columnar arrays to avoid
+    building a pandas row per result. With an ``IVFIndex`` attached, queries
+    only score the rows of the ``nprobe`` nearest buckets. With a
+    ``BM25Index`` attached, queries that come with their text are first
+    narrowed to the ``lexical_candidates`` best lexical matches and only those
+    are scored densely; fewer than ``lexical_min_candidates`` matches fall back
+    to dense search.
+
+    If the corpus has ``subject``, ``topic`` or ``difficulty`` columns,
+    ``filter_rows`` turns request filters into row ids from per-value lists
+    built at load time. Filtered queries score only those rows.
+
+    ``distractors``, when built, is the corpus's ``DistractorIndex`` for
+    filling in missing options.
+    """
+
+    def __init__(self, embeddings, columns, ann=None, nprobe=8, lexical=None, lexical_candidates=1000,
+                 lexical_min_candidates=50, distractors=None):
+        if not isinstance(embeddings, EmbeddingStore):
+            embeddings = EmbeddingStore.from_array(embeddings)
+        self.store = embeddings
+        self.columns = columns
+        self.ann = ann
+        self.nprobe = nprobe
+        self.lexical = lexical
+        self.lexical_candidates = lexical_candidates
+        self.lexical_min_candidates = lexical_min_candidates
+        self.distractors = distractors
+        if ann is not None and len(ann) != len(self.store):
+            raise ValueError(f"ANN index covers {len(ann)} rows but embeddings has {len(self.store)} vectors")
+        if lexical is not None and len(lexical) != len(self.store):
+            raise ValueError(f"Lexical index covers {len(lexical)} rows but embeddings has {len(self.store)} vectors")
+        for name, values in columns.items():
+            if len(values) != len(self.store):
+                raise ValueError(f"Column {name} has {len(values)} rows but embeddings has {len(self.store)} vectors")
+        self.facets = build_facets(columns)
+
+    @classmethod
+    def from_dataframe(cls, df, embeddings, **kwargs):
+        columns = {
+            name: df[name].fillna('').astype(str).to_numpy(dtype=object)
+            for name in MCQ_COLUMNS + [c for c in FACET_COLUMNS if c in df.columns]
+        }
+        return cls(embeddings, columns, **kwargs)
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def dim(self):
+        return self.store.dim
+
+    def scores(self, query_vec):
+        """Cosine similarity of ``query_vec`` against every row."""
+        return self.store.scores(normalize_rows(query_vec).ravel())
+
+    def lexical_rows(self, query_text):
+        """Sorted BM25 candidate rows for ``query_text``, or None when dense search should run."""
+        if self.lexical is None or not query_text:
+            return None
+        rows, _ = self.lexical.search(query_text, self.lexical_candidates)
+        if len(rows) < self.lexical_min_candidates:
+            return None
+        return np.sort(rows)
+
+    def filter_rows(self, filters):
+        """Sorted rows matching every ``{column: value}`` in ``filters``, or None if none applies.
+
+        Filters on columns the corpus doesn't have, or with empty values, are ignored.
+        """
+        rows = None
+        for name, value in (filters or {}).items():
+            facet = self.facets.get(name)
+            if facet is None or not value:
+                continue
+            matching = facet.get(facet_value(value), facet[''])
+            rows = matching if rows is None else np.intersect1d(rows, matching, assume_unique=True)
+        return rows
+
+    def restrict(self, rows, query_text, exact=False):
+        """Filtered rows, narrowed to the lexical candidates when enough of them match."""
+        lexical = self.lexical_rows(query_text) if not exact else None
+        if lexical is not None:
+            narrowed = np.intersect1d(lexical, rows, assume_unique=True)
+            if len(narrowed) >= self.lexical_min_candidates:
+                return narrowed
+        return rows
+
+    def candidate_scores(self, query_vec, exact=False, nprobe=None, query_text=None, rows=None):
+        """Row ids and scores to rank for ``query_vec``: every row, the filtered rows, or the lexical or ANN candidates."""
+        query_vec = normalize_rows(query_vec).ravel()
+        if rows is not None:
+            rows = self.restrict(rows, query_text, exact)
+            return rows, self.store.scores(query_vec, rows=rows)
+        rows = self.lexical_rows(query_text) if not exact else None
+        if rows is not None:
+            return rows, self.store.scores(query_vec, rows=rows)
+        if self.ann is None or exact:
+            return np.arange(len(self.store)), self.store.scores(query_vec)
+        rows = self.ann.candidates(query_vec, nprobe or self.nprobe)
+        return rows, self.store.scores(query_vec, rows=rows)
+
+    def top_k(self, query_vec, k, threshold=None, exact=False, nprobe=None, query_text=None, rows=None):
+        """Indices and scores of the ``k`` best rows above ``threshold``, best first."""
+        rows, scores = self.candidate_scores(query_vec, exact=exact, nprobe=nprobe, query_text=query_text, rows=rows)
+        return select_top_k(rows, scores, k, threshold)
+
+    def top_k_many(self, query_matrix, ks, threshold=None, exact=False, query_texts=None, row_filters=None):
+        """``top_k`` for several queries; exact search scores them with one matrix-matrix product.
+
+        Queries are processed ``QUERY_BLOCK`` at a time to bound the size of the
+        rows x queries score matrix.
+        """
+        query_matrix = normalize_rows(query_matrix)
+        filtered = row_filters is not None and any(rows is not None for rows in row_filters)
+        if filtered or ((self.ann is not None or (self.lexical is not None and query_texts)) and not exact):
+            texts = query_texts or [None] * len(query_matrix)
+            row_filters = row_filters or [None] * len(query_matrix)
+            return [
+                self.top_k(query, k, threshold, exact=exact, query_text=text, rows=rows)
+                for query, k, text, rows in zip(query_matrix, ks, texts, row_filters)
+            ]
+
+        results = []
+        rows = np.arange(len(self.store))
+        for start in range(0, len(query_matrix), QUERY_BLOCK):
+            scores = self.store.scores_many(query_matrix[start:start + QUERY_BLOCK])
+            for column, k in enumerate(ks[start:start + QUERY_BLOCK]):
+                results.append(select_top_k(rows, scores[:, column], k, threshold))
+        return results
+
+    def top_k_passages(self, passage_matrix, k, threshold=None, exact=False, query_text=None, rows=None):
+        """``top_k`` for a text split into passages; each row scores as its best-matching passage.
+
+        Exact search keeps a running maximum over ``PASSAGE_BLOCK`` passages at
+        a time, so the score buffer stays rows x ``PASSAGE_BLOCK``.
+        """
+        passage_matrix = normalize_rows(passage_matrix)
+        if len(passage_matrix) == 1:
+            return self.top_k(passage_matrix[0], k, threshold, exact=exact, query_text=query_text, rows=rows)
+
+        if rows is not None:
+            rows = self.restrict(rows, query_text, exact)
+        else:
+            rows = self.lexical_rows(query_text) if not exact else None
+        if rows is not None:
+            scores = np.max([self.store.scores(p, rows=rows) for p in passage_matrix], axis=0)
+            return select_top_k(rows, scores, k, threshold)
+
+        if self.ann is not None and not exact:
+            rows = np.unique(np.concatenate([self.ann.candidates(p, self.nprobe) for p in passage_matrix]))
+            scores = np.max([self.store.scores(p, rows=rows) for p in passage_matrix], axis=0)
+            return select_top_k(rows, scores, k, threshold)
+
+        scores = None
+        for start in range(0, len(passage_matrix), PASSAGE_BLOCK):
+            block_scores = self.store.scores_many(passage_matrix[start:start + PASSAGE_BLOCK]).max(axis=1)
+            scores = block_scores if scores is None else np.maximum(scores, block_scores)
+        return select_top_k(np.arange(len(self.store)), scores, k, threshold)
+
+    def row(self, idx):
+        return {name: values[idx] for name, values in self.columns.items()}
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from questions.models import Question
+from .bank import question_bank
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def reindex_question(sender, instance, **kwargs):
+    # After commit, so the background encoder reads the saved row
+    question_id = instance.pk
+    transaction.on_commit(lambda: question_bank.schedule(question_id))
@@ -0,0 +1,144 @@
+import os
+import json
+import numpy as np
+from .manifest import write_json_atomic
+
+STORE_FORMATS = ('float32', 'float16', 'int8')
+BLOCK_ROWS = 65536
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row of ``matrix`` into a contiguous float32 array."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def save_array_atomic(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingStore:
+    """L2-normalized corpus vectors, stored as float32, float16 or int8.
+
+    A saved store is a directory holding ``vectors.npy``, ``scales.npy`` (int8
+    only, one scale per row) and ``store.json``. ``open`` maps the arrays with
+    ``mmap_mode='r'`` so every worker on a node shares the same page cache
+    instead of holding a private copy. Quantized formats are widened to float32
+    in blocks of ``BLOCK_ROWS`` rows at query time, so no full-size temporary
+    is ever allocated.
+    """
+
+    def __init__(self, vectors, scales=None, fmt='float32'):
+        if fmt not in STORE_FORMATS:
+            raise ValueError(f"Unknown store format {fmt}, expected one of {STORE_FORMATS}")
+        self.vectors = vectors
+        self.scales = scales
+        self.format = fmt
+
+    @classmethod
+    def from_array(cls, embeddings, fmt='float32'):
+        matrix = normalize_rows(embeddings)
+        if fmt == 'float32':
+            return cls(matrix, None, fmt)
+        if fmt == 'float16':
+            return cls(matrix.astype(np.float16), None, fmt)
+        if fmt == 'int8':
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return cls(quantized, scales.astype(np.float32), fmt)
+        raise ValueError(f"Unknown store format {fmt}, expected one of {STORE_FORMATS}")
+
+    @classmethod
+    def exists(cls, directory):
+        return os.path.exists(os.path.join(directory, 'store.json'))
+
+    @classmethod
+    def open(cls, directory, mmap=True):
+        with open(os.path.join(directory, 'store.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode=mode)
+        scales = None
+        if meta['format'] == 'int8':
+            scales = np.load(os.path.join(directory, 'scales.npy'), mmap_mode=mode)
+        if vectors.shape != (meta['rows'], meta['dim']):
+            raise ValueError(f"Store at {directory} has shape {vectors.shape}, expected ({meta['rows']}, {meta['dim']})")
+        return cls(vectors, scales, meta['format'])
+
+    def save(self, directory):
+        """Write the store; each file is written beside its target and renamed into place.
+
+        Workers may have the old ``vectors.npy`` mapped; replacing the file
+        leaves their mapping on the old inode instead of truncating it under them.
+        """
+        os.makedirs(directory, exist_ok=True)
+        save_array_atomic(os.path.join(directory, 'vectors.npy'), self.vectors)
+        if self.scales is not None:
+            save_array_atomic(os.path.join(directory, 'scales.npy'), self.scales)
+        write_json_atomic(os.path.join(directory, 'store.json'), {'format': self.format, 'rows': len(self), 'dim': self.dim})
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def shape(self):
+        return self.vectors.shape
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def take(self, rows):
+        """Dequantized float32 vectors for the given row ids."""
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows][:, None]
+        return vectors
+
+    def scores(self, query_vec, rows=None):
+        """Cosine similarity of a normalized ``query_vec`` against every row, or only ``rows``."""
+        if rows is not None:
+            return self.take(rows) @ query_vec
+        if self.format == 'float32':
+            return np.asarray(self.vectors @ query_vec)
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ query_vec
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def scores_many(self, query_matrix):
+        """Cosine similarities of normalized queries (m x dim) against every row, as n x m."""
+        if self.format == 'float32':
+            return np.asarray(self.vectors @ query_matrix.T)
+        out = np.empty((len(self), len(query_matrix)), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ query_matrix.T
+        if self.scales is not None:
+            out *= self.scales[:, None]
+        return out
+
+
+def quantization_recall(embeddings, fmt, queries, k=10):
+    """Mean recall@k of top-k search in ``fmt`` against exact float32 search."""
+    exact = EmbeddingStore.from_array(embeddings, 'float32')
+    quantized = EmbeddingStore.from_array(embeddings, fmt)
+    hits = 0
+    for query in normalize_rows(queries):
+        expected = np.argpartition(exact.scores(query), -k)[-k:]
+        found = np.argpartition(quantized.scores(query), -k)[-k:]
+        hits += len(np.intersect1d(expected, found))
+    return hits / (k * len(queries))
@@ -0,0 +1,52 @@
+import numpy as np
+from .chunking import split_sentences
+from .rerank import mmr_order
+from .store import normalize_rows
+
+
+def textrank(vectors, damping=0.85, iterations=100, tolerance=1e-6):
+    """Centrality of each row of ``vectors`` by PageRank over their cosine-similarity graph.
+
+    Edges are the positive similarities between distinct sentences; rows of
+    the transition matrix are normalized so a sentence that resembles many
+    others passes on less weight to each. Power iteration stops once the
+    scores change by less than ``tolerance``.
+    """
+    count = len(vectors)
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    vectors = normalize_rows(vectors)
+    weights = np.clip(vectors @ vectors.T, 0, None)
+    np.fill_diagonal(weights, 0)
+    totals = weights.sum(axis=1, keepdims=True)
+    # A sentence unlike all others links to every sentence equally
+    transition = np.where(totals > 0, weights / np.where(totals > 0, totals, 1), 1.0 / count)
+
+    scores = np.full(count, 1.0 / count, dtype=np.float32)
+    for _ in range(iterations):
+        updated = (1 - damping) / count + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize(text, encode_fn, max_points=7, max_sentences=200, diversity=0.3):
+    """Key sentences of ``text``, in document order; empty when it can't be shortened.
+
+    About a third of the sentences (up to ``max_sentences``), at most
+    ``max_points``, are kept. They are embedded in one ``encode_fn`` call
+    and ranked with ``textrank``, then picked with MMR so two near-identical
+    sentences don't both become key points. Text with fewer than three
+    sentences has no shorter summary, so the result is empty and callers
+    fall back to another summarizer.
+    """
+    sentences = split_sentences(text, max_sentences=max_sentences)
+    points = min(max_points, len(sentences) // 3)
+    if points == 0:
+        return []
+    vectors = normalize_rows(encode_fn(sentences))
+    scores = textrank(vectors)
+    # Scale centrality to [0, 1] so it is comparable with the MMR similarity penalty
+    order = mmr_order(scores / scores.max(), vectors, 1 - diversity)[:points]
+    return [sentences[i] for i in sorted(order.tolist())]
@@ -0,0 +1,17 @@
+import re
+import zlib
+import numpy as np
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'nlp': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'nlp-tests'},
+}
+
+
+def fake_encode(texts, dim=64):
+    """Bag-of-words vectors: texts sharing words are similar, no model needed."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r'[a-z0-9]+', text.lower()):
+            vectors[row, zlib.crc32(word.encode('utf-8')) % dim] += 1
+    return vectors
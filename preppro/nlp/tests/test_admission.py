@@ -0,0 +1,63 @@
+import time
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from nlp.admission import TokenBucket
+from . import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.bucket = TokenBucket('nlp', 'bucket:test', capacity=3, rate=0.5)
+        self.bucket.cache.clear()
+
+    def test_admits_a_burst_then_reports_the_wait(self):
+        results = [self.bucket.take('user')[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        allowed, wait = self.bucket.take('user')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 2.0, delta=0.1)
+
+    def test_keys_have_separate_buckets(self):
+        for _ in range(3):
+            self.bucket.take('a')
+        self.assertFalse(self.bucket.take('a')[0])
+        self.assertTrue(self.bucket.take('b')[0])
+
+    def test_refills_at_rate(self):
+        now = time.time()
+        with mock.patch('nlp.admission.time.time', return_value=now):
+            for _ in range(3):
+                self.bucket.take('user')
+        with mock.patch('nlp.admission.time.time', return_value=now + 2.1):
+            self.assertTrue(self.bucket.take('user')[0])
+            self.assertFalse(self.bucket.take('user')[0])
+
+    def test_costs_are_paid_in_full(self):
+        now = time.time()
+        with mock.patch('nlp.admission.time.time', return_value=now):
+            self.assertTrue(self.bucket.take('user', cost=2)[0])
+            self.assertTrue(self.bucket.take('user')[0])
+            self.assertFalse(self.bucket.take('user')[0])
+        # A full bucket admits a 10-item batch, which then owes 7 tokens
+        with mock.patch('nlp.admission.time.time', return_value=now + 6):
+            self.assertTrue(self.bucket.take('user', cost=10)[0])
+            allowed, wait = self.bucket.take('user')
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 16.0)
+        with mock.patch('nlp.admission.time.time', return_value=now + 21.9):
+            self.assertFalse(self.bucket.take('user')[0])
+        with mock.patch('nlp.admission.time.time', return_value=now + 22.1):
+            self.assertTrue(self.bucket.take('user')[0])
+
+    def test_denies_when_another_process_holds_the_lock(self):
+        bucket = TokenBucket('nlp', 'bucket:test', capacity=3, rate=0.5, lock_ttl=2, lock_wait=0.02)
+        bucket.cache.add('lock:bucket:test:user', 'other-worker', timeout=5)
+        self.assertEqual(bucket.take('user'), (False, 2.0))
+        self.assertEqual(bucket.contended, 1)
+        self.assertEqual(bucket.cache.get('lock:bucket:test:user'), 'other-worker')
+
+    def test_fails_open_when_the_cache_errors(self):
+        with mock.patch.object(TokenBucket, 'cache', new_callable=mock.PropertyMock) as cache:
+            cache.return_value.add.side_effect = ConnectionError('cache down')
+            self.assertEqual(self.bucket.take('user'), (True, 0.0))
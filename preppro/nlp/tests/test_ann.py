@@ -0,0 +1,50 @@
+import tempfile
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.ann import IVFIndex
+from nlp.search import CorpusIndex
+from nlp.store import EmbeddingStore
+from .test_search import make_columns
+
+
+class IVFIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(500, 16)).astype(np.float32)
+        self.store = EmbeddingStore.from_array(self.embeddings)
+
+    def test_every_row_is_in_exactly_one_bucket(self):
+        index = IVFIndex.build(self.store, n_lists=20)
+        self.assertEqual(index.n_lists, 20)
+        self.assertEqual(sorted(index.list_rows.tolist()), list(range(500)))
+        self.assertEqual(index.list_offsets[-1], 500)
+
+    def test_probing_every_bucket_is_exact(self):
+        index = IVFIndex.build(self.store, n_lists=20)
+        corpus = CorpusIndex(self.store, make_columns(500), ann=index, nprobe=20)
+        for query in self.embeddings[:10]:
+            self.assertEqual(corpus.top_k(query, 5)[0].tolist(), corpus.top_k(query, 5, exact=True)[0].tolist())
+
+    def test_probing_finds_the_query_row(self):
+        index = IVFIndex.build(self.store)
+        corpus = CorpusIndex(self.store, make_columns(500), ann=index, nprobe=4)
+        hits = sum(corpus.top_k(query, 1)[0][0] == i for i, query in enumerate(self.embeddings[:50]))
+        self.assertGreaterEqual(hits, 48)
+
+    def test_small_corpora(self):
+        for rows in (1, 3, 15):
+            with self.subTest(rows=rows):
+                index = IVFIndex.build(EmbeddingStore.from_array(self.embeddings[:rows]))
+                self.assertLessEqual(index.n_lists, rows)
+                self.assertEqual(len(index), rows)
+        index = IVFIndex.build(self.store, n_lists=50, sample_size=10)
+        self.assertEqual(index.n_lists, 50)
+
+    def test_save_and_load(self):
+        index = IVFIndex.build(self.store, n_lists=10)
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            self.assertTrue(IVFIndex.exists(directory))
+            loaded = IVFIndex.load(directory)
+        np.testing.assert_array_equal(loaded.list_rows, index.list_rows)
+        np.testing.assert_allclose(loaded.centroids, index.centroids)
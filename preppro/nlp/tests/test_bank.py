@@ -0,0 +1,83 @@
+import os
+import tempfile
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from questions.models import Question
+from nlp.bank import BANK_FILE, QuestionBankIndex
+from . import fake_encode
+
+
+def add_question(text, subject='biology', difficulty='easy'):
+    return Question.objects.create(
+        question=text, options=['a', 'b', 'c', 'd'], correct_answer=0, subject=subject, topic='', difficulty=difficulty,
+    )
+
+
+class QuestionBankIndexTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        self.encode = mock.Mock(side_effect=fake_encode)
+        self.bank = self.make_bank()
+        self.cells = add_question('What is the powerhouse of the cell?')
+        self.plants = add_question('Where does photosynthesis take place in plants?')
+        self.motion = add_question("What does Newton's first law of motion state?", subject='physics', difficulty='hard')
+
+    def make_bank(self, model_name='test-model'):
+        return QuestionBankIndex(self.directory, self.encode, model_name, batch_size=2)
+
+    def sync(self, bank=None):
+        bank = bank or self.bank
+        bank.update(bank.stale_ids())
+
+    def search(self, text, bank=None, **filters):
+        with mock.patch.object(QuestionBankIndex, 'ensure_started'):
+            ids, _ = (bank or self.bank).search(fake_encode([text]), 3, threshold=0.3, filters=filters)
+        return ids.tolist()
+
+    def test_sync_indexes_every_question(self):
+        self.assertEqual(self.bank.stale_ids(), {self.cells.pk, self.plants.pk, self.motion.pk})
+        self.sync()
+        self.assertEqual(len(self.bank.snapshot), 3)
+        self.assertEqual(self.bank.stale_ids(), set())
+        self.assertEqual(self.encode.call_count, 2)
+        self.assertEqual(self.search('photosynthesis in plants')[0], self.plants.pk)
+
+    def test_only_changed_questions_are_re_encoded(self):
+        self.sync()
+        self.encode.reset_mock()
+        Question.objects.filter(pk=self.cells.pk).update(
+            question='Which organelle makes ATP for the cell?', updated_at=timezone.now() + timezone.timedelta(seconds=1),
+        )
+        self.assertEqual(self.bank.stale_ids(), {self.cells.pk})
+        self.sync()
+        self.assertEqual(self.encode.call_args.args[0], ['Which organelle makes ATP for the cell?'])
+        self.assertEqual(self.search('organelle ATP')[0], self.cells.pk)
+
+    def test_deleted_questions_are_dropped(self):
+        self.sync()
+        motion_pk = self.motion.pk
+        Question.objects.filter(pk=self.cells.pk).update(deleted_at=timezone.now())
+        self.motion.delete()
+        self.assertEqual(self.bank.stale_ids(), {self.cells.pk, motion_pk})
+        self.sync()
+        self.assertEqual(self.bank.snapshot.ids.tolist(), [self.plants.pk])
+        self.assertEqual(self.bank.removed, 2)
+
+    def test_filters(self):
+        self.sync()
+        self.assertEqual(self.search('first law of motion', subject='Physics'), [self.motion.pk])
+        self.assertNotIn(self.motion.pk, self.search('first law of motion', subject='biology'))
+        self.assertEqual(self.search('first law of motion', difficulty='easy', subject='physics'), [])
+
+    def test_saved_snapshot_is_reused_by_the_same_model_only(self):
+        self.sync()
+        self.assertTrue(os.path.exists(os.path.join(self.directory, BANK_FILE)))
+        reloaded = self.make_bank()
+        reloaded.load()
+        self.assertEqual(reloaded.stale_ids(), set())
+        other = self.make_bank('other-model')
+        other.load()
+        self.assertEqual(len(other.snapshot), 0)
@@ -0,0 +1,37 @@
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.batching import MicroBatcher
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_requests_share_one_encode_call(self):
+        calls = []
+
+        def encode(texts):
+            calls.append(list(texts))
+            return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+        batcher = MicroBatcher(encode, max_batch_size=64, max_wait=0.2)
+        futures = [batcher.submit(['a' * i, 'b' * i]) for i in range(1, 4)]
+        results = [future.result(5) for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        for i, vectors in enumerate(results, start=1):
+            self.assertEqual(vectors.ravel().tolist(), [i, i])
+
+    def test_encode_error_reaches_every_caller(self):
+        batcher = MicroBatcher(mock.Mock(side_effect=RuntimeError('model gone')), max_wait=0.05)
+        futures = [batcher.submit(['x']), batcher.submit(['y'])]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(5)
+
+    def test_empty_submission(self):
+        batcher = MicroBatcher(mock.Mock())
+        self.assertEqual(batcher.submit([]).result(1).shape, (0, 0))
+
+    def test_full_batch_is_sent_without_waiting(self):
+        batcher = MicroBatcher(lambda texts: np.zeros((len(texts), 1), dtype=np.float32), max_batch_size=2, max_wait=5)
+        self.assertEqual(batcher.submit(['a', 'b']).result(1).shape, (2, 1))
+        self.assertEqual(batcher.stats()['batch_sizes']['<=2'], 1)
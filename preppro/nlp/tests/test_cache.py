@@ -0,0 +1,165 @@
+import time
+import threading
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from nlp.cache import LRUCache, SingleFlight, TieredCache, mcq_cache_key
+from . import LOCMEM_CACHES
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_byte_limit(self):
+        cache = LRUCache(max_bytes=100)
+        cache.set('big', 'x' * 200)
+        self.assertIsNone(cache.get('big'))
+        cache.set('a', 'a', size=60)
+        cache.set('b', 'b', size=60)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.bytes), (None, 'b', 60))
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.expirations, 1)
+        cache.set('b', 2, ttl=60)
+        self.assertEqual(cache.get('b'), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TieredCache('nlp', LRUCache(), 60)
+        self.cache.shared.clear()
+
+    def test_shared_hits_fill_the_local_tier(self):
+        self.cache.shared.set('key', ['from another worker'])
+        self.assertEqual(self.cache.get('key'), ['from another worker'])
+        self.assertEqual(self.cache.local.get('key'), ['from another worker'])
+        self.assertEqual(self.cache.stats()['shared']['hits'], 1)
+
+    def test_set_writes_both_tiers(self):
+        self.cache.set('key', [1])
+        self.assertEqual((self.cache.local.get('key'), self.cache.shared.get('key')), ([1], [1]))
+
+    def test_shared_errors_are_misses(self):
+        with mock.patch.object(TieredCache, 'shared', new_callable=mock.PropertyMock) as shared:
+            shared.return_value.get.side_effect = ConnectionError('cache down')
+            shared.return_value.set.side_effect = ConnectionError('cache down')
+            self.cache.set('key', [1])
+            self.assertEqual(self.cache.get('key'), [1])
+            self.assertIsNone(self.cache.get('other'))
+        self.assertEqual(self.cache.shared_errors, 2)
+
+    def test_key_covers_every_parameter(self):
+        base = ('Photosynthesis', 5, 'medium', 'v1', 'biology', 'plants')
+        keys = {mcq_cache_key(*base)}
+        for i, value in enumerate(('Respiration', 6, 'hard', 'v2', 'chemistry', 'cells')):
+            keys.add(mcq_cache_key(*base[:i], value, *base[i + 1:]))
+        self.assertEqual(len(keys), 7)
+        self.assertEqual(mcq_cache_key(*base), mcq_cache_key(*base))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TieredCache('nlp', LRUCache(), 60)
+        self.cache.shared.clear()
+
+    def test_concurrent_callers_share_one_computation(self):
+        flight = SingleFlight(self.cache, lock_ttl=5)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return ['result']
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.run('key', compute)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flight.run('key', compute))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['result']] * 4)
+        self.assertEqual(flight.coalesced, 3)
+
+    def test_waits_for_a_lock_held_by_another_process(self):
+        flight = SingleFlight(self.cache, lock_ttl=5, poll_interval=0.01)
+        self.cache.shared.add('lock:key', 'other-worker', timeout=5)
+        threading.Timer(0.05, lambda: self.cache.set('key', ['theirs'])).start()
+        self.assertEqual(flight.run('key', lambda: ['ours']), ['theirs'])
+        self.assertEqual(flight.remote_hits, 1)
+
+    def test_error_reaches_every_waiter_and_is_not_cached(self):
+        flight = SingleFlight(self.cache)
+        with self.assertRaises(ValueError):
+            flight.run('key', mock.Mock(side_effect=ValueError('boom')))
+        self.assertEqual(flight.run('key', lambda: ['retry']), ['retry'])
+
+    def test_stream_passes_items_through_and_shares_the_values(self):
+        flight = SingleFlight(self.cache, lock_ttl=5)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def produce():
+            calls.append(1)
+            yield 'semantic', 'q1'
+            started.set()
+            release.wait(5)
+            yield 'llm', 'q2'
+
+        leader = flight.stream('key', produce)
+        self.assertEqual(next(leader), ('semantic', 'q1'))
+        results = {}
+        followers = [
+            threading.Thread(target=lambda: results.update(streamed=list(flight.stream('key', produce)))),
+            threading.Thread(target=lambda: results.update(ran=flight.run('key', lambda: ['other']))),
+        ]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        self.assertEqual(list(leader), [('llm', 'q2')])
+        for thread in followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, {'streamed': [('coalesced', 'q1'), ('coalesced', 'q2')], 'ran': ['q1', 'q2']})
+
+    def test_followers_start_over_when_the_leader_is_closed(self):
+        flight = SingleFlight(self.cache, lock_ttl=5)
+        release = threading.Event()
+
+        def produce():
+            yield 'semantic', 'q1'
+            release.wait(5)
+            yield 'llm', 'q2'
+
+        leader = flight.stream('key', produce)
+        next(leader)
+        results = []
+        follower = threading.Thread(target=lambda: results.extend(flight.stream('key', produce)))
+        follower.start()
+        time.sleep(0.05)
+        leader.close()
+        release.set()
+        follower.join(5)
+        self.assertEqual(results, [('semantic', 'q1'), ('llm', 'q2')])
+        self.assertIsNone(self.cache.shared.get('lock:key'))
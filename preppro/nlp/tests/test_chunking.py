@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+from nlp.chunking import split_passages, split_sentences
+
+
+class SplitPassagesTests(SimpleTestCase):
+    def test_short_text_is_one_passage(self):
+        text = 'Plants  make food\nfrom light.'
+        self.assertEqual(split_passages(text, max_words=10), [text])
+
+    def test_windows_overlap_and_cover_the_end(self):
+        words = [f'w{i}' for i in range(25)]
+        passages = split_passages(' '.join(words), max_words=10, overlap=3)
+        self.assertEqual([p.split()[0] for p in passages], ['w0', 'w7', 'w14', 'w21'])
+        self.assertTrue(all(len(p.split()) <= 10 for p in passages))
+        self.assertEqual(passages[-1].split()[-1], 'w24')
+
+    def test_very_long_text_is_capped(self):
+        passages = split_passages(' '.join(['word'] * 10000), max_words=100, overlap=20, max_passages=5)
+        self.assertEqual(len(passages), 5)
+
+
+class SplitSentencesTests(SimpleTestCase):
+    def test_sentences_abbreviations_and_lists(self):
+        text = (
+            "Photosynthesis happens in the chloroplast. Dr. Smith measured the rate, e.g. Water use rose sharply.\n"
+            "- Light reactions make ATP and NADPH\n"
+            "- The Calvin cycle fixes carbon dioxide\n\n"
+            "Figure 2.\n\n"
+            "Is oxygen released as a by-product? Yes it is released."
+        )
+        self.assertEqual(split_sentences(text), [
+            'Photosynthesis happens in the chloroplast.',
+            'Dr. Smith measured the rate, e.g. Water use rose sharply.',
+            'Light reactions make ATP and NADPH',
+            'The Calvin cycle fixes carbon dioxide',
+            'Is oxygen released as a by-product?',
+            'Yes it is released.',
+        ])
+
+    def test_max_sentences(self):
+        text = ' '.join(f'Sentence number {i} is here.' for i in range(10))
+        self.assertEqual(len(split_sentences(text, max_sentences=3)), 3)
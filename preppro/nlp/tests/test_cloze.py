@@ -0,0 +1,87 @@
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.chunking import split_sentences
+from nlp.cloze import (
+    BLANK, blank_overshadowed, cloze_mcqs, content_words, key_phrases, phrase_pattern, shares_word, weak_phrases,
+)
+
+TEXT = (
+    "Plants absorb carbon dioxide from the air through their stomata. "
+    "Chlorophyll captures light energy inside the chloroplast. "
+    "The Calvin cycle turns carbon dioxide into glucose within the stroma. "
+    "Water is split during the light reactions, releasing oxygen gas. "
+    "Glucose stores chemical energy that the mitochondria release during respiration. "
+    "Guard cells control the opening of the stomata on leaves. "
+    "Nitrogen from the soil is taken up by the roots as nitrate ions. "
+    "Xylem vessels carry water from the roots up to the leaves."
+)
+
+
+class KeyPhraseTests(SimpleTestCase):
+    def setUp(self):
+        self.sentences = split_sentences(TEXT, min_words=6)
+        phrases, _, matrix = key_phrases(self.sentences)
+        self.phrases = phrases.tolist()
+        self.counts = dict(zip(self.phrases, np.diff(matrix.indptr).tolist()))
+
+    def test_longer_phrases_rank_first_and_occur_verbatim(self):
+        self.assertEqual(self.phrases[0], 'carbon dioxide')
+        self.assertLess(self.phrases.index('carbon dioxide'), self.phrases.index('carbon'))
+        # "from the air" must not become "dioxide air" once its stop words are gone
+        self.assertNotIn('dioxide air', self.phrases)
+        self.assertTrue(all(phrase_pattern(phrase).search(TEXT) for phrase in self.phrases))
+
+    def test_phrases_cutting_through_a_more_common_phrase_are_weak(self):
+        weak = weak_phrases(self.sentences, self.phrases, self.counts)
+        self.assertIn('absorb carbon', weak)
+        self.assertIn('turns carbon', weak)
+        self.assertNotIn('carbon dioxide', weak)
+        self.assertIn('carbon', weak)
+        self.assertIn('oxygen released', weak_phrases(['No oxygen released here'], ['oxygen released'], {}))
+
+    def test_single_words_are_not_blanked_out_of_a_key_phrase(self):
+        sentence = 'Chlorophyll captures light energy inside the chloroplast.'
+        match = phrase_pattern('light').search(sentence)
+        self.assertTrue(blank_overshadowed(sentence, match, 'light', {'light energy': 1}))
+        self.assertFalse(blank_overshadowed(sentence, match, 'light', {}))
+
+
+class ClozeMcqTests(SimpleTestCase):
+    def assertValidQuestion(self, mcq):
+        question, answer, options = mcq['question_text'], mcq['correct_answer'], mcq['options']
+        self.assertEqual(question.count(BLANK), 1)
+        self.assertEqual(question.replace(BLANK, answer), mcq['support'])
+        self.assertEqual(len(options), 4)
+        self.assertEqual(len(set(options)), 4)
+        self.assertIn(answer, options)
+        # No option may give the answer away by repeating a word of the answer or the sentence
+        taken = content_words(question.replace(BLANK, ' ')) | content_words(answer)
+        for option in options:
+            if option != answer:
+                self.assertFalse(shares_word(content_words(option), taken), (option, question))
+
+    def test_questions(self):
+        mcqs = cloze_mcqs(TEXT, 5, 'medium')
+        self.assertEqual(len(mcqs), 5)
+        for mcq in mcqs:
+            self.assertValidQuestion(mcq)
+            self.assertEqual(mcq['difficulty'], 'medium')
+        answers = [mcq['correct_answer'].lower() for mcq in mcqs]
+        self.assertEqual(answers[0], 'carbon dioxide')
+        self.assertNotIn('carbon', answers)
+        self.assertNotIn('absorb carbon', answers)
+        self.assertEqual(len({mcq['support'] for mcq in mcqs}), 5)
+        self.assertEqual(mcqs[0]['relevance_score'], 1.0)
+
+    def test_options_fn_comes_first_and_is_filtered(self):
+        def options_fn(answer):
+            return [answer, 'Carbon monoxide', 'Sulfur trioxide', 'Helium', 'Methane']
+
+        mcq = cloze_mcqs(TEXT, 1, 'easy', options_fn=options_fn)[0]
+        self.assertValidQuestion(mcq)
+        self.assertEqual(sorted(mcq['options']), ['Helium', 'Methane', 'Sulfur trioxide', 'carbon dioxide'])
+
+    def test_nothing_to_ask(self):
+        self.assertEqual(cloze_mcqs('', 3, 'easy'), [])
+        self.assertEqual(cloze_mcqs(TEXT, 0, 'easy'), [])
+        self.assertEqual(cloze_mcqs('It is what it is and that is that.', 3, 'easy'), [])
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from nlp import corpus
+from nlp.embedding import EmbeddingService
+from nlp.search import MCQ_COLUMNS
+
+
+def write_version(root, version, rows=3, vectors=None):
+    path = os.path.join(root, version)
+    os.makedirs(path)
+    pd.DataFrame({name: [f'{name} {i}' for i in range(rows)] for name in MCQ_COLUMNS}).to_csv(
+        os.path.join(path, 'train.csv'), index=False,
+    )
+    np.save(os.path.join(path, 'embeddings.npy'), np.ones((rows if vectors is None else vectors, 4), dtype=np.float32))
+    return path
+
+
+class CorpusPointerTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def test_activate_moves_the_pointer(self):
+        write_version(self.root, 'v1')
+        write_version(self.root, 'v2')
+        self.assertIsNone(corpus.read_current(self.root))
+        corpus.activate(self.root, 'v1')
+        corpus.activate(self.root, 'v2')
+        self.assertEqual(corpus.read_current(self.root), 'v2')
+        self.assertEqual(corpus.list_versions(self.root), ['v1', 'v2'])
+        self.assertEqual(sorted(os.listdir(self.root)), ['CURRENT', 'v1', 'v2'])
+
+    def test_activate_refuses_incomplete_versions(self):
+        os.makedirs(os.path.join(self.root, 'v1'))
+        with self.assertRaises(ValueError):
+            corpus.activate(self.root, 'v1')
+        with self.assertRaises(ValueError):
+            corpus.activate(self.root, '../outside')
+        self.assertIsNone(corpus.read_current(self.root))
+
+    def test_build_dir_never_returns_the_active_version(self):
+        default = os.path.join(self.root, 'default')
+        self.assertEqual(corpus.build_dir(self.root, default), default)
+        write_version(self.root, 'v1')
+        corpus.activate(self.root, 'v1')
+        for kwargs in ({}, {'version': 'v1'}, {'data_dir': os.path.join(self.root, 'v1')}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                corpus.build_dir(self.root, default, **kwargs)
+        self.assertEqual(corpus.build_dir(self.root, default, version='v2'), os.path.join(self.root, 'v2'))
+        with self.assertRaises(ValueError):
+            corpus.build_dir(self.root, default, data_dir=default, version='v2')
+
+
+class ServiceActivateTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.service = EmbeddingService(data_dir=tmp.name)
+        self.root = self.service.corpus_root
+        write_version(self.root, 'good')
+        write_version(self.root, 'broken', vectors=2)
+        corpus.activate(self.root, 'good')
+
+    def test_checks_the_version_before_moving_the_pointer(self):
+        with self.assertRaises(ValueError):
+            self.service.activate('broken')
+        self.assertEqual(corpus.read_current(self.root), 'good')
+
+    def test_failed_reload_leaves_the_pointer(self):
+        self.service.state = EmbeddingService.READY
+        with mock.patch.object(self.service, 'reload', return_value=False) as reload:
+            self.service.reload_error = 'Data mismatch'
+            with self.assertRaisesRegex(ValueError, 'Data mismatch'):
+                self.service.activate('broken')
+        reload.assert_called_once_with('broken')
+        self.assertEqual(corpus.read_current(self.root), 'good')
+
+    def test_loadable_version_is_activated(self):
+        write_version(self.root, 'next')
+        self.service.activate('next')
+        self.assertEqual(corpus.read_current(self.root), 'next')
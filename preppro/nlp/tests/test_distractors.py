@@ -0,0 +1,67 @@
+import tempfile
+from django.test import SimpleTestCase
+from nlp.distractors import DistractorIndex, answer_type
+from . import fake_encode
+
+ANSWERS = [
+    'Mitochondria', 'Chloroplast', 'Ribosome', 'Nucleus', 'Vacuole', 'mitochondria', '', 'nan',
+    'Carbon dioxide', 'Carbon dioxide gas', 'Dioxide carbon', 'Oxygen gas', 'Nitrogen gas', 'Liquid water',
+    '12 km', '3 km', '5 km', '40 km', '7 kg',
+]
+
+
+class DistractorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = DistractorIndex.build(ANSWERS, fake_encode, batch_size=4)
+
+    def test_vocabulary_keeps_the_first_spelling_of_each_answer(self):
+        vocabulary = DistractorIndex.vocabulary(ANSWERS)
+        self.assertIn('Mitochondria', vocabulary)
+        self.assertNotIn('mitochondria', vocabulary)
+        self.assertNotIn('', vocabulary)
+        self.assertNotIn('nan', vocabulary)
+        self.assertEqual(len(self.index), len(vocabulary))
+
+    def test_answer_type(self):
+        self.assertEqual(answer_type('12 km'), 'number:km')
+        self.assertEqual(answer_type('1,200.5'), 'number:')
+        self.assertEqual(answer_type('Nucleus'), 'word')
+        self.assertEqual(answer_type('carbon dioxide'), 'phrase')
+        self.assertEqual(answer_type('the powerhouse of the cell'), 'sentence')
+
+    def test_distractors_are_other_answers_of_the_same_type(self):
+        options = self.index.distractors('Mitochondria', n=3)
+        self.assertEqual(len(options), 3)
+        self.assertTrue(set(options) <= {'Chloroplast', 'Ribosome', 'Nucleus', 'Vacuole'})
+        self.assertEqual(len(set(options)), 3)
+
+    def test_exclude(self):
+        options = self.index.distractors('Mitochondria', n=3, exclude=['chloroplast', 'RIBOSOME'])
+        self.assertEqual(sorted(options), ['Nucleus', 'Vacuole'])
+
+    def test_rewordings_and_containing_answers_are_not_distractors(self):
+        options = self.index.distractors('carbon dioxide', n=3)
+        self.assertEqual(len(options), 3)
+        self.assertNotIn('Carbon dioxide gas', options)
+        self.assertNotIn('Dioxide carbon', options)
+        self.assertNotIn('Carbon dioxide', options)
+
+    def test_numbers_keep_their_unit(self):
+        options = self.index.distractors('12 km', n=3)
+        self.assertEqual(sorted(options), ['3 km', '40 km', '5 km'])
+
+    def test_unknown_answers_need_an_encoder(self):
+        self.assertEqual(self.index.distractors('Golgi apparatus body'), [])
+        self.assertEqual(self.index.distractors(''), [])
+        options = self.index.distractors('Golgi', n=2, encode_fn=fake_encode)
+        self.assertEqual(len(options), 2)
+        self.assertTrue(all(answer_type(option) == 'word' for option in options))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertFalse(DistractorIndex.exists(directory))
+            self.index.save(directory)
+            loaded = DistractorIndex.load(directory)
+        self.assertEqual(loaded.answers.tolist(), self.index.answers.tolist())
+        self.assertEqual(loaded.dim, self.index.dim)
+        self.assertEqual(loaded.distractors('12 km', n=3), self.index.distractors('12 km', n=3))
@@ -0,0 +1,64 @@
+import time
+import tempfile
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+from nlp import corpus
+from nlp.embedding import EmbeddingService
+from .test_corpus import write_version
+
+
+class SlowModel:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def encode(self, texts, **kwargs):
+        time.sleep(self.delay)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class EncodeDeadlineTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.service = EmbeddingService(data_dir=tmp.name)
+        write_version(self.service.corpus_root, 'v1')
+        corpus.activate(self.service.corpus_root, 'v1')
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow_load(self):
+        self.release.wait(5)
+        return SlowModel(0)
+
+    def test_first_load_does_not_block_a_budgeted_request(self):
+        with mock.patch.object(self.service, '_load_model', side_effect=self.slow_load):
+            started = time.monotonic()
+            self.assertFalse(self.service.ensure_loaded(timeout=0.05))
+            self.assertFalse(self.service.ensure_model(timeout=0.05))
+            with self.assertRaises(FutureTimeoutError):
+                self.service.encode_batched(['text'], timeout=0.05)
+            self.assertLess(time.monotonic() - started, 1)
+
+            self.release.set()
+            self.assertTrue(self.service.ensure_loaded(timeout=5))
+        self.assertEqual(self.service.corpus_version, 'v1')
+        self.assertEqual(self.service.encode_batched(['text'], timeout=1).shape, (1, 4))
+
+    def test_failed_model_load_is_an_error_not_a_timeout(self):
+        with mock.patch.object(self.service, '_load_model', side_effect=OSError('no weights')):
+            with self.assertRaises(RuntimeError):
+                self.service.encode_batched(['text'], timeout=1)
+
+    def test_timeout_applies_with_and_without_micro_batching(self):
+        self.service._model = SlowModel(0.5)
+        for enabled in (True, False):
+            with self.subTest(microbatch=enabled), override_settings(NLP_MICROBATCH_ENABLED=enabled):
+                started = time.monotonic()
+                with self.assertRaises(FutureTimeoutError):
+                    self.service.encode_batched(['text'], timeout=0.05)
+                self.assertLess(time.monotonic() - started, 0.4)
+        with override_settings(NLP_MICROBATCH_ENABLED=False):
+            self.assertEqual(self.service.encode_batched(['text'], timeout=2).shape, (1, 4))
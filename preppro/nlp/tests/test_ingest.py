@@ -0,0 +1,118 @@
+import time
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from questions.models import Question
+from nlp import ingest
+from nlp.ingest import QuestionIngestor, ingest_mcqs, normalize_mcq
+from nlp.llm import answer_index
+from nlp.views import parse_generation_request
+from . import fake_encode
+
+NO_MATCH = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+
+def mcq(text, answer='B', **extra):
+    return {'question_text': text, 'options': ['Oxygen', 'Carbon dioxide', 'Nitrogen', 'Helium'],
+            'correct_answer': answer, **extra}
+
+
+class AnswerIndexTests(SimpleTestCase):
+    def test_letters_text_and_indexes(self):
+        options = ['Oxygen', 'Carbon dioxide', 'Nitrogen', 'Helium']
+        self.assertEqual(answer_index('B', options), 1)
+        self.assertEqual(answer_index('C) Nitrogen', options), 2)
+        self.assertEqual(answer_index(' helium ', options), 3)
+        self.assertEqual(answer_index(0, options), 0)
+        self.assertIsNone(answer_index('Argon', options))
+        self.assertIsNone(answer_index(4, options))
+
+
+class NormalizeMcqTests(SimpleTestCase):
+    def test_fields(self):
+        row = normalize_mcq(
+            {'question_text': ' Which gas do  plants absorb? ', 'options': ['Oxygen ', 'Oxygen', '', 'Carbon dioxide'],
+             'correct_answer': 'Carbon dioxide', 'support': 'Plants absorb carbon dioxide.', 'difficulty': 'hard'},
+            subject='biology',
+        )
+        self.assertEqual(row, {
+            'question': 'Which gas do plants absorb?', 'options': ['Oxygen', 'Carbon dioxide'], 'correct_answer': 1,
+            'subject': 'biology', 'topic': '', 'difficulty': 'hard', 'explanation': 'Plants absorb carbon dioxide.',
+        })
+
+    def test_unusable_questions(self):
+        self.assertIsNone(normalize_mcq(mcq('')))
+        self.assertIsNone(normalize_mcq(mcq('Which gas?', answer='Argon')))
+        self.assertIsNone(normalize_mcq({'question_text': 'Which gas?', 'options': ['Oxygen'], 'correct_answer': 0}))
+        self.assertEqual(normalize_mcq(mcq('Which gas?', difficulty='extreme'))['difficulty'], 'medium')
+
+    def test_subject_and_topic_fit_their_columns(self):
+        row = normalize_mcq(mcq('Which gas?'), subject='s' * 300, topic='t' * 300)
+        self.assertEqual(len(row['subject']), Question._meta.get_field('subject').max_length)
+        self.assertEqual(len(row['topic']), Question._meta.get_field('topic').max_length)
+
+    def test_requests_with_long_subjects_are_rejected(self):
+        params, error = parse_generation_request({'text': 'Plants absorb carbon dioxide.', 'subject': 's' * 256})
+        self.assertIsNone(params)
+        self.assertIn('at most 255 characters', error)
+        params, error = parse_generation_request({'text': 'Plants absorb carbon dioxide.', 'topic': 't' * 255})
+        self.assertIsNone(error)
+
+
+class IngestMcqsTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ingest, 'question_bank')
+        self.question_bank = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.question_bank.search.return_value = NO_MATCH
+
+    def ingest(self, *mcqs, subject='biology'):
+        return ingest_mcqs([(item, subject, 'plants', 'easy') for item in mcqs], fake_encode)
+
+    def test_inserts_usable_questions(self):
+        created = self.ingest(mcq('Which gas do plants absorb?'), mcq('Which gas do animals exhale?'), mcq(''))
+        self.assertEqual(len(created), 2)
+        question = Question.objects.get(question='Which gas do plants absorb?')
+        self.assertEqual((question.correct_answer, question.subject, question.topic), (1, 'biology', 'plants'))
+
+    def test_duplicates_within_a_call_are_skipped(self):
+        created = self.ingest(mcq('Which gas do plants absorb?'), mcq('Which gas do plants absorb ?'),
+                              mcq('Do plants absorb which gas?'), mcq('What is the boiling point of water?'))
+        self.assertEqual([q.question for q in created],
+                         ['Which gas do plants absorb?', 'What is the boiling point of water?'])
+
+    def test_existing_questions_are_skipped(self):
+        self.ingest(mcq('Which gas do plants absorb?'))
+        self.assertEqual(self.ingest(mcq('Which gas do plants absorb?')), [])
+        self.question_bank.search.return_value = (np.array([1]), np.array([0.97], dtype=np.float32))
+        self.assertEqual(self.ingest(mcq('Which gas is absorbed by plants?')), [])
+        self.assertEqual(Question.objects.count(), 1)
+
+    def test_long_subjects_are_cut(self):
+        created = self.ingest(mcq('Which gas do plants absorb?'), subject='biology ' * 40)
+        self.assertEqual(len(Question.objects.get(pk=created[0].pk).subject), 255)
+
+
+class QuestionIngestorTests(SimpleTestCase):
+    def test_submissions_are_ingested_together(self):
+        calls = []
+        ingestor = QuestionIngestor(fake_encode, flush_interval=0.05)
+        with mock.patch.object(ingest, 'ingest_mcqs', side_effect=lambda items, *args: calls.append(items) or items[:1]):
+            ingestor.submit([mcq('Which gas do plants absorb?')], 'biology', 'plants', 'easy')
+            ingestor.submit([mcq('Which gas do plants absorb?'), mcq('Which gas do animals exhale?')], 'biology')
+            for _ in range(100):
+                if ingestor.stats()['inserted']:
+                    break
+                time.sleep(0.05)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 3)
+        self.assertEqual(calls[0][0][1:], ('biology', 'plants', 'easy'))
+        stats = ingestor.stats()
+        self.assertEqual((stats['submitted'], stats['inserted'], stats['skipped']), (3, 1, 2))
+
+    def test_full_queue_drops_questions(self):
+        ingestor = QuestionIngestor(fake_encode, max_queue=2)
+        with mock.patch.object(ingestor, '_ensure_thread'):
+            ingestor.submit([mcq(f'Question {i}?') for i in range(5)])
+        self.assertEqual((ingestor.stats()['queued'], ingestor.stats()['dropped']), (2, 3))
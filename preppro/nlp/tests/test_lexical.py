@@ -0,0 +1,66 @@
+import tempfile
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.lexical import BM25Index, tokenize
+from nlp.search import CorpusIndex
+from .test_search import make_columns
+
+DOCUMENTS = [
+    'Photosynthesis converts light energy into chemical energy',
+    'Mitochondria release energy from glucose',
+    'The chloroplast is where photosynthesis happens in plants',
+    'Newton described the laws of motion',
+]
+
+
+class BM25IndexTests(SimpleTestCase):
+    def test_tokenize_drops_stopwords_and_single_letters(self):
+        self.assertEqual(tokenize('The Cell is a unit of LIFE, x-ray 2 H2O'), ['cell', 'unit', 'life', 'ray', 'h2o'])
+
+    def test_ranks_matching_documents(self):
+        index = BM25Index.build(DOCUMENTS)
+        rows, scores = index.search('Where does photosynthesis happen in plants?', 10)
+        self.assertEqual(rows.tolist()[:2], [2, 0])
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertEqual(index.search('quantum chromodynamics', 10)[0].tolist(), [])
+
+    def test_rare_terms_outweigh_common_ones(self):
+        rows, _ = BM25Index.build(DOCUMENTS).search('energy glucose', 10)
+        self.assertEqual(rows[0], 1)
+
+    def test_limit_and_max_terms(self):
+        index = BM25Index.build(DOCUMENTS)
+        self.assertEqual(len(index.search('energy', 1)[0]), 1)
+        rows, _ = index.search('energy newton motion', 10, max_terms=1)
+        self.assertEqual(rows.tolist(), [3])
+
+    def test_save_and_load(self):
+        index = BM25Index.build(DOCUMENTS)
+        with tempfile.TemporaryDirectory() as directory:
+            index.save(directory)
+            loaded = BM25Index.load(directory)
+        self.assertEqual(len(loaded), 4)
+        for query in ('photosynthesis', 'laws of motion'):
+            np.testing.assert_array_equal(loaded.search(query, 5)[0], index.search(query, 5)[0])
+
+
+class LexicalPrefilterTests(SimpleTestCase):
+    def setUp(self):
+        self.embeddings = np.random.default_rng(0).normal(size=(4, 8)).astype(np.float32)
+
+    def index(self, min_candidates):
+        return CorpusIndex(self.embeddings, make_columns(4), lexical=BM25Index.build(DOCUMENTS),
+                           lexical_min_candidates=min_candidates)
+
+    def test_only_lexical_matches_are_scored(self):
+        rows, _ = self.index(1).top_k(self.embeddings[3], 4, query_text='photosynthesis')
+        self.assertEqual(sorted(rows.tolist()), [0, 2])
+
+    def test_too_few_matches_fall_back_to_dense_search(self):
+        index = self.index(3)
+        rows, _ = index.top_k(self.embeddings[3], 4, query_text='photosynthesis')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], 3)
+
+    def test_exact_search_ignores_the_prefilter(self):
+        self.assertEqual(len(self.index(1).top_k(self.embeddings[3], 4, query_text='photosynthesis', exact=True)[0]), 4)
@@ -0,0 +1,99 @@
+from unittest import mock
+import requests
+from django.test import SimpleTestCase, override_settings
+from nlp.cache import LRUCache, TieredCache
+from nlp.llm import LLMError, LLMGateway, iter_mcqs, parse_mcqs
+from nlp.resilience import CircuitBreaker
+from . import LOCMEM_CACHES
+
+
+def reply(status_code=200, result='Q1. ...'):
+    response = mock.Mock(status_code=status_code, text=str(result))
+    response.json.return_value = {'result': result}
+    return response
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LLMGatewayTests(SimpleTestCase):
+    def gateway(self, **kwargs):
+        cache = TieredCache('nlp', LRUCache(), 60)
+        cache.shared.clear()
+        kwargs.setdefault('max_retries', 0)
+        return LLMGateway('http://llm.test/claude3', 'key', backoff=0, cache=cache,
+                          breaker=CircuitBreaker('llm-test', failure_threshold=1, reset_timeout=0), **kwargs)
+
+    def test_retries_transient_failures(self):
+        gateway = self.gateway(max_retries=2)
+        with mock.patch.object(gateway.session, 'post', side_effect=[reply(503, ''), requests.ConnectionError('reset'), reply()]) as post:
+            self.assertEqual(gateway.complete('prompt'), 'Q1. ...')
+        self.assertEqual((post.call_count, gateway.retries), (3, 2))
+
+    def test_client_errors_are_not_retried(self):
+        gateway = self.gateway(max_retries=2)
+        with mock.patch.object(gateway.session, 'post', return_value=reply(401, 'bad key')) as post:
+            with self.assertRaises(LLMError):
+                gateway.complete('prompt')
+        self.assertEqual(post.call_count, 1)
+
+    def test_responses_are_cached_by_prompt(self):
+        gateway = self.gateway()
+        with mock.patch.object(gateway.session, 'post', return_value=reply()) as post:
+            gateway.complete('prompt')
+            gateway.complete('prompt')
+            gateway.complete('other prompt')
+        self.assertEqual((post.call_count, gateway.cache_hits), (2, 1))
+
+    def test_request_exceptions_become_llm_errors(self):
+        gateway = self.gateway()
+        for error in (requests.TooManyRedirects('loop'), requests.exceptions.ContentDecodingError('gzip')):
+            with mock.patch.object(gateway.session, 'post', side_effect=error):
+                with self.assertRaises(LLMError):
+                    gateway._post('prompt')
+
+    def test_non_object_json_is_an_llm_error(self):
+        gateway = self.gateway()
+        response = mock.Mock(status_code=200, text='[]')
+        response.json.return_value = []
+        with mock.patch.object(gateway.session, 'post', return_value=response):
+            with self.assertRaises(LLMError):
+                gateway._post('prompt')
+
+
+class IterMcqsTests(SimpleTestCase):
+    def test_parses_questions_and_resolves_answer_letters(self):
+        reply = (
+            "Q1. What do plants absorb?\n"
+            "A. Oxygen\nB. Carbon dioxide\nC. Nitrogen\nD. Helium\n"
+            "Answer: B\n\n"
+            "Q2. Where does photosynthesis happen?\n"
+            "A) Mitochondria\nB) Nucleus\nC) Chloroplast\nD) Ribosome\n"
+            "Answer: C. Chloroplast\n"
+        )
+        mcqs = parse_mcqs(reply)
+        self.assertEqual([mcq['correct_answer'] for mcq in mcqs], ['Carbon dioxide', 'Chloroplast'])
+        self.assertEqual(mcqs[0]['options'], ['Oxygen', 'Carbon dioxide', 'Nitrogen', 'Helium'])
+
+    def test_markdown_and_wrapped_question_text(self):
+        reply = (
+            "**Question 1:** Which gas is released\n"
+            "during photosynthesis?\n"
+            "A. **Oxygen**\nB. Carbon dioxide\nC. Methane\nD. Argon\n"
+            "**Answer:** A\n"
+        )
+        [mcq] = parse_mcqs(reply)
+        self.assertEqual(mcq['question_text'], 'Which gas is released during photosynthesis?')
+        self.assertEqual(mcq['correct_answer'], 'Oxygen')
+
+    def test_drops_questions_without_four_options(self):
+        reply = "Q1. Short?\nA. Yes\nB. No\nAnswer: A\nQ2. Full?\nA. a\nB. b\nC. c\nD. d\nAnswer: D\n"
+        self.assertEqual([mcq['question_text'] for mcq in parse_mcqs(reply)], ['Full?'])
+
+    def test_yields_each_question_as_soon_as_it_completes(self):
+        lines = iter("Q1. First?\nA. a\nB. b\nC. c\nD. d\nAnswer: A\nQ2. Second?\n".splitlines())
+        mcqs = iter_mcqs(lines)
+        self.assertEqual(next(mcqs)['question_text'], 'First?')
+        self.assertEqual(next(lines), 'Q2. Second?')
+
+    def test_question_without_answer_line(self):
+        [mcq] = parse_mcqs("Q1. No answer?\nA. a\nB. b\nC. c\nD. d\n")
+        self.assertEqual(mcq['correct_answer'], '')
@@ -0,0 +1,24 @@
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.rerank import mmr_order
+
+
+class MMROrderTests(SimpleTestCase):
+    def test_near_duplicates_sink(self):
+        vectors = np.array([[1, 0, 0], [0.99, 0.1, 0], [0, 1, 0], [0, 0, 1]], dtype=np.float32)
+        order = mmr_order(np.array([0.95, 0.94, 0.80, 0.70]), vectors, relevance_weight=0.7)
+        self.assertEqual(order.tolist(), [0, 2, 3, 1])
+
+    def test_relevance_only_keeps_the_relevance_order(self):
+        vectors = np.random.default_rng(0).normal(size=(6, 4))
+        relevance = np.array([0.2, 0.9, 0.5, 0.7, 0.1, 0.3])
+        self.assertEqual(mmr_order(relevance, vectors, relevance_weight=1.0).tolist(), np.argsort(-relevance).tolist())
+
+    def test_is_a_permutation(self):
+        vectors = np.random.default_rng(1).normal(size=(20, 8))
+        order = mmr_order(np.random.default_rng(2).random(20), vectors)
+        self.assertEqual(sorted(order.tolist()), list(range(20)))
+
+    def test_tiny_inputs(self):
+        self.assertEqual(mmr_order(np.array([]), np.empty((0, 3))).tolist(), [])
+        self.assertEqual(mmr_order(np.array([0.5]), np.ones((1, 3))).tolist(), [0])
@@ -0,0 +1,78 @@
+import time
+from unittest import mock
+from django.test import SimpleTestCase
+from nlp.llm import LLMGateway, LLMUnavailable
+from nlp.resilience import CircuitBreaker
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def open_breaker(self, reset_timeout=30.0):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=reset_timeout)
+        breaker.record_failure()
+        breaker.record_failure()
+        return breaker
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.rejected, 1)
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = self.open_breaker(reset_timeout=0)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_probe_success_closes(self):
+        breaker = self.open_breaker(reset_timeout=0)
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_probe_failure_reopens(self):
+        breaker = self.open_breaker(reset_timeout=0.05)
+        time.sleep(0.06)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.trips, 2)
+
+
+class GatewayBreakerTests(SimpleTestCase):
+    def gateway(self):
+        return LLMGateway('http://llm.test/claude3', 'key', max_retries=0,
+                          breaker=CircuitBreaker('llm-test', failure_threshold=1, reset_timeout=0))
+
+    def test_open_circuit_fails_fast(self):
+        gateway = self.gateway()
+        gateway.breaker.reset_timeout = 30
+        gateway.breaker.record_failure()
+        with mock.patch.object(gateway, '_post') as post:
+            with self.assertRaises(LLMUnavailable):
+                gateway.complete('prompt')
+        post.assert_not_called()
+
+    def test_unexpected_probe_error_does_not_wedge_the_breaker(self):
+        gateway = self.gateway()
+        gateway.breaker.record_failure()
+        with mock.patch.object(gateway, '_post', side_effect=AttributeError('not a dict')):
+            with self.assertRaises(AttributeError):
+                gateway.complete('prompt')
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.OPEN)
+        with mock.patch.object(gateway, '_post', return_value='Q1. ...'):
+            self.assertEqual(gateway.complete('prompt'), 'Q1. ...')
+        self.assertEqual(gateway.breaker.state, CircuitBreaker.CLOSED)
@@ -0,0 +1,107 @@
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.search import CorpusIndex, build_facets, select_top_k
+from nlp.store import normalize_rows
+
+
+def make_columns(rows, **extra):
+    columns = {
+        'question': np.array([f'q{i}' for i in range(rows)], dtype=object),
+        'correct_answer': np.array([f'a{i}' for i in range(rows)], dtype=object),
+    }
+    columns.update({name: np.array(values, dtype=object) for name, values in extra.items()})
+    return columns
+
+
+class SelectTopKTests(SimpleTestCase):
+    def test_best_first(self):
+        rows, scores = select_top_k(np.arange(5), np.array([0.1, 0.9, 0.3, 0.7, 0.5]), 3)
+        self.assertEqual(rows.tolist(), [1, 3, 4])
+        self.assertEqual(scores.tolist(), [0.9, 0.7, 0.5])
+
+    def test_threshold_and_short_results(self):
+        rows, _ = select_top_k(np.array([10, 11, 12]), np.array([0.2, 0.8, 0.6]), 5, threshold=0.5)
+        self.assertEqual(rows.tolist(), [11, 12])
+
+    def test_zero_k(self):
+        rows, scores = select_top_k(np.arange(3), np.ones(3), 0)
+        self.assertEqual((len(rows), len(scores)), (0, 0))
+
+
+class CorpusIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+        self.queries = rng.normal(size=(5, 16)).astype(np.float32)
+        self.index = CorpusIndex(self.embeddings, make_columns(200))
+
+    def brute_force(self, query, k):
+        scores = normalize_rows(self.embeddings) @ normalize_rows(query).ravel()
+        return np.argsort(scores)[::-1][:k]
+
+    def test_top_k_matches_a_full_sort(self):
+        for query in self.queries:
+            rows, scores = self.index.top_k(query, 10)
+            self.assertEqual(rows.tolist(), self.brute_force(query, 10).tolist())
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_scores_are_cosine_similarities(self):
+        rows, scores = self.index.top_k(self.queries[0] * 100, 1)
+        expected = normalize_rows(self.embeddings[rows]) @ normalize_rows(self.queries[0]).ravel()
+        np.testing.assert_allclose(scores, expected, rtol=1e-5)
+
+    def test_top_k_many_matches_top_k(self):
+        for query, (rows, _) in zip(self.queries, self.index.top_k_many(self.queries, [3] * len(self.queries))):
+            self.assertEqual(rows.tolist(), self.index.top_k(query, 3)[0].tolist())
+
+    def test_passages_score_each_row_by_its_best_passage(self):
+        passages = self.queries[:3]
+        rows, scores = self.index.top_k_passages(passages, 10)
+        expected = (normalize_rows(self.embeddings) @ normalize_rows(passages).T).max(axis=1)
+        self.assertEqual(rows.tolist(), np.argsort(expected)[::-1][:10].tolist())
+        np.testing.assert_allclose(scores, expected[rows], rtol=1e-5)
+
+    def test_one_passage_is_a_plain_query(self):
+        self.assertEqual(
+            self.index.top_k_passages(self.queries[:1], 5)[0].tolist(), self.index.top_k(self.queries[0], 5)[0].tolist(),
+        )
+
+    def test_column_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            CorpusIndex(self.embeddings, make_columns(199))
+
+
+class FacetFilterTests(SimpleTestCase):
+    def setUp(self):
+        self.columns = make_columns(
+            6,
+            subject=['Biology', 'biology ', 'Physics', '', 'physics', 'Biology'],
+            difficulty=['easy', 'hard', 'easy', 'hard', '', 'easy'],
+        )
+        self.embeddings = np.random.default_rng(0).normal(size=(6, 8)).astype(np.float32)
+        self.index = CorpusIndex(self.embeddings, self.columns)
+
+    def test_unlabeled_rows_match_every_value(self):
+        facets = build_facets(self.columns)
+        self.assertEqual(facets['subject']['biology'].tolist(), [0, 1, 3, 5])
+        self.assertEqual(facets['subject']['physics'].tolist(), [2, 3, 4])
+        self.assertEqual(facets['subject'][''].tolist(), [3])
+        self.assertNotIn('topic', facets)
+
+    def test_filters_intersect(self):
+        self.assertEqual(self.index.filter_rows({'subject': 'BIOLOGY', 'difficulty': 'easy'}).tolist(), [0, 5])
+        self.assertEqual(self.index.filter_rows({'subject': 'physics', 'difficulty': 'hard'}).tolist(), [3, 4])
+        self.assertEqual(self.index.filter_rows({'subject': 'chemistry'}).tolist(), [3])
+
+    def test_missing_columns_and_empty_values_are_ignored(self):
+        self.assertIsNone(self.index.filter_rows({'subject': '', 'topic': 'cells'}))
+        self.assertIsNone(self.index.filter_rows(None))
+
+    def test_filtered_search_only_returns_matching_rows(self):
+        rows = self.index.filter_rows({'subject': 'physics'})
+        for query in self.embeddings:
+            found, _ = self.index.top_k(query, 6, rows=rows)
+            self.assertTrue(set(found.tolist()) <= {2, 3, 4})
+        results = self.index.top_k_many(self.embeddings[:2], [6, 6], row_filters=[rows, None])
+        self.assertEqual(sorted(results[0][0].tolist()), [2, 3, 4])
+        self.assertEqual(len(results[1][0]), 6)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import numpy as np
+from django.test import SimpleTestCase
+from nlp.store import EmbeddingStore, normalize_rows, quantization_recall
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.embeddings = np.random.default_rng(0).normal(size=(300, 32)).astype(np.float32)
+        self.query = normalize_rows(self.embeddings[7] + 0.01).ravel()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+
+    def test_quantized_formats_round_trip(self):
+        exact = normalize_rows(self.embeddings)
+        for fmt, tolerance in (('float32', 1e-6), ('float16', 1e-3), ('int8', 1e-2)):
+            with self.subTest(fmt=fmt):
+                store = EmbeddingStore.from_array(self.embeddings, fmt)
+                store.save(self.directory)
+                loaded = EmbeddingStore.open(self.directory)
+                self.assertEqual((loaded.format, loaded.shape), (fmt, (300, 32)))
+                self.assertIsInstance(loaded.vectors, np.memmap)
+                np.testing.assert_allclose(loaded.take(np.arange(300)), exact, atol=tolerance)
+                np.testing.assert_allclose(loaded.scores(self.query), exact @ self.query, atol=tolerance * 4)
+                np.testing.assert_allclose(
+                    loaded.scores_many(self.query[None, :])[:, 0], loaded.scores(self.query), rtol=1e-5,
+                )
+
+    def test_quantization_keeps_recall(self):
+        self.assertGreater(quantization_recall(self.embeddings, 'int8', self.embeddings[:20]), 0.9)
+
+    def test_saving_over_a_mapped_store_leaves_the_mapping_intact(self):
+        EmbeddingStore.from_array(self.embeddings).save(self.directory)
+        mapped = EmbeddingStore.open(self.directory)
+        before = np.array(mapped.vectors[:5])
+
+        EmbeddingStore.from_array(self.embeddings[::-1]).save(self.directory)
+
+        np.testing.assert_array_equal(mapped.vectors[:5], before)
+        reopened = EmbeddingStore.open(self.directory)
+        np.testing.assert_allclose(reopened.vectors[0], normalize_rows(self.embeddings[-1]).ravel(), rtol=1e-6)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['store.json', 'vectors.npy'])
+
+    def test_shape_mismatch_is_rejected(self):
+        EmbeddingStore.from_array(self.embeddings).save(self.directory)
+        np.save(os.path.join(self.directory, 'vectors.npy'), self.embeddings[:10])
+        with self.assertRaises(ValueError):
+            EmbeddingStore.open(self.directory)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            EmbeddingStore.from_array(self.embeddings, 'int4')
@@ -0,0 +1,89 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from nlp.summarize import summarize, textrank
+from tests import views as practice_views
+from tests.models import PracticeSession
+from . import fake_encode
+
+PLANT_TEXT = ' '.join([
+    'Plants make their food from light in the leaves.',
+    'Light energy is captured by chlorophyll in the leaves.',
+    'Chlorophyll in the leaves absorbs red and blue light.',
+    'The Calvin cycle fixes carbon dioxide into sugar.',
+    'Sugar made in the leaves is carried to the roots.',
+    'Roots take up water and minerals from the soil.',
+    'Oxygen is released from the leaves as a by-product.',
+    'Stomata open and close to control the gas exchange.',
+    'Guard cells change shape to open each of the stomata.',
+])
+
+
+class TextRankTests(SimpleTestCase):
+    def test_central_sentences_score_highest(self):
+        vectors = fake_encode(['light leaves', 'light leaves sugar', 'light leaves water', 'granite rock'])
+        scores = textrank(vectors)
+        self.assertAlmostEqual(float(scores.sum()), 1.0, places=4)
+        self.assertEqual(int(scores.argmin()), 3)
+
+    def test_empty(self):
+        self.assertEqual(len(textrank(fake_encode([]))), 0)
+
+
+class SummarizeTests(SimpleTestCase):
+    def test_keeps_about_a_third_of_the_sentences_in_order(self):
+        points = summarize(PLANT_TEXT, fake_encode)
+        self.assertEqual(len(points), 3)
+        positions = [PLANT_TEXT.index(point) for point in points]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_max_points(self):
+        self.assertEqual(len(summarize(PLANT_TEXT, fake_encode, max_points=2)), 2)
+        self.assertEqual(len(summarize(' '.join([PLANT_TEXT] * 5), fake_encode, max_points=7)), 7)
+
+    def test_near_duplicates_are_not_both_picked(self):
+        text = PLANT_TEXT + ' Plants make their food from light in their leaves.'
+        points = summarize(text, fake_encode, diversity=0.7)
+        self.assertFalse({'Plants make their food from light in the leaves.',
+                          'Plants make their food from light in their leaves.'} <= set(points))
+
+    def test_text_that_cannot_be_shortened_is_not_summarized(self):
+        encode = mock.Mock(side_effect=fake_encode)
+        self.assertEqual(summarize('Plants make food from light. Roots take up water from soil.', encode), [])
+        self.assertEqual(summarize('Photosynthesis. Figure 2. Table 1.', encode), [])
+        encode.assert_not_called()
+
+
+class PracticeSessionSummaryTests(TestCase):
+    def setUp(self):
+        self.student = get_user_model().objects.create_user('student', 'student@example.com', 'password')
+        for target, kwargs in (
+            ('generate_mcqs', {'return_value': [{'question_text': 'local?'}]}),
+            ('keep_generated', {}),
+            ('embedding_service', {}),
+        ):
+            patcher = mock.patch.object(practice_views, target, **kwargs)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.embedding_service.encode_batched.side_effect = fake_encode
+        patcher = mock.patch.object(practice_views.llm_gateway, 'complete', return_value='Point one\nPoint two')
+        self.complete = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def process(self, text):
+        session = PracticeSession.objects.create(student=self.student, input_text=text)
+        practice_views.PracticeSessionView().process_practice_session(session.id)
+        session.refresh_from_db()
+        return session
+
+    def test_long_text_is_summarized_locally(self):
+        session = self.process(PLANT_TEXT)
+        self.assertEqual(session.status, 'completed')
+        self.assertEqual(len(session.summary_points), 3)
+        self.complete.assert_not_called()
+
+    def test_short_text_falls_back_to_the_llm(self):
+        session = self.process('Plants make food from light. Roots take up water from soil.')
+        self.assertEqual(session.status, 'completed')
+        self.assertEqual(session.summary_points, ['Point one', 'Point two'])
+        self.assertEqual(self.complete.call_count, 2)
@@ -0,0 +1,161 @@
+import json
+import time
+import threading
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from nlp import views
+from nlp.resilience import Deadline
+from . import LOCMEM_CACHES
+
+
+def make_mcqs(prefix, count):
+    return [
+        {'question_text': f'{prefix} question {i}?', 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 'a',
+         'support': '', 'relevance_score': 0.9, 'difficulty': 'medium'}
+        for i in range(count)
+    ]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GenerationViewTestCase(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user('teacher', 'teacher@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        views.result_cache.local.clear()
+        views.result_cache.shared.clear()
+        for target, kwargs in (
+            ('local_cloze_mcqs', {'return_value': []}),
+            ('keep_generated', {}),
+            ('openai_generate_questions', {'side_effect': lambda text, count, *args: make_mcqs('llm', count)}),
+        ):
+            patcher = mock.patch.object(views, target, **kwargs)
+            setattr(self, target, patcher.start())
+            self.addCleanup(patcher.stop)
+
+
+class BatchGenerationTests(GenerationViewTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(
+            views, 'get_semantically_similar_mcqs_batch',
+            side_effect=lambda texts, counts, *args: [make_mcqs(text, min(count, 2)) for text, count in zip(texts, counts)],
+        )
+        self.search = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, items):
+        return self.client.post(reverse('generate_questions_batch'), {'items': items}, format='json')
+
+    def test_results_follow_the_items_with_per_item_errors(self):
+        response = self.post([
+            {'text': 'Cells', 'num_questions': 2},
+            {'text': 42},
+            'not an object',
+            {'text': 'Atoms', 'num_questions': 3, 'difficulty': 'hard', 'subject': 'chemistry'},
+            {'text': 'Ions', 'subject': ['chemistry']},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result.get('error') for result in results], [
+            None, 'Text must be a string', 'Item must be an object', None, 'Subject and topic must be strings',
+        ])
+        self.assertEqual(results[0]['total'], 2)
+        self.assertEqual(results[3]['total'], 3)
+        self.assertEqual(results[3]['subject'], 'chemistry')
+        self.assertFalse(results[3]['partial'])
+
+    def test_searches_once_and_calls_the_llm_only_for_short_items(self):
+        self.post([{'text': 'Cells', 'num_questions': 2}, {'text': 'Atoms', 'num_questions': 5}])
+        self.search.assert_called_once()
+        self.assertEqual(self.search.call_args.args[:2], (['Cells', 'Atoms'], [2, 5]))
+        self.openai_generate_questions.assert_called_once()
+        self.assertEqual(self.openai_generate_questions.call_args.args[:2], ('Atoms', 3))
+
+    def test_complete_items_are_served_from_the_cache(self):
+        items = [{'text': 'Cells', 'num_questions': 2}]
+        first = self.post(items).json()
+        second = self.post(items + [{'text': 'Atoms', 'num_questions': 1}]).json()
+        self.assertEqual(second['results'][0], first['results'][0])
+        self.assertEqual(self.search.call_args.args[0], ['Atoms'])
+
+    @override_settings(NLP_BATCH_MAX_ITEMS=2)
+    def test_rejects_bad_batches(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'text': 'x'}] * 3).status_code, 400)
+        self.search.assert_not_called()
+
+
+class StreamingGenerationTests(GenerationViewTestCase):
+    def setUp(self):
+        super().setUp()
+        for target, kwargs in (
+            ('get_semantically_similar_mcqs', {'return_value': make_mcqs('semantic', 1)}),
+            ('iter_openai_questions', {'side_effect': lambda text, count, *args: iter(make_mcqs('llm', count))}),
+        ):
+            patcher = mock.patch.object(views, target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, stream_format, text='Cells'):
+        response = self.client.post(
+            reverse('generate_questions'), {'text': text, 'num_questions': 3, 'stream': stream_format}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_events_then_a_summary(self):
+        response, body = self.stream('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        events = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([event['event'] for event in events], ['question'] * 3 + ['summary'])
+        self.assertEqual([event['data']['source'] for event in events[:3]], ['semantic', 'llm', 'llm'])
+        self.assertEqual(events[-1]['data']['total'], 3)
+        self.assertFalse(events[-1]['data']['partial'])
+
+    def test_sse_and_replay_from_the_cache(self):
+        self.stream('sse')
+        response, body = self.stream('sse')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(body.count('event: question\n'), 3)
+        summary = json.loads(body.split('event: summary\ndata: ')[1])
+        self.assertEqual(summary['sources']['cache'], 3)
+
+    def test_rejects_unknown_formats(self):
+        response = self.client.post(reverse('generate_questions'), {'text': 'Cells', 'stream': 'xml'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StreamCoalescingTests(SimpleTestCase):
+    def setUp(self):
+        views.result_cache.local.clear()
+        views.result_cache.shared.clear()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow_search(self, *args):
+        self.release.wait(5)
+        return make_mcqs('semantic', 2)
+
+    def test_identical_streams_share_one_computation(self):
+        with mock.patch.object(views, 'get_semantically_similar_mcqs', side_effect=self.slow_search) as search:
+            leader = views.iter_generated_mcqs('Cells', 2, 'medium', Deadline(5))
+            results = []
+            thread = threading.Thread(target=lambda: results.append(next(leader)))
+            thread.start()
+            follower = threading.Thread(target=lambda: results.extend(
+                views.iter_generated_mcqs('Cells', 2, 'medium', Deadline(5))
+            ))
+            time.sleep(0.1)
+            follower.start()
+            time.sleep(0.05)
+            self.release.set()
+            thread.join(5)
+            results.extend(leader)
+            follower.join(5)
+        search.assert_called_once()
+        self.assertEqual(sorted(source for source, _ in results), ['coalesced'] * 2 + ['semantic'] * 2)
@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('generate-questions/', views.generate_questions, name='generate_questions'),
+    path('generate-questions/batch/', views.generate_questions_batch, name='generate_questions_batch'),
+    path('nlp/similar-questions/', views.similar_questions, name='similar_questions'),
+    path('nlp/status/', views.nlp_status, name='nlp_status'),
+    path('nlp/corpus/', views.corpus_versions, name='corpus_versions'),
 ]
\ No newline at end of file
@@ -1,217 +1,671 @@
-import os
 import json
-import hashlib
+import contextlib
 import numpy as np
-import pandas as pd
-import requests
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import logging
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from sentence_transformers import SentenceTransformer, util
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from questions.models import Question
+from questions.serializers import QuestionSerializer
+from . import corpus
+from .admission import BatchGenerationThrottle, GenerationThrottle, Overloaded, work_gate
+from .bank import question_bank
+from .chunking import split_passages
+from .cloze import cloze_mcqs
+from .cache import LRUCache, SingleFlight, TieredCache, mcq_cache_key
+from .embedding import embedding_service
+from .ingest import SUBJECT_MAX_LENGTH, TOPIC_MAX_LENGTH, question_ingestor
+from .llm import LLMError, LLMUnavailable, iter_mcqs, llm_gateway
+from .rerank import mmr_order
+from .resilience import Deadline
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
-EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
-RAPIDAPI_KEY = 'de400cff03mshd636b6f46cca699p15cec1jsn675599bc1f0c'  # Replace with your key
-
-# Initialize model and load data
-try:
-    logger.info("Loading sentence transformer model...")
-    embedder = SentenceTransformer(EMBEDDING_MODEL)
-    
-    # Get absolute paths
-    CSV_PATH = os.path.join(settings.BASE_DIR, 'nlp', 'data', 'train.csv')
-    EMBEDDING_FILE = os.path.join(settings.BASE_DIR, 'nlp', 'data', 'embeddings.npy')
-    
-    logger.info(f"Loading CSV from: {CSV_PATH}")
-    logger.info(f"Loading embeddings from: {EMBEDDING_FILE}")
-    
-    # Check if files exist
-    if not os.path.exists(CSV_PATH):
-        raise FileNotFoundError(f"CSV file not found at {CSV_PATH}")
-    if not os.path.exists(EMBEDDING_FILE):
-        raise FileNotFoundError(f"Embeddings file not found at {EMBEDDING_FILE}")
-    
-    # Load data
-    MCQ_DF = pd.read_csv(CSV_PATH)
-    embeddings = np.load(EMBEDDING_FILE)
-    
-    # Verify data shapes
-    if len(MCQ_DF) != len(embeddings):
-        raise ValueError(f"Data mismatch: CSV has {len(MCQ_DF)} rows but embeddings has {len(embeddings)} vectors")
-    
-    MCQ_DF['embedding'] = [vec for vec in embeddings]
-    logger.info(f"Successfully loaded {len(MCQ_DF)} questions and embeddings")
-    
-except Exception as e:
-    logger.error(f"Error loading model or data: {str(e)}")
-    embedder = None
-    MCQ_DF = None
-
-# Cache for storing generated questions
-cache = {}
-
-def openai_generate_questions(text, num_questions, difficulty):
+SIMILARITY_THRESHOLD = 0.75
+SIMILAR_QUESTIONS_THRESHOLD = 0.5  # Looser, for showing teachers related questions while they write one
+STREAM_CONTENT_TYPES = {'sse': 'text/event-stream', 'ndjson': 'application/x-ndjson'}
+
+# Cache for storing generated questions: per-process LRU backed by the shared 'nlp' cache
+result_cache = TieredCache(
+    'nlp',
+    LRUCache(settings.NLP_RESULT_CACHE_MAX_ENTRIES, settings.NLP_RESULT_CACHE_MAX_BYTES, settings.NLP_RESULT_CACHE_TTL),
+    settings.NLP_RESULT_CACHE_TTL,
+)
+inflight = SingleFlight(result_cache, lock_ttl=settings.NLP_REQUEST_BUDGET + 5)
+# How often local sources (semantic search, cloze) come up short and the LLM fallback is needed
+generation_stats = Counter()
+
+def openai_generate_questions(text, num_questions, difficulty, deadline=None):
     """Fallback using Claude 3 via RapidAPI if semantic similarity doesn't yield enough questions."""
+    return list(iter_openai_questions(text, num_questions, difficulty, deadline))
+
+def iter_openai_questions(text, num_questions, difficulty, deadline=None):
+    """Claude 3 fallback questions, yielded one at a time as they are parsed from the reply."""
     logger.info(f"Generating {num_questions} questions using Claude 3 API")
-    url = "https://open-ai21.p.rapidapi.com/claude3"
     prompt = f"Generate {num_questions} {difficulty} difficulty multiple-choice questions (MCQs) with 4 options each and the correct answer marked clearly from the following text:\n\n{text}\n\nFormat:\nQ1. ...\nA. ...\nB. ...\nC. ...\nD. ...\nAnswer: ..."
 
-    payload = {
-        "messages": [
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "web_access": False
-    }
+    try:
+        result = llm_gateway.complete(prompt, deadline)
+    except LLMUnavailable as e:
+        logger.warning(f"Skipping Claude 3 fallback: {str(e)}")
+        return
+    except LLMError as e:
+        logger.error(f"Error in OpenAI generation: {str(e)}")
+        return
 
-    headers = {
-        "x-rapidapi-key": RAPIDAPI_KEY,
-        "x-rapidapi-host": "open-ai21.p.rapidapi.com",
-        "Content-Type": "application/json"
-    }
+    count = 0
+    for mcq in iter_mcqs(result.splitlines()):
+        yield {
+            **mcq,
+            "support": result,
+            "relevance_score": 0.0,
+            "difficulty": difficulty
+        }
+        count += 1
+        if count >= num_questions:
+            break
+    logger.info(f"Successfully generated {count} questions from Claude 3")
+
+def candidate_pool(num_questions):
+    """Candidates to retrieve; MMR needs a larger pool than the number of slots."""
+    if settings.NLP_MMR_DIVERSITY > 0:
+        return num_questions * settings.NLP_MMR_POOL_FACTOR
+    return num_questions
+
+def rank_candidates(index, top_indices, top_scores):
+    """Re-rank candidates with MMR so near-duplicate questions don't take several slots."""
+    if settings.NLP_MMR_DIVERSITY <= 0 or len(top_indices) <= 1:
+        return top_indices, top_scores
+    order = mmr_order(top_scores, index.store.take(top_indices), 1 - settings.NLP_MMR_DIVERSITY)
+    return top_indices[order], top_scores[order]
+
+def record_local_result(found, wanted):
+    generation_stats['searches'] += 1
+    if found < wanted:
+        generation_stats['llm_fallbacks'] += 1
+
+def fill_options(index, answer, options):
+    """Distinct non-empty ``options``, topped up to four with local distractors when the source has fewer."""
+    options = list(dict.fromkeys(option for option in options if option))
+    if len(options) < 4 and index is not None and index.distractors is not None:
+        try:
+            options += index.distractors.distractors(answer, 4 - len(options), exclude=options,
+                                                     encode_fn=embedding_service.encode_cached)
+        except Exception as e:
+            logger.warning(f"Could not generate distractors for {answer!r}: {str(e)}")
+    return options
+
+def build_mcq_results(index, top_indices, top_scores, num_questions, difficulty):
+    results = []
+    used = set()
+
+    for idx, score in zip(top_indices, top_scores):
+        row = index.row(idx)
+        if row['question'] in used:
+            continue
+        options = fill_options(
+            index, row['correct_answer'], [row['correct_answer'], row['distractor1'], row['distractor2'], row['distractor3']],
+        )
+        np.random.shuffle(options)
+        results.append({
+            "question_text": row['question'],
+            "options": options,
+            "correct_answer": row['correct_answer'],
+            "support": row['support'],
+            "relevance_score": round(float(score), 3),
+            "difficulty": row.get('difficulty') or difficulty
+        })
+        used.add(row['question'])
+        if len(results) >= num_questions:
+            break
+
+    return results
 
+def bank_mcqs(passage_vecs, num_questions, difficulty, subject='', topic=''):
+    """Questions from the question bank matching the input, best first."""
+    if not settings.NLP_QUESTION_BANK:
+        return []
+    ids, scores = question_bank.search(
+        passage_vecs, num_questions, settings.NLP_BANK_THRESHOLD, search_filters(difficulty, subject, topic),
+    )
+    questions = Question.objects.filter(deleted_at__isnull=True).in_bulk(ids.tolist())
+    results = []
+    for pk, score in zip(ids.tolist(), scores):
+        question = questions.get(pk)
+        if question is None:
+            continue
+        options = list(question.options)
+        answer = options[question.correct_answer] if 0 <= question.correct_answer < len(options) else None
+        results.append({
+            "question_text": question.question,
+            "options": fill_options(embedding_service.index, answer, options) if answer else options,
+            "correct_answer": answer,
+            "support": question.explanation or '',
+            "relevance_score": round(float(score), 3),
+            "difficulty": question.difficulty or difficulty,
+            "question_id": pk,
+        })
+    return results
+
+def bank_first(bank, found, num_questions):
+    """Bank questions, then corpus matches that don't repeat them."""
+    seen = {mcq['question_text'] for mcq in bank}
+    return (bank + [mcq for mcq in found if mcq['question_text'] not in seen])[:num_questions]
+
+def local_cloze_mcqs(text, num_questions, difficulty):
+    """Fill-in-the-blank questions from the input itself, tried before the LLM."""
+    if not settings.NLP_CLOZE_ENABLED or num_questions <= 0:
+        return []
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        if response.status_code == 200:
-            result = response.json()
-            text = result.get("result", "").strip()
-            
-            questions = text.split('Q')[1:]  # Split by question
-            mcq_list = []
-
-            for q in questions:
-                lines = q.strip().split('\n')
-                question_text = lines[0].strip()
-                options = [line[2:].strip() for line in lines[1:5] if line.startswith(tuple("ABCD"))]
-                answer_line = next((line for line in lines if line.lower().startswith("answer:")), "")
-                correct_answer = answer_line.split(":", 1)[-1].strip()
-                
-                if len(options) == 4 and question_text:
-                    mcq_list.append({
-                        "question_text": question_text,
-                        "options": options,
-                        "correct_answer": correct_answer,
-                        "support": text,
-                        "relevance_score": 0.0,
-                        "difficulty": difficulty
-                    })
-
-            logger.info(f"Successfully generated {len(mcq_list)} questions from Claude 3")
-            return mcq_list[:num_questions]
+        index = embedding_service.index if embedding_service.is_ready else None
+        mcqs = cloze_mcqs(text, num_questions, difficulty, lambda answer: fill_options(index, answer, [answer]))
+        generation_stats['cloze_questions'] += len(mcqs)
+        logger.info(f"Built {len(mcqs)} cloze questions from the input")
+        return mcqs
     except Exception as e:
-        logger.error(f"Error in OpenAI generation: {str(e)}")
-    
-    return []
+        logger.error(f"Error in cloze generation: {str(e)}")
+        return []
+
+def keep_generated(mcqs, difficulty, subject='', topic=''):
+    """Queue LLM-generated questions for the question bank so they needn't be paid for again."""
+    if settings.NLP_INGEST_GENERATED and mcqs:
+        # 'support' on LLM questions is the whole reply, not an explanation
+        question_ingestor.submit([{**mcq, 'support': None} for mcq in mcqs], subject, topic, difficulty)
+
+def input_passages(text):
+    return split_passages(text, settings.NLP_PASSAGE_WORDS, settings.NLP_PASSAGE_OVERLAP, settings.NLP_MAX_PASSAGES)
+
+def search_filters(difficulty, subject='', topic=''):
+    return {'subject': subject, 'topic': topic, 'difficulty': difficulty}
+
+def bank_only(deadline=None):
+    """True when the MCQ corpus isn't loaded but the question bank can still be searched.
 
-def get_semantically_similar_mcqs(input_text, num_questions=5, difficulty="medium"):
-    if embedder is None or MCQ_DF is None:
-        logger.warning("Model or data not loaded, falling back to Claude 3")
+    A cold worker waits for its first load only as long as ``deadline`` allows.
+    """
+    timeout = deadline.remaining() if deadline is not None else None
+    if embedding_service.ensure_loaded(timeout):
+        return False
+    timeout = deadline.remaining() if deadline is not None else None
+    if settings.NLP_QUESTION_BANK and embedding_service.ensure_model(timeout):
+        logger.warning("MCQ corpus not loaded, searching only the question bank")
+        return True
+    logger.warning("Model or data not loaded, falling back to Claude 3")
+    return None
+
+def get_semantically_similar_mcqs(input_text, num_questions=5, difficulty="medium", timeout=None, subject='', topic=''):
+    deadline = Deadline(timeout) if timeout is not None else None
+    only_bank = bank_only(deadline)
+    if only_bank is None:
         return []
 
     try:
-        logger.info("Generating embeddings for input text")
-        input_vec = embedder.encode(input_text, convert_to_numpy=True)
-        embedding_matrix = np.vstack(MCQ_DF['embedding'].to_numpy())
-        similarities = util.cos_sim(input_vec, embedding_matrix)[0]
-
-        threshold = 0.75
-        top_indices = sorted(
-            [idx for idx, score in enumerate(similarities) if score > threshold],
-            key=lambda idx: similarities[idx],
-            reverse=True
-        )[:num_questions]
-
-        results = []
-        used = set()
-
-        for idx in top_indices:
-            row = MCQ_DF.iloc[idx]
-            if row['question'] in used:
-                continue
-            options = list({row['correct_answer'], row['distractor1'], row['distractor2'], row['distractor3']})
-            np.random.shuffle(options)
-            results.append({
-                "question_text": row['question'],
-                "options": options,
-                "correct_answer": row['correct_answer'],
-                "support": row['support'],
-                "relevance_score": round(float(similarities[idx]), 3),
-                "difficulty": difficulty
-            })
-            used.add(row['question'])
-            if len(results) >= num_questions:
-                break
+        index = embedding_service.index
+        passages = input_passages(input_text)
+        logger.info(f"Generating embeddings for {len(passages)} input passages")
+        passage_vecs = embedding_service.encode_cached(passages, deadline.remaining() if deadline is not None else None)
+        bank = bank_mcqs(passage_vecs, num_questions, difficulty, subject, topic)
+        if len(bank) >= num_questions or only_bank:
+            logger.info(f"Found {len(bank)} matching questions in the question bank")
+            return bank
 
-        logger.info(f"Found {len(results)} semantically similar questions")
+        rows = index.filter_rows(search_filters(difficulty, subject, topic))
+        top_indices, top_scores = index.top_k_passages(
+            passage_vecs, candidate_pool(num_questions), threshold=SIMILARITY_THRESHOLD, query_text=input_text, rows=rows,
+        )
+        top_indices, top_scores = rank_candidates(index, top_indices, top_scores)
+        results = bank_first(bank, build_mcq_results(index, top_indices, top_scores, num_questions, difficulty), num_questions)
+
+        logger.info(f"Found {len(results)} semantically similar questions ({len(bank)} from the question bank)")
         return results
+    except FutureTimeoutError:
+        logger.warning(f"Semantic search exceeded its {timeout}s budget")
+        return []
     except Exception as e:
         logger.error(f"Error in semantic similarity search: {str(e)}")
         return []
 
-def generate_mcqs(text, num_questions, difficulty="medium"):
-    text_hash = hashlib.md5(f"{text}_{difficulty}".encode()).hexdigest()
-    if (text_hash, num_questions) in cache:
+def get_semantically_similar_mcqs_batch(texts, counts, difficulties, timeout=None, subjects=None, topics=None):
+    """Semantic search for many inputs: one batched encode and one matrix-matrix product."""
+    deadline = Deadline(timeout) if timeout is not None else None
+    only_bank = bank_only(deadline)
+    if only_bank is None:
+        return [[] for _ in texts]
+
+    try:
+        index = embedding_service.index
+        passages = [input_passages(text) for text in texts]
+        logger.info(f"Generating embeddings for {len(texts)} input texts")
+        passage_vecs = embedding_service.encode_cached(
+            [p for text_passages in passages for p in text_passages], deadline.remaining() if deadline is not None else None,
+        )
+        offsets = np.cumsum([0] + [len(text_passages) for text_passages in passages])
+        banks = [
+            bank_mcqs(passage_vecs[start:end], count, difficulty, subject, topic)
+            for start, end, count, difficulty, subject, topic in zip(
+                offsets[:-1], offsets[1:], counts, difficulties, subjects or [''] * len(texts), topics or [''] * len(texts),
+            )
+        ]
+        if only_bank:
+            return banks
+        row_filters = [
+            index.filter_rows(search_filters(difficulty, subject, topic))
+            for difficulty, subject, topic in zip(difficulties, subjects or [''] * len(texts), topics or [''] * len(texts))
+        ]
+        pools = [candidate_pool(count) for count in counts]
+        if len(passage_vecs) == len(texts):
+            hits = index.top_k_many(passage_vecs, pools, threshold=SIMILARITY_THRESHOLD, query_texts=texts, row_filters=row_filters)
+        else:
+            # Long inputs: score each text by its best passage
+            hits = [
+                index.top_k_passages(passage_vecs[start:end], k, threshold=SIMILARITY_THRESHOLD, query_text=text, rows=rows)
+                for start, end, k, text, rows in zip(offsets[:-1], offsets[1:], pools, texts, row_filters)
+            ]
+        return [
+            bank_first(bank, build_mcq_results(index, *rank_candidates(index, top_indices, top_scores), num_questions, difficulty), num_questions)
+            for bank, (top_indices, top_scores), num_questions, difficulty in zip(banks, hits, counts, difficulties)
+        ]
+    except FutureTimeoutError:
+        logger.warning(f"Batch semantic search exceeded its {timeout}s budget")
+        return [[] for _ in texts]
+    except Exception as e:
+        logger.error(f"Error in batch semantic similarity search: {str(e)}")
+        return [[] for _ in texts]
+
+def generate_mcqs(text, num_questions, difficulty="medium", deadline=None, subject='', topic=''):
+    """Semantic matches, then cloze questions from the text, topped up by the LLM, within ``deadline`` (default NLP_REQUEST_BUDGET).
+
+    Semantic search may use up to NLP_SEARCH_BUDGET of it and the LLM gets
+    what is left. When the budget or the LLM runs out, fewer than
+    ``num_questions`` questions are returned and nothing is cached.
+    """
+    deadline = deadline or Deadline(settings.NLP_REQUEST_BUDGET)
+    cache_key = mcq_cache_key(text, num_questions, difficulty, embedding_service.active_version(), subject, topic)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
         logger.info("Returning cached questions")
-        return cache[(text_hash, num_questions)]
+        return cached
+
+    # Identical concurrent requests (a class opening the same chapter) share one computation
+    return inflight.run(
+        cache_key, lambda: compute_mcqs(cache_key, text, num_questions, difficulty, deadline, subject, topic), deadline,
+    )
 
+def compute_mcqs(cache_key, text, num_questions, difficulty, deadline, subject='', topic=''):
     logger.info(f"Generating {num_questions} questions for difficulty: {difficulty}")
-    mcqs = get_semantically_similar_mcqs(text, num_questions, difficulty)
-    
+    mcqs = get_semantically_similar_mcqs(
+        text, num_questions, difficulty, deadline.remaining(cap=settings.NLP_SEARCH_BUDGET), subject, topic,
+    )
+    mcqs += local_cloze_mcqs(text, num_questions - len(mcqs), difficulty)
+
+    record_local_result(len(mcqs), num_questions)
     if len(mcqs) < num_questions:
         logger.info(f"Only found {len(mcqs)} questions, using Claude 3 for remaining {num_questions - len(mcqs)}")
-        mcqs += openai_generate_questions(text, num_questions - len(mcqs), difficulty)
+        generated = openai_generate_questions(text, num_questions - len(mcqs), difficulty, deadline)
+        keep_generated(generated, difficulty, subject, topic)
+        mcqs += generated
 
-    cache[(text_hash, num_questions)] = mcqs
+    # Short results usually mean the LLM fallback failed; don't pin them in the cache
+    if len(mcqs) >= num_questions:
+        result_cache.set(cache_key, mcqs)
     return mcqs
 
+def iter_generated_mcqs(text, num_questions, difficulty, deadline, subject='', topic=''):
+    """(source, question) pairs for one request, each as soon as it is available.
+
+    Same pipeline as ``generate_mcqs`` (cache, then semantic search, cloze
+    questions and the LLM) for streaming responses, coalesced with identical
+    in-flight requests, streamed or not; those get the leader's questions
+    once it has finished, with source 'coalesced'.
+    """
+    cache_key = mcq_cache_key(text, num_questions, difficulty, embedding_service.active_version(), subject, topic)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        for mcq in cached:
+            yield 'cache', mcq
+        return
+
+    yield from inflight.stream(
+        cache_key, lambda: stream_mcqs(cache_key, text, num_questions, difficulty, deadline, subject, topic), deadline,
+    )
+
+def stream_mcqs(cache_key, text, num_questions, difficulty, deadline, subject='', topic=''):
+    """``compute_mcqs`` yielding (source, question) pairs; a complete result is cached at the end."""
+    mcqs = get_semantically_similar_mcqs(
+        text, num_questions, difficulty, deadline.remaining(cap=settings.NLP_SEARCH_BUDGET), subject, topic,
+    )
+    for mcq in mcqs:
+        yield 'semantic', mcq
+    for mcq in local_cloze_mcqs(text, num_questions - len(mcqs), difficulty):
+        mcqs.append(mcq)
+        yield 'cloze', mcq
+    record_local_result(len(mcqs), num_questions)
+
+    if len(mcqs) < num_questions:
+        generated = []
+        for mcq in iter_openai_questions(text, num_questions - len(mcqs), difficulty, deadline):
+            generated.append(mcq)
+            mcqs.append(mcq)
+            yield 'llm', mcq
+        keep_generated(generated, difficulty, subject, topic)
+
+    if len(mcqs) >= num_questions:
+        result_cache.set(cache_key, mcqs)
+
+def cached_mcqs(params):
+    """The cached result for a parsed request, or None; lets cache hits skip the work gate."""
+    return result_cache.get(mcq_cache_key(
+        params['text'], params['num_questions'], params['difficulty'],
+        embedding_service.active_version(), params['subject'], params['topic'],
+    ))
+
+def generate_mcqs_batch(items, deadline=None):
+    """generate_mcqs for a list of parsed requests; only items that come up short call the LLM.
+
+    The whole batch shares one deadline; items reached after it has passed
+    get only their semantic matches.
+    """
+    deadline = deadline or Deadline(settings.NLP_REQUEST_BUDGET)
+    version = embedding_service.active_version()
+    keys = [
+        mcq_cache_key(item['text'], item['num_questions'], item['difficulty'], version, item['subject'], item['topic'])
+        for item in items
+    ]
+    results = [result_cache.get(key) for key in keys]
+    pending = [i for i, cached in enumerate(results) if cached is None]
+    logger.info(f"Batch of {len(items)} items, {len(items) - len(pending)} served from cache")
+
+    if pending:
+        found = get_semantically_similar_mcqs_batch(
+            [items[i]['text'] for i in pending],
+            [items[i]['num_questions'] for i in pending],
+            [items[i]['difficulty'] for i in pending],
+            deadline.remaining(cap=settings.NLP_SEARCH_BUDGET),
+            [items[i]['subject'] for i in pending],
+            [items[i]['topic'] for i in pending],
+        )
+        for i, mcqs in zip(pending, found):
+            item = items[i]
+            mcqs += local_cloze_mcqs(item['text'], item['num_questions'] - len(mcqs), item['difficulty'])
+            record_local_result(len(mcqs), item['num_questions'])
+            if len(mcqs) < item['num_questions']:
+                generated = openai_generate_questions(item['text'], item['num_questions'] - len(mcqs), item['difficulty'], deadline)
+                keep_generated(generated, item['difficulty'], item['subject'], item['topic'])
+                mcqs += generated
+            if len(mcqs) >= item['num_questions']:
+                result_cache.set(keys[i], mcqs)
+            results[i] = mcqs
+
+    return results
+
+def parse_generation_request(data):
+    """Validated generation parameters from a request body, or an error message."""
+    try:
+        num_questions = int(data.get('num_questions', 5))
+    except (TypeError, ValueError):
+        return None, 'Number of questions must be an integer'
+
+    params = {
+        'text': data.get('text', ''),
+        'num_questions': num_questions,
+        'difficulty': data.get('difficulty', 'medium'),
+        'subject': data.get('subject', ''),
+        'topic': data.get('topic', ''),
+    }
+
+    if not params['text']:
+        return None, 'Text is required'
+
+    if not isinstance(params['text'], str):
+        return None, 'Text must be a string'
+
+    if not isinstance(params['subject'], str) or not isinstance(params['topic'], str):
+        return None, 'Subject and topic must be strings'
+
+    if len(params['subject']) > SUBJECT_MAX_LENGTH or len(params['topic']) > TOPIC_MAX_LENGTH:
+        return None, f'Subject and topic must be at most {min(SUBJECT_MAX_LENGTH, TOPIC_MAX_LENGTH)} characters'
+
+    if num_questions < 1 or num_questions > 20:
+        return None, 'Number of questions must be between 1 and 20'
+
+    if params['difficulty'] not in ['easy', 'medium', 'hard']:
+        return None, 'Difficulty must be easy, medium, or hard'
+
+    return params, None
+
+def generation_response(params, mcqs):
+    # Add subject and topic to each question (copies, the cached list is shared)
+    questions = [{**q, 'subject': params['subject'], 'topic': params['topic']} for q in mcqs]
+    return {
+        'questions': questions,
+        'total': len(questions),
+        # Fewer questions than asked for: the time budget or the LLM fallback ran out
+        'partial': len(questions) < params['num_questions'],
+        'difficulty': params['difficulty'],
+        'subject': params['subject'],
+        'topic': params['topic']
+    }
+
+def overloaded_response(error):
+    response = JsonResponse({'error': str(error)}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+def format_event(stream_format, event, data):
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({'event': event, 'data': data}) + '\n'
+
+def stream_generation(params, stream_format):
+    """'question' events as questions become available, then one 'summary' event."""
+    deadline = Deadline(settings.NLP_REQUEST_BUDGET)
+    sources = {'cache': 0, 'coalesced': 0, 'semantic': 0, 'cloze': 0, 'llm': 0}
+    try:
+        for source, mcq in iter_generated_mcqs(
+            params['text'], params['num_questions'], params['difficulty'], deadline, params['subject'], params['topic'],
+        ):
+            sources[source] += 1
+            yield format_event(stream_format, 'question', {
+                **mcq, 'subject': params['subject'], 'topic': params['topic'], 'source': source,
+            })
+    except Exception as e:
+        logger.error(f"Error in generate_questions stream: {str(e)}")
+        yield format_event(stream_format, 'error', {'error': str(e)})
+
+    total = sum(sources.values())
+    logger.info(f"Streamed {total} questions ({sources})")
+    yield format_event(stream_format, 'summary', {
+        'total': total,
+        'partial': total < params['num_questions'],
+        'sources': sources,
+        'difficulty': params['difficulty'],
+        'subject': params['subject'],
+        'topic': params['topic'],
+    })
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([GenerationThrottle])
 def generate_questions(request):
+    """Generate questions; with "stream": "sse" or "ndjson" they are sent as they become available."""
     try:
         data = json.loads(request.body)
-        text = data.get('text', '')
-        num_questions = int(data.get('num_questions', 5))
-        difficulty = data.get('difficulty', 'medium')
-        subject = data.get('subject', '')
-        topic = data.get('topic', '')
+        params, error = parse_generation_request(data)
+        if error:
+            return JsonResponse({'error': error}, status=400)
+
+        stream_format = data.get('stream')
+        if stream_format and stream_format not in STREAM_CONTENT_TYPES:
+            return JsonResponse({'error': 'stream must be sse or ndjson'}, status=400)
+
+        logger.info(f"Received request for {params['num_questions']} {params['difficulty']} questions on {params['subject']}/{params['topic']}")
 
-        logger.info(f"Received request for {num_questions} {difficulty} questions on {subject}/{topic}")
+        if stream_format:
+            events = stream_generation(params, stream_format)
+            if cached_mcqs(params) is None:
+                events = work_gate.hold(events)
+            response = StreamingHttpResponse(
+                events,
+                content_type=STREAM_CONTENT_TYPES[stream_format],
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+            return response
 
+        mcqs = cached_mcqs(params)
+        if mcqs is None:
+            with work_gate.slot():
+                mcqs = generate_mcqs(
+                    params['text'], params['num_questions'], params['difficulty'], subject=params['subject'], topic=params['topic'],
+                )
+
+        logger.info(f"Successfully generated {len(mcqs)} questions")
+        return JsonResponse(generation_response(params, mcqs))
+
+    except Overloaded as e:
+        logger.warning(f"Rejected generate_questions: {str(e)}")
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Error in generate_questions: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([BatchGenerationThrottle])
+def generate_questions_batch(request):
+    """Generate questions for a list of {text, num_questions, difficulty, subject, topic} items."""
+    try:
+        data = json.loads(request.body)
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return JsonResponse({'error': 'items must be a non-empty list'}, status=400)
+        if len(items) > settings.NLP_BATCH_MAX_ITEMS:
+            return JsonResponse({'error': f'At most {settings.NLP_BATCH_MAX_ITEMS} items per batch'}, status=400)
+
+        parsed = [
+            parse_generation_request(item) if isinstance(item, dict) else (None, 'Item must be an object')
+            for item in items
+        ]
+        valid = [params for params, error in parsed if error is None]
+        all_cached = all(cached_mcqs(params) is not None for params in valid)
+        with contextlib.nullcontext() if all_cached else work_gate.slot():
+            generated = iter(generate_mcqs_batch(valid))
+
+        results = [
+            {'error': error} if error else generation_response(params, next(generated))
+            for params, error in parsed
+        ]
+        logger.info(f"Successfully processed batch of {len(items)} items")
+        return JsonResponse({'results': results, 'total': len(results)})
+
+    except Overloaded as e:
+        logger.warning(f"Rejected generate_questions_batch: {str(e)}")
+        return overloaded_response(e)
+    except Exception as e:
+        logger.error(f"Error in generate_questions_batch: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([GenerationThrottle])
+def similar_questions(request):
+    """Existing bank questions similar to ``text``, e.g. the one a teacher is writing."""
+    try:
+        data = json.loads(request.body)
+        text = data.get('text', '')
         if not text:
             return JsonResponse({'error': 'Text is required'}, status=400)
+        if not isinstance(text, str):
+            return JsonResponse({'error': 'Text must be a string'}, status=400)
+        if not all(isinstance(data.get(field, ''), str) for field in ('difficulty', 'subject', 'topic')):
+            return JsonResponse({'error': 'Difficulty, subject and topic must be strings'}, status=400)
+        try:
+            limit = int(data.get('limit', 5))
+            threshold = float(data.get('threshold', SIMILAR_QUESTIONS_THRESHOLD))
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Limit and threshold must be numbers'}, status=400)
+        if limit < 1 or limit > 50:
+            return JsonResponse({'error': 'Limit must be between 1 and 50'}, status=400)
 
-        if num_questions < 1 or num_questions > 20:
-            return JsonResponse({'error': 'Number of questions must be between 1 and 20'}, status=400)
-
-        if difficulty not in ['easy', 'medium', 'hard']:
-            return JsonResponse({'error': 'Difficulty must be easy, medium, or hard'}, status=400)
-
-        questions = generate_mcqs(text, num_questions, difficulty)
-        
-        # Add subject and topic to each question
-        for q in questions:
-            q['subject'] = subject
-            q['topic'] = topic
-
-        logger.info(f"Successfully generated {len(questions)} questions")
-        return JsonResponse({
-            'questions': questions,
-            'total': len(questions),
-            'difficulty': difficulty,
-            'subject': subject,
-            'topic': topic
-        })
+        with work_gate.slot():
+            passage_vecs = embedding_service.encode_cached(input_passages(text), settings.NLP_SEARCH_BUDGET)
+        ids, scores = question_bank.search(
+            passage_vecs, limit, threshold,
+            search_filters(data.get('difficulty', ''), data.get('subject', ''), data.get('topic', '')),
+        )
+        questions = Question.objects.filter(deleted_at__isnull=True).in_bulk(ids.tolist())
+        results = [
+            {**QuestionSerializer(questions[pk]).data, 'similarity': round(float(score), 3)}
+            for pk, score in zip(ids.tolist(), scores) if pk in questions
+        ]
+        return JsonResponse({'questions': results, 'total': len(results), 'indexed': len(question_bank.snapshot)})
 
+    except Overloaded as e:
+        logger.warning(f"Rejected similar_questions: {str(e)}")
+        return overloaded_response(e)
+    except FutureTimeoutError as e:
+        logger.warning(f"similar_questions exceeded its search budget: {str(e)}")
+        return JsonResponse({'error': 'The search model is loading or busy, try again shortly'}, status=503)
     except Exception as e:
-        logger.error(f"Error in generate_questions: {str(e)}")
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        logger.error(f"Error in similar_questions: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser])
+def corpus_versions(request):
+    """List corpus versions (GET) or switch the active one (POST {"version": ...})."""
+    root = embedding_service.corpus_root
+    if request.method == 'POST':
+        try:
+            version = json.loads(request.body).get('version', '')
+            if version not in corpus.list_versions(root):
+                return JsonResponse({'error': f'Unknown corpus version {version}'}, status=400)
+
+            # Loaded here before the pointer moves; other workers notice it on their next check
+            try:
+                embedding_service.activate(version)
+            except ValueError as e:
+                logger.warning(f"Corpus switch to {version} refused: {str(e)}")
+                return JsonResponse({'error': str(e), 'status': embedding_service.status()}, status=409)
+            logger.info(f"Corpus switched to {version} by {request.user}")
+            if embedding_service.state == embedding_service.FAILED:
+                embedding_service.warmup(force=True)
+        except Exception as e:
+            logger.error(f"Error in corpus_versions: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({
+        'versions': corpus.list_versions(root),
+        'current': corpus.read_current(root),
+        'status': embedding_service.status(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def nlp_status(request):
+    """Model/corpus state and cache counters for this worker."""
+    return JsonResponse({
+        'service': embedding_service.status(),
+        'result_cache': result_cache.stats(),
+        'single_flight': inflight.stats(),
+        'llm': llm_gateway.stats(),
+        'question_bank': question_bank.stats(),
+        'ingest': question_ingestor.stats(),
+        'admission': work_gate.stats(),
+        'generation': {
+            **generation_stats,
+            'llm_fallback_rate': round(generation_stats['llm_fallbacks'] / generation_stats['searches'], 4)
+            if generation_stats['searches'] else None,
+        },
+    })
@@ -187,3 +187,76 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 RAPIDAPI_KEY=config('RAPIDAPI_KEY')
+
+# NLP question generator
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared tier of the NLP caches; use a Redis/Memcached backend to share across nodes.
+    # FileBasedCache.add is not atomic, so rate limits and cross-process request coalescing
+    # are best-effort on the default; use RedisCache, Memcached or DatabaseCache to enforce them.
+    'nlp': {
+        'BACKEND': config('NLP_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('NLP_CACHE_LOCATION', default=os.path.join(BASE_DIR, 'nlp_cache')),
+        'OPTIONS': {'MAX_ENTRIES': config('NLP_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+}
+NLP_RESULT_CACHE_TTL = config('NLP_RESULT_CACHE_TTL', default=24 * 3600, cast=int)  # Seconds a generate_mcqs result is kept
+NLP_RESULT_CACHE_MAX_ENTRIES = config('NLP_RESULT_CACHE_MAX_ENTRIES', default=1024, cast=int)  # Per-process LRU limits
+NLP_RESULT_CACHE_MAX_BYTES = config('NLP_RESULT_CACHE_MAX_BYTES', default=64 * 2**20, cast=int)
+NLP_VERIFY_CHECKSUMS = config('NLP_VERIFY_CHECKSUMS', default=True, cast=bool)  # Hash corpus files against manifest.json at load
+NLP_ANN_NPROBE = config('NLP_ANN_NPROBE', default=8, cast=int)  # IVF buckets scanned per query when ivf.npz exists
+NLP_CORPUS_CHECK_INTERVAL = config('NLP_CORPUS_CHECK_INTERVAL', default=5, cast=float)  # Seconds between checks of data/corpus/CURRENT
+NLP_VECTOR_CACHE_MAX_ENTRIES = config('NLP_VECTOR_CACHE_MAX_ENTRIES', default=8192, cast=int)  # Input-text embedding cache
+NLP_VECTOR_CACHE_MAX_BYTES = config('NLP_VECTOR_CACHE_MAX_BYTES', default=16 * 2**20, cast=int)
+NLP_VECTOR_CACHE_PERSIST = config('NLP_VECTOR_CACHE_PERSIST', default=False, cast=bool)  # Also keep vectors in the shared 'nlp' cache
+NLP_VECTOR_CACHE_TTL = config('NLP_VECTOR_CACHE_TTL', default=7 * 24 * 3600, cast=int)
+NLP_BATCH_MAX_ITEMS = config('NLP_BATCH_MAX_ITEMS', default=100, cast=int)  # Items per /api/generate-questions/batch/ request
+NLP_MICROBATCH_ENABLED = config('NLP_MICROBATCH_ENABLED', default=True, cast=bool)  # Merge concurrent encode calls
+NLP_MICROBATCH_MAX_WAIT_MS = config('NLP_MICROBATCH_MAX_WAIT_MS', default=5, cast=float)
+NLP_MICROBATCH_MAX_SIZE = config('NLP_MICROBATCH_MAX_SIZE', default=64, cast=int)
+NLP_INFERENCE_SOCKET = config('NLP_INFERENCE_SOCKET', default='')  # Unix socket of run_inference_server; empty encodes in-process
+NLP_INFERENCE_TIMEOUT = config('NLP_INFERENCE_TIMEOUT', default=10, cast=float)  # Seconds to wait on the inference server
+NLP_INFERENCE_FALLBACK = config('NLP_INFERENCE_FALLBACK', default=False, cast=bool)  # Load the model locally if the server is unreachable
+NLP_INFERENCE_THREADS = config('NLP_INFERENCE_THREADS', default=2, cast=int)  # torch threads used by the inference server
+NLP_INFERENCE_QUEUE_SIZE = config('NLP_INFERENCE_QUEUE_SIZE', default=64, cast=int)  # Requests the server accepts before rejecting
+NLP_LLM_URL = config('NLP_LLM_URL', default='https://open-ai21.p.rapidapi.com/claude3')  # Point at run_llm_stub for local testing
+NLP_LLM_CONNECT_TIMEOUT = config('NLP_LLM_CONNECT_TIMEOUT', default=3.05, cast=float)  # Seconds
+NLP_LLM_READ_TIMEOUT = config('NLP_LLM_READ_TIMEOUT', default=30, cast=float)
+NLP_LLM_MAX_RETRIES = config('NLP_LLM_MAX_RETRIES', default=2, cast=int)  # Retries on connection errors, 429 and 5xx
+NLP_LLM_BACKOFF = config('NLP_LLM_BACKOFF', default=0.5, cast=float)  # Base of the jittered exponential backoff, seconds
+NLP_LLM_POOL_SIZE = config('NLP_LLM_POOL_SIZE', default=10, cast=int)  # Keep-alive connections per process
+NLP_LLM_CACHE_TTL = config('NLP_LLM_CACHE_TTL', default=30 * 24 * 3600, cast=int)  # Seconds a response is reused for the same prompt
+NLP_LLM_BREAKER_FAILURES = config('NLP_LLM_BREAKER_FAILURES', default=5, cast=int)  # Consecutive failed calls that open the circuit
+NLP_LLM_BREAKER_RESET = config('NLP_LLM_BREAKER_RESET', default=30, cast=float)  # Seconds before a half-open probe
+NLP_REQUEST_BUDGET = config('NLP_REQUEST_BUDGET', default=10, cast=float)  # Seconds a generate-questions request may take
+NLP_SEARCH_BUDGET = config('NLP_SEARCH_BUDGET', default=2, cast=float)  # Part of the budget semantic search may use; the LLM gets the rest
+NLP_PASSAGE_WORDS = config('NLP_PASSAGE_WORDS', default=150, cast=int)  # Long inputs are searched as overlapping passages of this many words
+NLP_PASSAGE_OVERLAP = config('NLP_PASSAGE_OVERLAP', default=30, cast=int)
+NLP_MAX_PASSAGES = config('NLP_MAX_PASSAGES', default=16, cast=int)  # Passages encoded per input text
+NLP_LEXICAL_PREFILTER = config('NLP_LEXICAL_PREFILTER', default=True, cast=bool)  # Use bm25.npz, when built, to pick rows for dense scoring
+NLP_LEXICAL_CANDIDATES = config('NLP_LEXICAL_CANDIDATES', default=1000, cast=int)  # BM25 matches re-ranked densely per query
+NLP_LEXICAL_MIN_CANDIDATES = config('NLP_LEXICAL_MIN_CANDIDATES', default=50, cast=int)  # Fewer matches fall back to dense search
+NLP_MMR_DIVERSITY = config('NLP_MMR_DIVERSITY', default=0.3, cast=float)  # Weight of novelty vs relevance when re-ranking; 0 disables MMR
+NLP_MMR_POOL_FACTOR = config('NLP_MMR_POOL_FACTOR', default=4, cast=int)  # Candidates retrieved per requested question for re-ranking
+NLP_QUESTION_BANK = config('NLP_QUESTION_BANK', default=True, cast=bool)  # Serve matching questions.Question rows before the corpus
+NLP_BANK_DIR = config('NLP_BANK_DIR', default='')  # Where bank.npz is saved; empty uses nlp/data/bank
+NLP_BANK_THRESHOLD = config('NLP_BANK_THRESHOLD', default=0.75, cast=float)  # Similarity a bank question needs to be reused
+NLP_BANK_BATCH_SIZE = config('NLP_BANK_BATCH_SIZE', default=64, cast=int)  # Questions encoded per model call when re-indexing
+NLP_BANK_FLUSH_INTERVAL = config('NLP_BANK_FLUSH_INTERVAL', default=1.0, cast=float)  # Seconds edits are collected before re-encoding
+NLP_BANK_SYNC_INTERVAL = config('NLP_BANK_SYNC_INTERVAL', default=60, cast=float)  # Seconds between checks for edits made by other workers
+NLP_DISTRACTOR_MAX_SIMILARITY = config('NLP_DISTRACTOR_MAX_SIMILARITY', default=0.9, cast=float)  # Closer to the answer than this is too close to be a distractor
+NLP_SUMMARY_POINTS = config('NLP_SUMMARY_POINTS', default=7, cast=int)  # Key points extracted for a practice session
+NLP_SUMMARY_MAX_SENTENCES = config('NLP_SUMMARY_MAX_SENTENCES', default=200, cast=int)  # Sentences ranked; later text is ignored
+NLP_CLOZE_ENABLED = config('NLP_CLOZE_ENABLED', default=True, cast=bool)  # Fill short results with fill-in-the-blank questions before calling the LLM
+NLP_INGEST_GENERATED = config('NLP_INGEST_GENERATED', default=True, cast=bool)  # Add LLM-generated questions to questions.Question
+NLP_INGEST_DUPLICATE_THRESHOLD = config('NLP_INGEST_DUPLICATE_THRESHOLD', default=0.92, cast=float)  # Similarity to a bank question that counts as a duplicate
+NLP_INGEST_BATCH_SIZE = config('NLP_INGEST_BATCH_SIZE', default=100, cast=int)  # Rows per bulk_create
+NLP_ADMISSION_MAX_CONCURRENT = config('NLP_ADMISSION_MAX_CONCURRENT', default=4, cast=int)  # Generation/practice jobs running at once per process
+NLP_ADMISSION_MAX_WAITING = config('NLP_ADMISSION_MAX_WAITING', default=16, cast=int)  # Jobs queued for a slot; beyond this requests get 429
+NLP_ADMISSION_WAIT_TIMEOUT = config('NLP_ADMISSION_WAIT_TIMEOUT', default=5, cast=float)  # Seconds a request waits for a slot
+NLP_GENERATE_BURST = config('NLP_GENERATE_BURST', default=10, cast=int)  # Per-user token bucket for the generate/similar endpoints
+NLP_GENERATE_RATE = config('NLP_GENERATE_RATE', default=0.2, cast=float)  # Tokens regained per second
+NLP_PRACTICE_BURST = config('NLP_PRACTICE_BURST', default=3, cast=int)  # Per-user token bucket for new practice sessions
+NLP_PRACTICE_RATE = config('NLP_PRACTICE_RATE', default=1 / 60, cast=float)
@@ -20,11 +20,16 @@ from django.db import connection
 
 import io
 import base64
-import requests
+import logging
 import threading
 
 
 from users.serializers import UserSerializer
+from nlp.embedding import embedding_service
+from nlp.admission import Overloaded, PracticeThrottle, work_gate
+from nlp.llm import LLMError, llm_gateway, parse_mcqs
+from nlp.summarize import summarize
+from nlp.views import generate_mcqs, keep_generated
 
 from .models import (
     Test, TestQuestion, Question, TestAssignment, StudentTestAttempt, 
@@ -36,6 +41,7 @@ from .serializers import (
 )
 from rest_framework.permissions import IsAuthenticated
 
+logger = logging.getLogger(__name__)
 
 
 #  List & Create Tests
@@ -910,6 +916,7 @@ class TeacherFeedbackListView(APIView):
 
 class PracticeSessionView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PracticeThrottle]
 
     def post(self, request):
         # Only students can create practice sessions
@@ -926,6 +933,14 @@ class PracticeSessionView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Turn the session away now rather than leave it pending behind a full queue
+        if not work_gate.has_room():
+            return Response(
+                {"error": "Server is busy, please try again shortly"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(work_gate.retry_after())}
+            )
+
         # Create practice session
         practice_session = PracticeSession.objects.create(
             student=request.user,
@@ -933,10 +948,13 @@ class PracticeSessionView(APIView):
             status='pending'
         )
 
+        # Enhanced mode asks the LLM for the summary and questions; otherwise both are built locally
+        enhanced = str(request.data.get('enhanced', '')).lower() in ('1', 'true', 'yes')
+
         # Start processing in background
         thread = threading.Thread(
-            target=self.process_practice_session,
-            args=(practice_session.id,)
+            target=self.run_practice_session,
+            args=(practice_session.id, enhanced)
         )
         thread.start()
 
@@ -952,15 +970,41 @@ class PracticeSessionView(APIView):
         serializer = PracticeSessionSerializer(practice_sessions, many=True)
         return Response(serializer.data)
 
-    def process_practice_session(self, session_id):
+    def run_practice_session(self, session_id, enhanced=False):
+        # Waits for a work_gate slot so sessions share the inference/LLM concurrency cap with the NLP API
+        try:
+            with work_gate.slot(timeout=None):
+                self.process_practice_session(session_id, enhanced)
+        except Overloaded as e:
+            PracticeSession.objects.filter(id=session_id).update(status='failed', error_message=str(e))
+
+    def process_practice_session(self, session_id, enhanced=False):
         try:
             session = PracticeSession.objects.get(id=session_id)
             session.status = 'processing'
             session.save()
 
+            if not enhanced:
+                # Key sentences by TextRank, questions from the corpus and question bank (LLM only tops them up)
+                try:
+                    summary_points = summarize(
+                        session.input_text, embedding_service.encode_batched,
+                        max_points=settings.NLP_SUMMARY_POINTS, max_sentences=settings.NLP_SUMMARY_MAX_SENTENCES,
+                    )
+                    if not summary_points:
+                        raise ValueError('Text is too short to summarize locally')
+                    generated_questions = generate_mcqs(session.input_text, 5)
+                except Exception as e:
+                    # e.g. the embedding model is unavailable; the LLM path below still works
+                    logger.warning(f"Local processing of practice session {session_id} failed, using the LLM: {str(e)}")
+                else:
+                    session.summary_points = summary_points
+                    session.generated_questions = generated_questions
+                    session.status = 'completed'
+                    session.save()
+                    return
+
             # Call RapidAPI's Claude 3 for text processing
-            url = "https://open-ai21.p.rapidapi.com/claude3"
-            
             # First prompt for summarization
             summary_prompt = f"""Please analyze the following text and provide:
 1. A concise summary (2-3 sentences)
@@ -982,54 +1026,19 @@ C. [Option C]
 D. [Option D]
 Answer: [Correct option letter]"""
 
-            headers = {
-                "x-rapidapi-key": settings.RAPIDAPI_KEY,
-                "x-rapidapi-host": "open-ai21.p.rapidapi.com",
-                "Content-Type": "application/json"
-            }
-
-            # Get summary
-            summary_payload = {
-                "messages": [{"role": "user", "content": summary_prompt}],
-                "web_access": False
-            }
-            summary_response = requests.post(url, json=summary_payload, headers=headers)
-            
-            if summary_response.status_code != 200:
-                raise Exception(f"Summary generation failed: {summary_response.text}")
+            try:
+                summary_text = llm_gateway.complete(summary_prompt)
+            except LLMError as e:
+                raise Exception(f"Summary generation failed: {str(e)}")
 
-            # Get MCQs
-            mcq_payload = {
-                "messages": [{"role": "user", "content": mcq_prompt}],
-                "web_access": False
-            }
-            mcq_response = requests.post(url, json=mcq_payload, headers=headers)
-            
-            if mcq_response.status_code != 200:
-                raise Exception(f"MCQ generation failed: {mcq_response.text}")
+            try:
+                mcq_text = llm_gateway.complete(mcq_prompt)
+            except LLMError as e:
+                raise Exception(f"MCQ generation failed: {str(e)}")
 
-            # Process summary response
-            summary_text = summary_response.json().get("result", "").strip()
             summary_points = summary_text.split('\n')
-
-            # Process MCQ response
-            mcq_text = mcq_response.json().get("result", "").strip()
-            questions = mcq_text.split('Q')[1:]  # Split by question
-            mcq_list = []
-
-            for q in questions:
-                lines = q.strip().split('\n')
-                question_text = lines[0].strip()
-                options = [line[2:].strip() for line in lines[1:5] if line.startswith(tuple("ABCD"))]
-                answer_line = next((line for line in lines if line.lower().startswith("answer:")), "")
-                correct_answer = answer_line.split(":", 1)[-1].strip()
-                
-                if len(options) == 4 and question_text:
-                    mcq_list.append({
-                        "question_text": question_text,
-                        "options": options,
-                        "correct_answer": correct_answer
-                    })
+            mcq_list = parse_mcqs(mcq_text)
+            keep_generated(mcq_list, 'medium')
 
             # Update session with results
             session.summary_points = summary_points